@@ -0,0 +1,374 @@
+"""
+VIPER Benchmarks
+Timings for the hot paths of the update pipeline and dashboard.
+
+Usage:
+    python -m src.benchmarks keywords [--count 300000]
+    python -m src.benchmarks epss [--count 300000]
+    python -m src.benchmarks propagation [--count 300000]
+    python -m src.benchmarks history [--count 300000] [--days 365]
+"""
+
+import gzip
+import io
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from src.data_collection.epss_fetcher import EPSSFetcher
+from src.utils.database_handler import DatabaseHandler, copy_epss_to_cves
+from src.utils.epss_history import date_from_day, day_number, record_epss_history
+from src.utils.industry_filters import IndustryFilter
+
+# Full-catalogue EPSS load (parse and store) must finish within this
+EPSS_LOAD_TARGET_SECONDS = 10.0
+
+# A year of EPSS history for the full catalogue must fit in this
+HISTORY_SIZE_TARGET_MB = 100
+
+# Each dashboard query must answer within this at full-catalogue size
+QUERY_TARGET_SECONDS = 0.5
+
+# Sentences typical of NVD descriptions, used to build synthetic CVEs
+_DESCRIPTION_PARTS = [
+    "A vulnerability in the web management interface could allow an unauthenticated, remote attacker to execute arbitrary code.",
+    "Cross-site scripting (XSS) in the admin panel allows remote attackers to inject arbitrary web script or HTML.",
+    "SQL injection in the login page allows attackers to bypass authentication and read sensitive information.",
+    "A buffer overflow in the firmware allows local users to cause a denial of service or possibly gain privileges.",
+    "Improper input validation in the API endpoint allows an authenticated user to escalate privileges.",
+    "Use of hard-coded credentials allows an attacker with network access to log in as an administrator.",
+]
+
+
+def _synthetic_descriptions(count, keywords, keyword_rate=0.1, seed=42):
+    """Build count CVE-like descriptions, about keyword_rate of them mentioning a keyword"""
+    rng = random.Random(seed)
+    all_keywords = [kw for sector in keywords.values() for words in sector.values() for kw in words]
+    descriptions = []
+    for i in range(count):
+        text = " ".join(rng.sample(_DESCRIPTION_PARTS, 2))
+        if all_keywords and rng.random() < keyword_rate:
+            text += f" This affects the {rng.choice(all_keywords)} component."
+        descriptions.append(f"{text} Fixed in version {i % 50}.{i % 7}.")
+    return descriptions
+
+
+def _substring_matches(keywords, text):
+    """The original per-keyword loop from IndustryFilter.get_industry_score"""
+    text_lower = text.lower()
+    results = {}
+    for industry, categories in keywords.items():
+        matches = []
+        for category, words in categories.items():
+            for keyword in words:
+                if keyword.lower() in text_lower:
+                    matches.append({'category': category, 'keyword': keyword})
+        results[industry] = matches
+    return results
+
+
+def benchmark_keywords(count=300000):
+    """Compare the substring loop with the compiled KeywordMatcher"""
+    keywords = IndustryFilter().keywords
+    descriptions = _synthetic_descriptions(count, keywords)
+    
+    print(f"Keyword matching over {count:,} descriptions "
+          f"({sum(len(words) for sector in keywords.values() for words in sector.values())} keywords)")
+    
+    start = time.perf_counter()
+    loop_results = [_substring_matches(keywords, text) for text in descriptions]
+    loop_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    matcher = IndustryFilter().get_matcher()
+    build_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    matcher_results = [matcher.match(text) for text in descriptions]
+    matcher_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    boundary_matcher = IndustryFilter().get_matcher(word_boundary=True)
+    for text in descriptions:
+        boundary_matcher.match(text)
+    boundary_seconds = time.perf_counter() - start
+    
+    identical = loop_results == matcher_results
+    
+    print(f"  {'Substring loop':<28}{loop_seconds:>8.2f}s")
+    print(f"  {'KeywordMatcher':<28}{matcher_seconds:>8.2f}s  "
+          f"({loop_seconds / matcher_seconds:.1f}x, built in {build_seconds * 1000:.1f} ms)")
+    print(f"  {'KeywordMatcher (words)':<28}{boundary_seconds:>8.2f}s")
+    print(f"  Results identical to substring loop: {identical}")
+    return identical
+
+
+def _synthetic_cve_ids(count, first_year=1999, last_year=2026):
+    """count CVE IDs spread evenly over the years, in sorted order"""
+    years = last_year - first_year + 1
+    per_year = -(-count // years)
+    return [f"CVE-{first_year + i // per_year}-{i % per_year:05d}" for i in range(count)]
+
+
+def _synthetic_epss_gz(cve_ids, seed=42):
+    """Gzipped EPSS CSV (metadata line, header, one row per CVE) as bytes"""
+    rng = random.Random(seed)
+    lines = ["#model_version:v2025.03.14,score_date:2026-01-01T00:00:00+0000", "cve,epss,percentile"]
+    for cve_id in cve_ids:
+        # EPSS is heavily skewed towards zero
+        lines.append(f"{cve_id},{rng.random() ** 4:.5f},{rng.random():.5f}")
+    return gzip.compress(("\n".join(lines) + "\n").encode('utf-8'))
+
+
+def _median_seconds(function, runs=5):
+    """Median wall time of function over runs calls"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def _scratch_database(db_path, cve_ids):
+    """Create a database at db_path holding synthetic CVEs with the given IDs"""
+    descriptions = _synthetic_descriptions(len(cve_ids), IndustryFilter().keywords)
+    db = DatabaseHandler(db_path)
+    db.update_cve_data([
+        {'cve_id': cve_id, 'description': description, 'cvss_score': round((i % 100) / 10, 1),
+         'last_modified': '2026-01-01T00:00:00'}
+        for i, (cve_id, description) in enumerate(zip(cve_ids, descriptions))
+    ])
+    return db
+
+
+def benchmark_epss(count=300000):
+    """
+    Load a full-catalogue EPSS file into a scratch database holding count
+    CVEs, then time the dashboard queries at that size.
+    """
+    cve_ids = _synthetic_cve_ids(count)
+    epss_gz = _synthetic_epss_gz(cve_ids)
+    
+    print(f"EPSS full-catalogue load with {count:,} CVEs ({len(epss_gz) / 1024 / 1024:.1f} MB gzipped)")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "viper.db"
+        
+        start = time.perf_counter()
+        db = _scratch_database(db_path, cve_ids)
+        setup_seconds = time.perf_counter() - start
+        
+        fetcher = EPSSFetcher(db_path)
+        stages = []
+        
+        start = time.perf_counter()
+        epss_df = fetcher.read_epss_stream(io.BytesIO(epss_gz))
+        epss_df['date'] = '2026-01-01'
+        stages.append(("Parse (streamed gzip)", time.perf_counter() - start))
+        
+        start = time.perf_counter()
+        db.update_epss_scores(epss_df, update_cves=False)
+        stages.append(("Store epss_scores", time.perf_counter() - start))
+        
+        load_seconds = sum(seconds for _, seconds in stages)
+        
+        # Copying scores onto every CVE and re-prioritising is timed on its own
+        start = time.perf_counter()
+        fetcher.update_cves_table(len(epss_df))
+        propagate_seconds = time.perf_counter() - start
+        size_mb = db_path.stat().st_size / 1024 / 1024
+        
+        queries = [
+            ("Overview loader (10,000)", lambda: db.get_prioritized_cves(10000)),
+            ("Sector page (healthcare)", lambda: db.get_prioritized_cves(10000, sector='healthcare')),
+            ("Uncategorized export", lambda: db.get_uncategorized_cves(1000)),
+            ("Top 100 EPSS", lambda: db.query(
+                "SELECT cve_id, epss_score FROM epss_scores ORDER BY epss_score DESC LIMIT 100")),
+            ("EPSS record count", lambda: db.query("SELECT COUNT(*) AS n FROM epss_scores")),
+        ]
+        query_results = [(name, _median_seconds(query)) for name, query in queries]
+        
+        print(f"\n  {'CVE ingest (setup)':<32}{setup_seconds:>8.2f}s")
+        for name, seconds in stages:
+            print(f"  {name:<32}{seconds:>8.2f}s")
+        load_ok = load_seconds <= EPSS_LOAD_TARGET_SECONDS
+        print(f"  {'EPSS load total':<32}{load_seconds:>8.2f}s  "
+              f"({'OK' if load_ok else 'FAIL'}, target {EPSS_LOAD_TARGET_SECONDS:.0f}s)")
+        print(f"  {'Update CVEs and priorities':<32}{propagate_seconds:>8.2f}s")
+        print(f"  Database size: {size_mb:.1f} MB")
+        
+        print(f"\n  Dashboard queries (median of 5, target {QUERY_TARGET_SECONDS * 1000:.0f} ms):")
+        queries_ok = True
+        for name, seconds in query_results:
+            ok = seconds <= QUERY_TARGET_SECONDS
+            queries_ok = queries_ok and ok
+            print(f"  {'OK' if ok else 'FAIL':<5}{name:<32}{seconds * 1000:>8.1f} ms")
+        
+        print()
+        plans_ok = db.check_query_plans()
+        db.connections.close()
+    
+    return load_ok and queries_ok and plans_ok
+
+
+def _offset_propagation(conn, batch_size=10000):
+    """The original EPSSFetcher.update_cves_table loop: LIMIT/OFFSET pages of IDs"""
+    offset = 0
+    while True:
+        batch_ids = [row[0] for row in conn.execute(
+            "SELECT cve_id FROM epss_scores ORDER BY cve_id LIMIT ? OFFSET ?",
+            (batch_size, offset)
+        )]
+        if not batch_ids:
+            break
+        placeholders = ','.join(['?'] * len(batch_ids))
+        conn.execute(f"""
+            UPDATE cves
+            SET epss_score = (
+                SELECT epss_score FROM epss_scores
+                WHERE epss_scores.cve_id = cves.cve_id
+            )
+            WHERE cve_id IN ({placeholders})
+        """, batch_ids)
+        offset += batch_size
+
+
+def benchmark_propagation(count=300000):
+    """
+    Compare copying EPSS scores onto count CVEs with the original paged
+    loop and with the single set-based update. Priority refresh is left
+    out of both timings.
+    """
+    cve_ids = _synthetic_cve_ids(count)
+    
+    print(f"EPSS propagation to {count:,} CVEs")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = _scratch_database(Path(tmp) / "viper.db", cve_ids)
+        epss_df = EPSSFetcher(db.db_path).read_epss_stream(io.BytesIO(_synthetic_epss_gz(cve_ids)))
+        epss_df['date'] = '2026-01-01'
+        db.update_epss_scores(epss_df, update_cves=False)
+        
+        def timed(propagate, stale_where="1"):
+            # Mark the CVEs whose stored score is out of date
+            with db.connections.writer() as conn:
+                conn.execute(f"UPDATE cves SET epss_score = 0 WHERE {stale_where}")
+            start = time.perf_counter()
+            with db.connections.writer() as conn:
+                propagate(conn)
+            seconds = time.perf_counter() - start
+            checksum = db.query("SELECT TOTAL(epss_score) AS total FROM cves")[0]['total']
+            return seconds, checksum
+        
+        def set_based(conn):
+            copy_epss_to_cves(conn.cursor())
+        
+        # First load: every score is new
+        offset_seconds, offset_checksum = timed(_offset_propagation)
+        set_seconds, set_checksum = timed(set_based)
+        
+        # Typical daily run: one score in ten moved
+        offset_daily, _ = timed(_offset_propagation, "id % 10 = 0")
+        set_daily, _ = timed(set_based, "id % 10 = 0")
+        
+        db.connections.close()
+    
+    identical = abs(offset_checksum - set_checksum) < 1e-6
+    
+    print(f"  {'':<32}{'LIMIT/OFFSET':>12}{'Set-based':>12}")
+    print(f"  {'All scores new':<32}{offset_seconds:>11.2f}s{set_seconds:>11.2f}s  "
+          f"({offset_seconds / set_seconds:.1f}x)")
+    print(f"  {'10% of scores changed':<32}{offset_daily:>11.2f}s{set_daily:>11.2f}s  "
+          f"({offset_daily / set_daily:.1f}x)")
+    print(f"  Results identical: {identical}")
+    return identical
+
+
+def _table_sizes_mb(conn, name_like):
+    """Size in MB of each table and index whose name is LIKE name_like (needs dbstat)"""
+    rows = conn.execute(
+        "SELECT name, SUM(pgsize) FROM dbstat WHERE name LIKE ? GROUP BY name",
+        (name_like,)
+    ).fetchall()
+    return {name: size / 1024 / 1024 for name, size in rows}
+
+
+def benchmark_history(count=300000, days=365):
+    """
+    Record days of daily EPSS snapshots for count CVEs, then report the
+    size of the history and the time of the movers query.
+    
+    Each simulated day rescores one CVE in twenty by a factor of 0.5-2;
+    most of those moves are below EPSS_HISTORY_EPSILON and are not stored.
+    """
+    cve_ids = _synthetic_cve_ids(count)
+    
+    print(f"EPSS history: {days} days of {count:,} CVEs")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseHandler(Path(tmp) / "viper.db")
+        epss_df = EPSSFetcher(db.db_path).read_epss_stream(io.BytesIO(_synthetic_epss_gz(cve_ids)))
+        first_day = day_number('2025-01-01')
+        epss_df['date'] = date_from_day(first_day)
+        db.update_epss_scores(epss_df, update_cves=False)
+        
+        start = time.perf_counter()
+        for day in range(first_day + 1, first_day + days):
+            with db.connections.writer() as conn:
+                conn.execute("""
+                    UPDATE epss_scores
+                    SET epss_score = ROUND(MIN(1.0, epss_score * (0.5 + (ABS(random()) % 1500) / 1000.0)), 5)
+                    WHERE ABS(random()) % 20 = 0
+                """)
+                record_epss_history(conn.cursor(), date_from_day(day))
+        record_seconds = time.perf_counter() - start
+        
+        movers_seconds = _median_seconds(lambda: db.get_epss_movers(days=7, limit=50))
+        rows = db.query("SELECT COUNT(*) AS n FROM epss_history")[0]['n']
+        try:
+            sizes = _table_sizes_mb(db.connections.reader(), '%epss_history%')
+        except Exception:
+            # SQLite built without the dbstat virtual table
+            sizes = {}
+        db.connections.close()
+    
+    total_mb = sum(sizes.values())
+    size_ok = total_mb <= HISTORY_SIZE_TARGET_MB
+    
+    print(f"\n  History rows: {rows:,} ({rows / days:,.0f} per day)")
+    print(f"  Recording: {record_seconds / max(days - 1, 1) * 1000:.0f} ms per day")
+    for name, size in sorted(sizes.items()):
+        print(f"  {name:<32}{size:>8.1f} MB")
+    if sizes:
+        print(f"  {'Total':<32}{total_mb:>8.1f} MB  "
+              f"({'OK' if size_ok else 'FAIL'}, target {HISTORY_SIZE_TARGET_MB} MB)")
+    print(f"  Movers query (7 days, top 50): {movers_seconds * 1000:.1f} ms")
+    return size_ok
+
+
+BENCHMARKS = {
+    'keywords': benchmark_keywords,
+    'epss': benchmark_epss,
+    'propagation': benchmark_propagation,
+    'history': benchmark_history,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python -m src.benchmarks {{{'|'.join(BENCHMARKS)}}} [--count N] [--days N]")
+        sys.exit(2)
+    
+    name = sys.argv[1]
+    kwargs = {}
+    for option in ('count', 'days'):
+        if f'--{option}' in sys.argv:
+            kwargs[option] = int(sys.argv[sys.argv.index(f'--{option}') + 1])
+    
+    ok = BENCHMARKS[name](**kwargs)
+    if ok is False:
+        sys.exit(1)
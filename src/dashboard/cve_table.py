@@ -0,0 +1,141 @@
+"""
+CVE Table
+The paged CVE table shared by the Overview and sector pages.
+
+Filters (priority, sector, KEV, CVSS range and description search) are
+applied in SQL and rows are fetched one page at a time with keyset
+pagination (see src/utils/pagination.py), so every CVE can be reached
+and a deep page costs no more than the first. The cursors of the pages
+visited are kept in session state for Previous / Next; changing a filter
+starts again from the first page.
+"""
+
+import streamlit as st
+import pandas as pd
+
+from src.dashboard.queries import load_cve_page
+from src.utils.fulltext import SEARCH_MODES
+from src.utils.pagination import DEFAULT_PAGE_SIZE
+from src.utils.priority import PRIORITY_LABELS
+
+# Sector choices of the Overview table, as (label, sector)
+SECTOR_OPTIONS = [
+    ("All", None),
+    ("🏥 Healthcare", 'healthcare'),
+    ("⚡ Energy", 'energy'),
+]
+
+# Matched keywords shown per CVE on the sector pages
+SHOWN_KEYWORDS = 3
+
+COLUMN_NAMES = {
+    'cve_id': 'CVE ID',
+    'description': 'Description',
+    'matched_keywords': 'Matched Keywords',
+    'cvss_score': 'CVSS',
+    'epss_score': 'EPSS',
+    'priority': 'Priority',
+    'sector': 'Sector',
+    'in_kev_display': 'In KEV'
+}
+
+
+def _sector_display(sectors):
+    """Sector column of the Overview table from a CVE's stored tags"""
+    tagged = (sectors or '').split(',')
+    shown = []
+    if 'healthcare' in tagged:
+        shown.append("🏥 Healthcare")
+    if 'energy' in tagged:
+        shown.append("⚡ Energy")
+    return ', '.join(shown) if shown else '📦 Other'
+
+
+def render_cve_table(key, sector=None, search_placeholder="e.g. remote code execution", height=600):
+    """
+    Draw the filter widgets and one page of the CVE table.
+    
+    Args:
+        key: Prefix of the widget and session state keys (one per table)
+        sector: Fix the table to this sector; without one, a sector filter is shown
+        search_placeholder: Example text of the description search box
+        height: Height of the table in pixels
+    """
+    labels = list(PRIORITY_LABELS.values())
+    tiers_by_label = {label: tier for tier, label in PRIORITY_LABELS.items()}
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        chosen = st.multiselect("Priority", labels, key=f"{key}_priority", placeholder="All priorities")
+    with col2:
+        if sector is None:
+            sector_label = st.selectbox("Sector", [label for label, _ in SECTOR_OPTIONS], key=f"{key}_sector")
+            table_sector = dict(SECTOR_OPTIONS)[sector_label]
+        else:
+            table_sector = sector
+        cvss_range = st.slider("CVSS", 0.0, 10.0, (0.0, 10.0), step=0.1, key=f"{key}_cvss")
+    with col3:
+        kev_only = st.checkbox("Only actively exploited (KEV)", key=f"{key}_kev")
+    
+    search_col, mode_col = st.columns([3, 1])
+    with search_col:
+        search_term = st.text_input("🔎 Search descriptions", placeholder=search_placeholder, key=f"{key}_search")
+    with mode_col:
+        search_mode = st.selectbox("Match", SEARCH_MODES, key=f"{key}_mode")
+    
+    filters = {
+        'tiers': [tiers_by_label[label] for label in chosen] or None,
+        'sector': table_sector,
+        'kev_only': kev_only,
+        # The full range also keeps CVEs without a CVSS score
+        'cvss_min': cvss_range[0] if cvss_range != (0.0, 10.0) else None,
+        'cvss_max': cvss_range[1] if cvss_range != (0.0, 10.0) else None,
+        'search': search_term.strip() or None,
+        'search_mode': search_mode,
+    }
+    
+    # Cursors of the pages visited: [None (first page), after page 1, ...]
+    state = st.session_state.setdefault(f"{key}_pages", {'filters': None, 'cursors': [None]})
+    if state['filters'] != filters:
+        state['filters'] = filters
+        state['cursors'] = [None]
+    
+    rows, next_cursor = load_cve_page(state['cursors'][-1], DEFAULT_PAGE_SIZE, **filters)
+    page = len(state['cursors'])
+    
+    if rows:
+        for row in rows:
+            row['in_kev_display'] = '✅ Yes' if row['in_kev'] else '❌ No'
+            if sector is None:
+                row['sector'] = _sector_display(row['sectors'])
+            else:
+                row['matched_keywords'] = ', '.join((row['matched_keywords'] or '').split(', ')[:SHOWN_KEYWORDS])
+        
+        if sector is None:
+            display_cols = ['cve_id', 'description', 'cvss_score', 'epss_score', 'priority', 'sector', 'in_kev_display']
+        else:
+            display_cols = ['cve_id', 'description', 'matched_keywords', 'cvss_score', 'epss_score', 'priority',
+                            'in_kev_display']
+        df = pd.DataFrame(rows)
+        
+        st.dataframe(df[display_cols].rename(columns=COLUMN_NAMES), use_container_width=True, height=height)
+    else:
+        st.info("No CVEs match these filters.")
+    
+    first = (page - 1) * DEFAULT_PAGE_SIZE
+    nav1, nav2, nav3, nav4 = st.columns([1, 1, 1, 3])
+    with nav1:
+        if st.button("⏮ First", key=f"{key}_first", disabled=page == 1, use_container_width=True):
+            state['cursors'] = [None]
+            st.rerun()
+    with nav2:
+        if st.button("⬅ Previous", key=f"{key}_previous", disabled=page == 1, use_container_width=True):
+            state['cursors'].pop()
+            st.rerun()
+    with nav3:
+        if st.button("Next ➡", key=f"{key}_next", disabled=next_cursor is None, use_container_width=True):
+            state['cursors'].append(next_cursor)
+            st.rerun()
+    with nav4:
+        if rows:
+            st.caption(f"Page {page} - CVEs {first + 1:,} to {first + len(rows):,}")
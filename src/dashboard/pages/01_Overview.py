@@ -4,9 +4,10 @@ Provides a high-level view of all CVEs with sector classification and update con
 
 This page serves as the main dashboard with:
 - Data source status indicators (NVD, EPSS, KEV)
-- Manual update button with live output
+- Manual update button, running the updater as a background job with live output
 - Sector tagging (Healthcare, Energy, Other)
-- Priority filtering
+- Paged CVE table filtered by priority, sector, KEV, CVSS and description
+- Biggest EPSS movers and KEV remediation due dates
 - Download top 1000 uncategorized CVEs as CSV for keyword discovery
 """
 
@@ -16,18 +17,22 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
 
 import streamlit as st
 import pandas as pd
-import subprocess
-import sqlite3
 from datetime import datetime
 import io
 
-# Force reload keywords from file on every page load
-import importlib
-import src.utils.industry_filters
-importlib.reload(src.utils.industry_filters)
+# Shared keyword registry - re-reads keywords.json only when it changes
 from src.utils.industry_filters import industry_filter
 
-from src.utils.database_handler import DatabaseHandler
+from src.dashboard.cve_table import render_cve_table
+from src.dashboard.queries import (
+    get_db, load_prioritized_cves, load_uncategorized_cves, load_epss_movers, load_kev_entries
+)
+from src.update_jobs import get_job, start_update_job, tail_log
+from src.utils.priority import PRIORITY_LABELS, priority_label
+from src.utils.sector_tags import SectorTagger
+
+# Seconds between polls of a running update job
+JOB_POLL_SECONDS = 2
 
 st.set_page_config(page_title="Overview", layout="wide")
 st.title("📊 Vulnerability Overview")
@@ -45,121 +50,21 @@ if 'after_counts' not in st.session_state:
     st.session_state.after_counts = None
 if 'update_output' not in st.session_state:
     st.session_state.update_output = ""
-if 'update_running' not in st.session_state:
-    st.session_state.update_running = False
-
-db = DatabaseHandler()
+if 'update_job_id' not in st.session_state:
+    st.session_state.update_job_id = None
 
-def load_cves_with_epss(limit=10000):
-    """
-    Load CVEs with their EPSS scores, sorted by Priority 1 first, then by EPSS descending.
-    """
-    conn = sqlite3.connect(db.db_path)
-    conn.row_factory = sqlite3.Row
-    
-    query = """
-        SELECT c.cve_id, c.description, c.cvss_score, c.in_kev, e.epss_score
-        FROM cves c
-        LEFT JOIN epss_scores e ON c.cve_id = e.cve_id
-        ORDER BY 
-            CASE 
-                WHEN c.in_kev = 1 THEN 0
-                WHEN e.epss_score > 0.2 AND c.cvss_score > 7.0 THEN 1
-                WHEN c.cvss_score > 7.0 THEN 2
-                WHEN e.epss_score > 0.2 THEN 3
-                ELSE 4
-            END,
-            e.epss_score DESC NULLS LAST,
-            c.cvss_score DESC NULLS LAST
-        LIMIT ?
-    """
-    cursor = conn.execute(query, (limit,))
-    rows = cursor.fetchall()
-    cves_list = [dict(row) for row in rows]
-    conn.close()
-    
-    return cves_list
+db = get_db()
 
 def load_top_uncategorized_cves(limit=1000):
     """
     Load top N uncategorized CVEs sorted by priority:
     Priority 1+ (KEV) first, then Priority 1, then Priority 2, then Priority 3, then Priority 4.
     """
-    conn = sqlite3.connect(db.db_path)
-    
-    # Load all CVEs with their scores
-    query = """
-        SELECT c.cve_id, c.description, c.cvss_score, c.in_kev, 
-               COALESCE(e.epss_score, 0) as epss_score
-        FROM cves c
-        LEFT JOIN epss_scores e ON c.cve_id = e.cve_id
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    
-    # Load keywords for sector classification
-    healthcare_keywords, energy_keywords = get_keywords_from_filter()
-    
-    # Filter to uncategorized only
-    def is_other(desc):
-        if not desc:
-            return True
-        desc_lower = desc.lower()
-        if any(kw.lower() in desc_lower for kw in healthcare_keywords):
-            return False
-        if any(kw.lower() in desc_lower for kw in energy_keywords):
-            return False
-        return True
-    
-    df['is_other'] = df['description'].apply(is_other)
-    other_df = df[df['is_other']].copy()
-    
-    # Calculate priority
-    def get_priority(row):
-        in_kev = row['in_kev']
-        epss = row['epss_score']
-        cvss = row['cvss_score']
-        
-        if in_kev == 1:
-            return 0  # Priority 1+ (highest)
-        elif epss > 0.2 and cvss > 7.0:
-            return 1  # Priority 1
-        elif cvss > 7.0:
-            return 2  # Priority 2
-        elif epss > 0.2:
-            return 3  # Priority 3
-        else:
-            return 4  # Priority 4
-    
-    other_df['priority_order'] = other_df.apply(get_priority, axis=1)
-    
-    # Sort by priority_order, then by EPSS desc, then by CVSS desc
-    other_df = other_df.sort_values(
-        ['priority_order', 'epss_score', 'cvss_score'], 
-        ascending=[True, False, False]
-    )
-    
-    # Return top N
-    top_df = other_df.head(limit).copy()
+    # CVEs with no stored sector tag, already in priority order
+    top_df = load_uncategorized_cves(limit)
     
     # Add priority label for display
-    def get_priority_label(row):
-        in_kev = row['in_kev']
-        epss = row['epss_score']
-        cvss = row['cvss_score']
-        
-        if in_kev == 1:
-            return "PRIORITY 1+ (IMMEDIATE)"
-        elif epss > 0.2 and cvss > 7.0:
-            return "PRIORITY 1 (This week)"
-        elif cvss > 7.0:
-            return "PRIORITY 2 (Schedule)"
-        elif epss > 0.2:
-            return "PRIORITY 3 (Monitor)"
-        else:
-            return "PRIORITY 4 (Deprioritize)"
-    
-    top_df['priority'] = top_df.apply(get_priority_label, axis=1)
+    top_df['priority'] = top_df['priority_tier'].map(PRIORITY_LABELS)
     
     # Select and rename columns for CSV
     result_df = top_df[['cve_id', 'description', 'cvss_score', 'epss_score', 'in_kev', 'priority']].copy()
@@ -167,24 +72,6 @@ def load_top_uncategorized_cves(limit=1000):
     
     return result_df
 
-def calculate_priority(cvss_score, epss_score, in_kev):
-    """Calculate priority label matching export script"""
-    if pd.isna(epss_score):
-        epss_score = None
-    
-    if in_kev == 1:
-        return "PRIORITY 1+ (IMMEDIATE)"
-    elif epss_score is not None and epss_score > 0.2 and cvss_score is not None and cvss_score > 7.0:
-        return "PRIORITY 1 (This week)"
-    elif cvss_score is not None and cvss_score > 7.0:
-        return "PRIORITY 2 (Schedule)"
-    elif epss_score is not None and epss_score > 0.2:
-        return "PRIORITY 3 (Monitor)"
-    elif epss_score is None and cvss_score is None:
-        return "PRIORITY UNKNOWN (Missing data)"
-    else:
-        return "PRIORITY 4 (Deprioritize)"
-
 def get_keywords_from_filter():
     try:
         healthcare_keywords = []
@@ -203,16 +90,14 @@ def get_keywords_from_filter():
         st.error(f"Error getting keywords: {e}")
         return [], []
 
-# Load CVEs for display
-all_cves = load_cves_with_epss(limit=10000)
+# Update stored sector tags first if keywords changed since they were built
+tagger = SectorTagger(db)
+if tagger.is_stale():
+    with st.spinner("Keywords changed - re-tagging CVEs..."):
+        tagger.retag_if_stale()
 
-# Add priority label to each CVE
-for cve in all_cves:
-    cve['priority'] = calculate_priority(
-        cve.get('cvss_score'),
-        cve.get('epss_score'),
-        cve.get('in_kev', 0)
-    )
+# Load CVEs for display (cached until the next update or keyword change)
+all_cves = load_prioritized_cves(limit=10000)
 
 # Get last update information
 nvd_update = db.get_last_update('nvd')
@@ -220,8 +105,7 @@ epss_update = db.get_last_update('epss')
 kev_update = db.get_last_update('kev')
 
 def get_current_counts():
-    conn = sqlite3.connect(db.db_path)
-    cursor = conn.cursor()
+    cursor = db.connections.reader().cursor()
     
     cursor.execute("SELECT COUNT(*) FROM cves")
     cves_count = cursor.fetchone()[0]
@@ -233,32 +117,46 @@ def get_current_counts():
     kev_result = cursor.fetchone()
     kev_count = kev_result[0] if kev_result else 0
     
-    conn.close()
     return {
         'cves': cves_count,
         'epss': epss_count,
         'kev': kev_count
     }
 
-def run_updater_with_live_output():
-    output_lines = []
-    process = subprocess.Popen(
-        [sys.executable, "-u", "-m", "src.updater"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1
-    )
-    
-    output_placeholder = st.empty()
-    
-    for line in process.stdout:
-        output_lines.append(line)
-        output_placeholder.code(''.join(output_lines[-50:]), language="text")
-        st.session_state.update_output = "\n".join(output_lines[-50:])
-    
-    process.wait()
-    return process.returncode == 0, "".join(output_lines)
+def record_update_result(job):
+    """Keep the outcome of this session's update job for the confirmation below"""
+    st.session_state.after_counts = get_current_counts()
+    st.session_state.update_success = job['status'] == 'succeeded'
+    st.session_state.update_message = "✅ Update completed successfully!" if st.session_state.update_success else "❌ Update failed"
+    st.session_state.update_timestamp = datetime.now()
+    st.session_state.update_output = tail_log(job['log_path'])
+    st.session_state.update_job_id = None
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_update_progress(job_id):
+    """Poll a running update job and show the end of its log; reruns only this fragment"""
+    job = get_job(db, job_id)
+    if job['active']:
+        with st.status(f"Running VIPER Update (job {job_id})...", expanded=True):
+            st.code(tail_log(job['log_path']), language="text")
+        return
+    
+    # Finished - redraw the whole page with the new data
+    if st.session_state.update_job_id == job_id:
+        record_update_result(job)
+    st.rerun()
+
+# The latest update job, which may have been started from another tab or session
+latest_job = get_job(db)
+update_active = bool(latest_job and latest_job['active'])
+
+# This session's job finished while the page was not polling it
+if st.session_state.update_job_id is not None and not update_active:
+    finished_job = get_job(db, st.session_state.update_job_id)
+    if finished_job:
+        record_update_result(finished_job)
+    else:
+        st.session_state.update_job_id = None
 
 # SIDEBAR - Data Source Status
 st.sidebar.header("📊 Data Source Status")
@@ -288,36 +186,28 @@ else:
 st.sidebar.markdown("---")
 st.sidebar.header("🔄 Manual Update")
 
-if st.sidebar.button("🚀 Run Full Update Now", type="primary", use_container_width=True):
+if st.sidebar.button("🚀 Run Full Update Now", type="primary", use_container_width=True, disabled=update_active):
     st.session_state.before_counts = get_current_counts()
-    st.session_state.update_running = True
     st.session_state.update_output = ""
+    # Follows the running job instead if another click got there first
+    job, started = start_update_job(db)
+    st.session_state.update_job_id = job['id']
     st.rerun()
 
-# Show live update output if update is running
-if st.session_state.update_running:
-    with st.status("Running VIPER Update...", expanded=True) as status:
-        success, full_output = run_updater_with_live_output()
-        
-        st.session_state.after_counts = get_current_counts()
-        st.session_state.update_success = success
-        st.session_state.update_message = "✅ Update completed successfully!" if success else "❌ Update failed"
-        st.session_state.update_timestamp = datetime.now()
-        st.session_state.update_output = full_output
-        st.session_state.update_running = False
-        
-        if success:
-            status.update(label="✅ Update Complete!", state="complete")
-        else:
-            status.update(label="❌ Update Failed", state="error")
-    
-    st.rerun()
+if update_active:
+    st.sidebar.caption(f"Update job {latest_job['id']} running since {latest_job['started_at'][11:19]} "
+                       f"- it continues if this tab is closed")
+    # Show live update output while the job runs
+    show_update_progress(latest_job['id'])
 
 # Display update output if available
-if st.session_state.update_output and not st.session_state.update_running:
+if st.session_state.update_output and not update_active:
     with st.expander("📋 Last Update Output", expanded=False):
         st.text(st.session_state.update_output)
 
+if st.session_state.update_timestamp and not st.session_state.update_success:
+    st.error(st.session_state.update_message)
+
 # Show detailed update confirmation
 if st.session_state.update_success and st.session_state.before_counts and st.session_state.after_counts:
     st.success(f"✅ {st.session_state.update_message}")
@@ -383,12 +273,12 @@ HEALTHCARE_KEYWORDS, ENERGY_KEYWORDS = get_keywords_from_filter()
 # Process CVEs with sector tags
 if all_cves:
     for cve in all_cves:
-        desc = cve.get('description', '').lower()
+        tagged = (cve.get('sectors') or '').split(',')
         sectors = []
         
-        if any(kw.lower() in desc for kw in HEALTHCARE_KEYWORDS):
+        if 'healthcare' in tagged:
             sectors.append("🏥 Healthcare")
-        if any(kw.lower() in desc for kw in ENERGY_KEYWORDS):
+        if 'energy' in tagged:
             sectors.append("⚡ Energy")
         
         cve['sector'] = ', '.join(sectors) if sectors else '📦 Other'
@@ -415,6 +305,10 @@ if all_cves:
     
     # Show current active keywords
     with st.expander("📋 Current Active Keywords"):
+        keyword_stats = industry_filter.get_stats()
+        st.caption(f"Keywords version {keyword_stats['version'][:12]} - keywords.json checked "
+                   f"{keyword_stats['checks']:,} times, loaded {keyword_stats['reloads']} times "
+                   f"since the dashboard started")
         col1, col2 = st.columns(2)
         with col1:
             st.markdown("**🏥 Healthcare Keywords:**")
@@ -427,45 +321,59 @@ if all_cves:
     
     st.markdown("---")
     
-    # Main data table
+    # Main data table, filtered in SQL and paged
     st.subheader("📋 CVEs (Sorted by Priority 1 First, then by EPSS)")
+    render_cve_table("overview")
     
-    # Select columns for display
-    display_cols = ['cve_id', 'description', 'cvss_score', 'epss_score', 'priority', 'sector', 'in_kev']
-    available_cols = [col for col in display_cols if col in df.columns]
-    
-    # Format KEV for display
-    if 'in_kev' in df.columns:
-        df['in_kev_display'] = df['in_kev'].map({1: '✅ Yes', 0: '❌ No'})
-        available_cols = [c if c != 'in_kev' else 'in_kev_display' for c in available_cols]
-    
-    # Rename columns
-    rename_map = {
-        'cve_id': 'CVE ID',
-        'description': 'Description',
-        'cvss_score': 'CVSS',
-        'epss_score': 'EPSS',
-        'priority': 'Priority',
-        'sector': 'Sector',
-        'in_kev_display': 'In KEV'
-    }
-    
-    display_df = df[available_cols].rename(columns=rename_map)
-    
-    st.dataframe(
-        display_df.head(500),
-        use_container_width=True,
-        height=600
-    )
-    
-    # Filter by priority dropdown
-    st.markdown("### 🔍 Filter by Priority")
-    priority_filter_options = ["All", "PRIORITY 1+ (IMMEDIATE)", "PRIORITY 1 (This week)", "PRIORITY 2 (Schedule)", "PRIORITY 3 (Monitor)", "PRIORITY 4 (Deprioritize)", "PRIORITY UNKNOWN (Missing data)"]
-    selected_priority = st.selectbox("Choose priority level", priority_filter_options)
+    # =========================================================
+    # BIGGEST EPSS MOVERS
+    # =========================================================
+    st.markdown("---")
+    st.subheader("📈 Biggest EPSS Movers")
+    movers_days = st.selectbox("Over the last", [1, 7, 30, 90], index=1, format_func=lambda d: f"{d} days")
+    movers = load_epss_movers(days=movers_days, limit=50)
+    
+    if movers:
+        movers_df = pd.DataFrame(movers)
+        movers_df['priority'] = [priority_label(tier) for tier in movers_df['priority_tier']]
+        movers_df = movers_df[['cve_id', 'epss_before', 'epss_now', 'change', 'priority', 'description']].rename(columns={
+            'cve_id': 'CVE ID',
+            'epss_before': 'EPSS Before',
+            'epss_now': 'EPSS Now',
+            'change': 'Change',
+            'priority': 'Priority',
+            'description': 'Description'
+        })
+        st.dataframe(movers_df, use_container_width=True, height=400)
+    else:
+        st.info("No EPSS history yet - movers appear after EPSS has been loaded on more than one day.")
     
-    if selected_priority != "All":
-        filtered = display_df[display_df['Priority'] == selected_priority]
-        st.dataframe(filtered, use_container_width=True, height=400)
+    # =========================================================
+    # KEV REMEDIATION DUE DATES
+    # =========================================================
+    st.markdown("---")
+    st.subheader("🔥 KEV Remediation Due Dates")
+    st.caption("CISA's required remediation dates for known exploited vulnerabilities, earliest first.")
+    upcoming_only = st.checkbox("Only show entries not yet due", value=True)
+    kev_df = load_kev_entries(upcoming_only=upcoming_only, limit=500)
+    
+    if not kev_df.empty:
+        kev_df['priority'] = [priority_label(tier) if pd.notna(tier) else "Not loaded" for tier in kev_df['priority_tier']]
+        kev_df = kev_df[['cve_id', 'due_date', 'date_added', 'vendor_project', 'product', 'vulnerability_name',
+                         'known_ransomware', 'epss_score', 'priority']].rename(columns={
+            'cve_id': 'CVE ID',
+            'due_date': 'Due Date',
+            'date_added': 'Added to KEV',
+            'vendor_project': 'Vendor',
+            'product': 'Product',
+            'vulnerability_name': 'Vulnerability',
+            'known_ransomware': 'Ransomware Use',
+            'epss_score': 'EPSS',
+            'priority': 'Priority'
+        })
+        st.dataframe(kev_df, use_container_width=True, height=400)
+    else:
+        st.info("No KEV entries to show - they are loaded with the next KEV update.")
     
     # =========================================================
     # DOWNLOAD TOP 1000 UNCATEGORIZED CVEs AS CSV
@@ -516,11 +424,8 @@ if all_cves:
 
 else:
     st.warning("No CVE data available. Run updater first.")
-    if st.button("🔄 Run Initial Update"):
-        with st.spinner("Running first-time update..."):
-            result = subprocess.run([sys.executable, "-m", "src.updater"], capture_output=True)
-            if result.returncode == 0:
-                st.success("✅ Update complete! Refreshing...")
-                st.rerun()
-            else:
-                st.error("❌ Update failed")
\ No newline at end of file
+    if st.button("🔄 Run Initial Update", disabled=update_active):
+        st.session_state.before_counts = get_current_counts()
+        job, started = start_update_job(db)
+        st.session_state.update_job_id = job['id']
+        st.rerun()
\ No newline at end of file
@@ -1,7 +1,7 @@
 """
 Healthcare Sector Dashboard
 Shows CVEs filtered by healthcare keywords from industry_filters.py
-Force reloads keywords on every page load
+Keywords are re-read only when keywords.json changes
 """
 
 import sys
@@ -12,82 +12,33 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import subprocess
-import sqlite3
 from datetime import datetime
 
-# Force reload keywords from file on every page load
+# Shared keyword registry - re-reads keywords.json only when it changes
 from src.utils.industry_filters import industry_filter
 
-from src.utils.database_handler import DatabaseHandler
-
-# Force reload keywords from file on EVERY page load
-import importlib
-import src.utils.industry_filters
-importlib.reload(src.utils.industry_filters)
-from src.utils.industry_filters import industry_filter
+from src.dashboard.cve_table import render_cve_table
+from src.dashboard.queries import get_db, load_prioritized_cves, load_matched_keywords
+from src.utils.sector_tags import SectorTagger
 
 st.set_page_config(page_title="Healthcare Sector", layout="wide")
 st.title("🏥 Healthcare Sector Vulnerabilities")
 
-db = DatabaseHandler()
+db = get_db()
 
-def load_cves_for_healthcare(limit=10000):
-    """
-    Load CVEs with EPSS scores, sorted by Priority 1 first, then by EPSS descending.
-    """
-    conn = sqlite3.connect(db.db_path)
-    conn.row_factory = sqlite3.Row
-    
-    query = """
-        SELECT c.cve_id, c.description, c.cvss_score, c.in_kev, e.epss_score
-        FROM cves c
-        LEFT JOIN epss_scores e ON c.cve_id = e.cve_id
-        ORDER BY 
-            CASE 
-                WHEN c.in_kev = 1 THEN 0
-                WHEN e.epss_score > 0.2 AND c.cvss_score > 7.0 THEN 1
-                WHEN c.cvss_score > 7.0 THEN 2
-                WHEN e.epss_score > 0.2 THEN 3
-                ELSE 4
-            END,
-            e.epss_score DESC NULLS LAST,
-            c.cvss_score DESC NULLS LAST
-        LIMIT ?
-    """
-    cursor = conn.execute(query, (limit,))
-    rows = cursor.fetchall()
-    cves_list = [dict(row) for row in rows]
-    conn.close()
-    
-    return cves_list
+# Update stored sector tags first if keywords changed since they were built
+tagger = SectorTagger(db)
+if tagger.is_stale():
+    with st.spinner("Keywords changed - re-tagging CVEs..."):
+        tagger.retag_if_stale()
 
-def calculate_priority(cvss_score, epss_score, in_kev):
-    if pd.isna(epss_score):
-        epss_score = None
-    
-    if in_kev == 1:
-        return "PRIORITY 1+ (IMMEDIATE)"
-    elif epss_score is not None and epss_score > 0.2 and cvss_score is not None and cvss_score > 7.0:
-        return "PRIORITY 1 (This week)"
-    elif cvss_score is not None and cvss_score > 7.0:
-        return "PRIORITY 2 (Schedule)"
-    elif epss_score is not None and epss_score > 0.2:
-        return "PRIORITY 3 (Monitor)"
-    elif epss_score is None and cvss_score is None:
-        return "PRIORITY UNKNOWN (Missing data)"
-    else:
-        return "PRIORITY 4 (Deprioritize)"
+# Load CVEs (cached until the next update or keyword change)
+healthcare_cves = load_prioritized_cves(limit=10000, sector='healthcare')
+has_cves = bool(db.query("SELECT EXISTS (SELECT 1 FROM cves) AS has_cves")[0]['has_cves'])
 
-# Load CVEs
-all_cves = load_cves_for_healthcare(limit=10000)
-
-# Add priority label
-for cve in all_cves:
-    cve['priority'] = calculate_priority(
-        cve.get('cvss_score'),
-        cve.get('epss_score'),
-        cve.get('in_kev', 0)
-    )
+# Show the first few matched keywords
+for cve in healthcare_cves:
+    cve['matched_keywords'] = ', '.join(cve['matched_keywords'].split(', ')[:3])
 
 # Get all healthcare keywords from industry_filters.py
 def get_healthcare_keywords():
@@ -105,21 +56,9 @@ def get_healthcare_keywords():
 
 HEALTHCARE_KEYWORDS = get_healthcare_keywords()
 
-if all_cves:
-    # Filter for healthcare using ALL keywords
-    healthcare_cves = []
-    matched_keywords = set()
-    
-    for cve in all_cves:
-        desc = cve.get('description', '').lower()
-        matched = []
-        for kw in HEALTHCARE_KEYWORDS:
-            if kw.lower() in desc:
-                matched.append(kw)
-                matched_keywords.add(kw)
-        if matched:
-            cve['matched_keywords'] = ', '.join(matched[:3])
-            healthcare_cves.append(cve)
+if has_cves:
+    # Keywords that matched at least one CVE
+    matched_keywords = set(load_matched_keywords('healthcare'))
     
     if healthcare_cves:
         df = pd.DataFrame(healthcare_cves)
@@ -187,22 +126,7 @@ if all_cves:
         
         # Main data table
         st.subheader("Healthcare CVEs (Sorted by Priority 1 First, then by EPSS)")
-        display_cols = ['cve_id', 'description', 'cvss_score', 'epss_score', 'priority', 'in_kev']
-        if 'matched_keywords' in df.columns:
-            display_cols = ['cve_id', 'description', 'matched_keywords', 'cvss_score', 'epss_score', 'priority', 'in_kev']
-        
-        available_cols = [col for col in display_cols if col in df.columns]
-        
-        if 'in_kev' in df.columns:
-            df['in_kev_display'] = df['in_kev'].map({1: '✅ Yes', 0: '❌ No'})
-            if 'in_kev_display' not in available_cols:
-                display_cols = [c if c != 'in_kev' else 'in_kev_display' for c in display_cols]
-        
-        st.dataframe(
-            df[display_cols].head(500),
-            use_container_width=True,
-            height=500
-        )
+        render_cve_table("healthcare", sector='healthcare', search_placeholder="e.g. infusion pump, dicom, pacemak", height=500)
     else:
         st.info("No healthcare CVEs found in current dataset.")
         st.write(f"**{len(HEALTHCARE_KEYWORDS)} healthcare keywords being used:**")
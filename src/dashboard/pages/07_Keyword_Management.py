@@ -22,6 +22,9 @@ import shutil
 import json
 import os
 
+from src.utils.database_handler import DatabaseHandler
+from src.utils.sector_tags import SectorTagger
+
 st.set_page_config(page_title="Keyword Management", layout="wide")
 st.title("🔑 Keyword Management")
 
@@ -129,6 +132,17 @@ def restore_from_backup(backup_file):
     except Exception as e:
         return False, f"❌ Restore failed: {e}"
 
+def retag_cves():
+    """
+    Update the stored sector tags for the keywords that were added or
+    removed, so the sector pages reflect the change straight away.
+    """
+    try:
+        with st.spinner("Re-tagging CVEs with the updated keywords..."):
+            SectorTagger(DatabaseHandler()).retag_if_stale()
+    except Exception as e:
+        st.warning(f"Keywords saved, but re-tagging CVEs failed: {e}")
+
 def delete_backup(backup_file):
     """
     Delete a backup file.
@@ -274,6 +288,7 @@ with col1:
         success, message = save_all_keywords(updated_keywords)
         if success:
             st.success(message)
+            retag_cves()
             st.balloons()
             st.session_state.force_reload += 1  # Force UI refresh
             st.rerun()
@@ -348,6 +363,7 @@ if backup_files:
                 success, message = restore_from_backup(selected_file)
                 if success:
                     st.success(message)
+                    retag_cves()
                     st.session_state.force_reload += 1
                     st.rerun()
                 else:
@@ -0,0 +1,115 @@
+"""
+Dashboard Queries
+The CVE queries shared by the dashboard pages, cached across reruns.
+
+Every result is cached with st.cache_data under a data version: the
+last_run stamp of each data source in the updates table, the keywords
+hash the stored sector tags were built from, the time EPSS history was
+last recorded, and the version of the keywords currently in
+keywords.json. An update, a keyword save or a retag changes the
+version, so cached results are dropped exactly when the data they came
+from changes - widget clicks and page switches in between are served
+from the cache.
+"""
+
+import streamlit as st
+
+from src.utils.database_handler import DatabaseHandler
+from src.utils.industry_filters import industry_filter
+from src.utils.pagination import DEFAULT_PAGE_SIZE
+from src.utils.priority import priority_label
+
+# Cached results kept per query (older data versions age out)
+CACHE_MAX_ENTRIES = 32
+
+DATA_VERSION_QUERY = """
+    SELECT (SELECT group_concat(source || '=' || last_run, ';')
+            FROM (SELECT source, last_run FROM updates ORDER BY source)),
+           (SELECT keywords_hash FROM sector_tag_state WHERE id = 1),
+           (SELECT MAX(recorded_at) FROM epss_history_days)
+"""
+
+
+@st.cache_resource
+def get_db():
+    """The DatabaseHandler shared by every page and session"""
+    return DatabaseHandler()
+
+
+def data_version():
+    """Token that changes whenever an update, keyword save or retag lands"""
+    return get_db().connections.reader().execute(DATA_VERSION_QUERY).fetchone() + (industry_filter.current()[1],)
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def _prioritized_cves(version, limit, sector):
+    cves = get_db().get_prioritized_cves(limit, sector=sector)
+    for cve in cves:
+        cve['priority'] = priority_label(cve['priority_tier'])
+    return cves
+
+
+def load_prioritized_cves(limit=10000, sector=None):
+    """
+    CVEs in priority order with their EPSS scores and priority label.
+    With a sector, only that sector's CVEs, with their matched keywords.
+    """
+    return _prioritized_cves(data_version(), limit, sector)
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def _uncategorized_cves(version, limit):
+    return get_db().get_uncategorized_cves(limit)
+
+
+def load_uncategorized_cves(limit=1000):
+    """Highest priority CVEs matching no sector keyword, as a DataFrame"""
+    return _uncategorized_cves(data_version(), limit)
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def _matched_keywords(version, sector):
+    return get_db().get_matched_keywords(sector)
+
+
+def load_matched_keywords(sector):
+    """Keywords of a sector that match at least one CVE"""
+    return _matched_keywords(data_version(), sector)
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def _epss_movers(version, days, limit):
+    return get_db().get_epss_movers(days=days, limit=limit)
+
+
+def load_epss_movers(days=7, limit=50):
+    """CVEs whose EPSS score moved most over the last days days"""
+    return _epss_movers(data_version(), days, limit)
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def _kev_entries(version, upcoming_only, limit):
+    return get_db().get_kev_entries(upcoming_only=upcoming_only, limit=limit)
+
+
+def load_kev_entries(upcoming_only=False, limit=500):
+    """KEV catalog entries by remediation due date, as a DataFrame"""
+    return _kev_entries(data_version(), upcoming_only, limit)
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def _cve_page(version, after, page_size, filters):
+    rows, next_cursor = get_db().get_cve_page(after, page_size, **dict(filters))
+    for row in rows:
+        row['priority'] = priority_label(row['priority_tier'])
+    return rows, next_cursor
+
+
+def load_cve_page(after=None, page_size=DEFAULT_PAGE_SIZE, **filters):
+    """
+    One page of CVEs in priority order, after the cursor of the previous
+    page, with their priority label (see DatabaseHandler.get_cve_page)
+    """
+    if filters.get('tiers') is not None:
+        filters['tiers'] = tuple(filters['tiers'])
+    return _cve_page(data_version(), after, page_size, tuple(sorted(filters.items())))
@@ -0,0 +1,245 @@
+"""
+EPSS Historical Backfill
+Loads the dated EPSS archives (epss_scores-YYYY-MM-DD.csv.gz) for a range
+of days into the EPSS score history (see src/utils/epss_history.py).
+
+Archives are downloaded by a bounded pool of threads and parsed in a pool
+of worker processes. The main process is the only one that writes: it
+records each day, in date order, in its own transaction, so an
+interrupted backfill resumes from the first day not yet recorded.
+Downloaded archives are kept until their day is recorded, so a resumed
+run does not fetch them again.
+
+Archives can also be read from a local directory of
+epss_scores-YYYY-MM-DD.csv.gz files instead of being downloaded.
+"""
+
+import contextlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import requests
+
+from src.data_collection.epss_fetcher import EPSSFetcher
+from src.utils.db_connection import DEFAULT_DB_PATH
+from src.utils.epss_history import date_from_day, record_epss_history
+
+# Dated archive of one day's scores
+EPSS_ARCHIVE_URL = "https://epss.cyentia.com/epss_scores-{day}.csv.gz"
+
+# Where downloaded archives wait until their day is recorded
+ARCHIVE_DIR = Path("data/epss/archive")
+
+# Concurrent downloads are kept modest to be polite to the EPSS site
+DEFAULT_DOWNLOAD_WORKERS = 4
+
+# Parsing is CPU bound, one process per core up to this many
+DEFAULT_PARSE_WORKERS = min(4, os.cpu_count() or 1)
+
+DOWNLOAD_RETRIES = 3
+
+
+def archive_name(day):
+    """File name of the archive for day (a date or ISO string)"""
+    return f"epss_scores-{day}.csv.gz"
+
+
+def parse_day(value):
+    """
+    Parse a --from/--to value (YYYY-MM-DD) into a date.
+    
+    Raises:
+        ValueError: If the value is not a date or is in the future
+    """
+    day = datetime.strptime(value, "%Y-%m-%d").date()
+    if day > date.today():
+        raise ValueError(f"Date is in the future: {value}")
+    return day
+
+
+def date_range(start, end):
+    """Every day from start to end inclusive, as ISO strings"""
+    if start > end:
+        raise ValueError(f"Invalid date range: {start} to {end}")
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+
+
+def _download_archive(day, archive_dir):
+    """
+    Download the archive for day into archive_dir.
+    
+    Returns:
+        Path of the archive, or None if EPSS has no archive for the day
+    """
+    path = archive_dir / archive_name(day)
+    if path.exists():
+        return path
+    
+    partial = path.with_suffix('.part')
+    url = EPSS_ARCHIVE_URL.format(day=day)
+    for attempt in range(1, DOWNLOAD_RETRIES + 1):
+        try:
+            with requests.get(url, timeout=300, stream=True) as response:
+                if response.status_code == 404:
+                    return None
+                response.raise_for_status()
+                # Keep the .gz as published (see EPSSFetcher.download_and_filter_csv)
+                response.raw.decode_content = False
+                with open(partial, 'wb') as f:
+                    for block in iter(lambda: response.raw.read(1024 * 1024), b''):
+                        f.write(block)
+            # Only a complete download gets the archive's name
+            partial.replace(path)
+            return path
+        except Exception as e:
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+            print(f"[{day}] Download failed: {e}, retrying ({attempt}/{DOWNLOAD_RETRIES})...", flush=True)
+            time.sleep(5 * attempt)
+
+
+def _parse_archive(path):
+    """
+    Worker: parse one archive into its cve_id and epss_score columns.
+    
+    The parser's per-chunk progress is suppressed; with several archives
+    in flight it would interleave.
+    
+    Returns:
+        DataFrame, or None if the archive is not in the expected format
+    """
+    fetcher = EPSSFetcher()
+    with open(path, 'rb') as f, contextlib.redirect_stdout(io.StringIO()):
+        df = fetcher.read_epss_stream(f)
+    if df is None:
+        return None
+    return df[['cve_id', 'epss_score']]
+
+
+def _fetch_and_parse(day, source_dir, archive_dir, parse_pool):
+    """
+    Thread: locate or download the archive for day, then parse it in the
+    process pool.
+    
+    Returns:
+        Dictionary with the day, status ('parsed', 'missing' or 'failed'),
+        the parsed scores and the archive path
+    """
+    result = {'day': day, 'status': 'failed', 'scores': None, 'path': None}
+    try:
+        if source_dir is not None:
+            path = source_dir / archive_name(day)
+            path = path if path.exists() else None
+        else:
+            path = _download_archive(day, archive_dir)
+        if path is None:
+            result['status'] = 'missing'
+            return result
+        result['path'] = path
+        result['scores'] = parse_pool.submit(_parse_archive, path).result()
+        if result['scores'] is None:
+            print(f"[{day}] Archive is not in the expected format", flush=True)
+        else:
+            result['status'] = 'parsed'
+    except Exception as e:
+        print(f"[{day}] Failed: {e}", flush=True)
+    return result
+
+
+def _record_day(db, day, scores):
+    """Record one day's scores in the history in a single transaction"""
+    with db.connections.writer() as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS epss_backfill (cve_id TEXT, epss_score REAL)")
+        conn.execute("DELETE FROM epss_backfill")
+        conn.executemany("INSERT INTO epss_backfill (cve_id, epss_score) VALUES (?, ?)",
+                         scores.itertuples(index=False, name=None))
+        changed = record_epss_history(conn.cursor(), day, source="epss_backfill")
+        conn.execute("DELETE FROM epss_backfill")
+    return changed
+
+
+def run_epss_backfill(days, db_path=None, source_dir=None,
+                      download_workers=DEFAULT_DOWNLOAD_WORKERS, parse_workers=DEFAULT_PARSE_WORKERS):
+    """
+    Record the EPSS archives for the given days in the score history.
+    
+    Days already recorded are skipped, so re-running the same range
+    resumes an interrupted backfill.
+    
+    Args:
+        days: Iterable of ISO dates to load
+        db_path: Database path (defaults to the DatabaseHandler default)
+        source_dir: Directory of archives to read instead of downloading
+        download_workers: Number of concurrent downloads
+        parse_workers: Number of parsing processes
+    
+    Returns:
+        List of per-day result dictionaries (day, status, changed), where
+        status is 'recorded', 'skipped', 'missing' or 'failed'
+    """
+    from src.utils.database_handler import DatabaseHandler
+    
+    db = DatabaseHandler(db_path or DEFAULT_DB_PATH)
+    days = sorted(set(days))
+    recorded = {date_from_day(row['day']) for row in db.query("SELECT day FROM epss_history_days")}
+    pending = [day for day in days if day not in recorded]
+    source_dir = Path(source_dir) if source_dir else None
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    
+    print(f"Backfilling EPSS history for {len(days)} days ({days[0]} to {days[-1]}): "
+          f"{len(days) - len(pending)} already recorded, {len(pending)} to load "
+          f"from {source_dir or 'epss.cyentia.com'}...", flush=True)
+    
+    results = {day: {'day': day, 'status': 'skipped', 'changed': 0} for day in days if day in recorded}
+    started = time.perf_counter()
+    
+    # Days are recorded in order as their archives come in; only a window
+    # of days ahead of the one being written is fetched at a time, which
+    # bounds the parsed scores held in memory
+    window = download_workers + parse_workers
+    with ProcessPoolExecutor(max_workers=parse_workers) as parse_pool, \
+            ThreadPoolExecutor(max_workers=download_workers) as download_pool:
+        in_flight = {}
+        for index, day in enumerate(pending):
+            for ahead in pending[index:index + window]:
+                if ahead not in in_flight:
+                    in_flight[ahead] = download_pool.submit(
+                        _fetch_and_parse, ahead, source_dir, ARCHIVE_DIR, parse_pool)
+            
+            result = in_flight.pop(day).result()
+            changed = 0
+            if result['status'] == 'parsed':
+                try:
+                    changed = _record_day(db, day, result['scores']) or 0
+                    result['status'] = 'recorded'
+                except Exception as e:
+                    print(f"[{day}] Failed to record: {e}", flush=True)
+                    result['status'] = 'failed'
+            elif result['status'] == 'missing':
+                print(f"[{day}] No archive published - skipping", flush=True)
+            
+            if result['status'] == 'recorded' and source_dir is None:
+                result['path'].unlink(missing_ok=True)
+            results[day] = {'day': day, 'status': result['status'], 'changed': changed}
+    
+    elapsed = time.perf_counter() - started
+    summary = [results[day] for day in days]
+    counts = {status: sum(1 for r in summary if r['status'] == status)
+              for status in ('recorded', 'skipped', 'missing', 'failed')}
+    loaded = counts['recorded']
+    
+    print("\n" + "=" * 60, flush=True)
+    print("EPSS BACKFILL SUMMARY", flush=True)
+    print("=" * 60, flush=True)
+    for status, count in counts.items():
+        print(f"  {status.capitalize():<10}{count:>6} days", flush=True)
+    print(f"  History rows written: {sum(r['changed'] for r in summary):,}", flush=True)
+    print(f"  Elapsed: {elapsed:.1f}s ({loaded / elapsed if elapsed else 0:.2f} days/s)", flush=True)
+    if counts['failed']:
+        print(f"Failed days: {[r['day'] for r in summary if r['status'] == 'failed']}", flush=True)
+    
+    return summary
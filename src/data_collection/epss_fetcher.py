@@ -1,6 +1,7 @@
 """
 EPSS Data Fetcher with daily updates
 Downloads CSV file directly - more reliable than API
+Streams the gzip download straight into a chunked parser (no temp files)
 """
 
 import requests
@@ -8,30 +9,62 @@ import pandas as pd
 from pathlib import Path
 from datetime import datetime
 import time
-import sqlite3
 import gzip
-import shutil
+import io
+
+from src.utils.db_connection import DEFAULT_DB_PATH, get_connection_manager
+
+# Rows parsed at a time while streaming the CSV - bounds peak memory
+EPSS_CHUNK_SIZE = 100000
+
+# Column names and parse types of the EPSS CSV (cve, epss, percentile)
+EPSS_COLUMNS = ['cve_id', 'epss_score', 'percentile']
+EPSS_DTYPES = {'cve_id': str, 'epss_score': 'float32', 'percentile': 'float32'}
+
+# Decimal places EPSS publishes scores with
+EPSS_PRECISION = 5
+
+
+def _cve_prefix(target_year=None):
+    """CVE ID prefix of the rows to keep (every CVE when target_year is None)"""
+    return f"CVE-{target_year}-" if target_year else "CVE-"
+
+
+def _score_date(metadata_line):
+    """Date (YYYY-MM-DD) from a '#model_version:...,score_date:...' line, or None"""
+    for field in metadata_line.lstrip('#').split(','):
+        name, _, value = field.partition(':')
+        if name.strip() == 'score_date' and len(value.strip()) >= 10:
+            return value.strip()[:10]
+    return None
+
+
+def _scope(target_year=None):
+    """Human-readable description of the rows being loaded"""
+    return f"year {target_year}" if target_year else "all years"
 
 class EPSSFetcher:
     """Fetches and processes EPSS scores using CSV download"""
     
-    def __init__(self):
+    def __init__(self, db_path=None):
         self.csv_url = "https://epss.cyentia.com/epss_scores-current.csv.gz"
         self.data_dir = Path("data/epss")
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.data_file = self.data_dir / "epss_latest.csv"
+        self.db_path = db_path or DEFAULT_DB_PATH
+        # score_date from the metadata line of the last CSV read
+        self.score_date = None
+        self.connections = get_connection_manager(self.db_path)
     
-    def validate_csv_format(self, csv_path):
+    def validate_csv_format(self, stream):
         """
-        Pre-flight check: Validate that the CSV file has the expected format.
+        Pre-flight check: Validate the metadata and header lines at the start
+        of the CSV stream, consuming them so the data rows follow.
         Returns True if valid, False otherwise.
         """
         try:
-            # Read first few lines to check format
-            with open(csv_path, 'r') as f:
-                first_line = f.readline().strip()
-                second_line = f.readline().strip()
-                third_line = f.readline().strip()
+            first_line = stream.readline().strip()
+            second_line = stream.readline().strip()
             
             # Check first line has metadata format
             if not first_line.startswith('#model_version:'):
@@ -48,20 +81,76 @@ class EPSSFetcher:
                 print(f"  Found headers: {actual_headers}", flush=True)
                 return False
             
-            # Check third line has valid data (should be a CVE ID)
-            if not third_line.startswith('CVE-'):
-                print(f"WARNING: Third line does not start with CVE-: {third_line[:30]}", flush=True)
-                # Don't fail, just warn
+            self.score_date = _score_date(first_line)
             
             print(f"CSV format validation passed.", flush=True)
             print(f"  Model version: {first_line}", flush=True)
             print(f"  Headers: {actual_headers}", flush=True)
             return True
-            
+        
         except Exception as e:
             print(f"ERROR: Failed to validate CSV: {e}", flush=True)
             return False
     
+    def read_epss_stream(self, raw_stream, target_year=None, chunk_size=EPSS_CHUNK_SIZE):
+        """
+        Decompress and parse a gzipped EPSS CSV as it is read, keeping only
+        the rows for target_year (every CVE if target_year is None).
+        
+        Rows are parsed EPSS_CHUNK_SIZE at a time with typed columns and
+        filtered with a vectorized prefix test, so memory is bounded by one
+        chunk plus the rows kept - the full file is never held or written
+        to disk.
+        
+        Args:
+            raw_stream: Binary file-like object of the .csv.gz (an HTTP
+                        response body or an open local file)
+            target_year: CVE ID year to keep, or None for all years
+            chunk_size: Rows parsed per chunk
+        
+        Returns:
+            DataFrame with cve_id, epss_score and percentile columns, or
+            None if the file is not in the expected format
+        """
+        stream = io.TextIOWrapper(gzip.GzipFile(fileobj=raw_stream), encoding='utf-8')
+        
+        # PRE-FLIGHT CHECK: Validate CSV format before parsing any rows
+        print(f"Validating CSV format...", flush=True)
+        if not self.validate_csv_format(stream):
+            return None
+        
+        prefix = _cve_prefix(target_year)
+        kept = []
+        total = 0
+        try:
+            reader = pd.read_csv(stream, header=None, names=EPSS_COLUMNS, dtype=EPSS_DTYPES, chunksize=chunk_size)
+            for chunk in reader:
+                if total == 0 and len(chunk) and not str(chunk['cve_id'].iloc[0]).startswith('CVE-'):
+                    print(f"WARNING: First row does not start with CVE-: {chunk['cve_id'].iloc[0]}", flush=True)
+                    # Don't fail, just warn
+                
+                total += len(chunk)
+                kept.append(chunk[chunk['cve_id'].str.startswith(prefix, na=False)])
+                print(f"  Parsed {total:,} records ({raw_stream.tell() / 1024 / 1024:.1f} MB compressed)", flush=True)
+        except ValueError as e:
+            # A score that is not a number fails the typed parse
+            print(f"ERROR: CSV contains malformed values: {e}", flush=True)
+            return None
+        
+        print(f"Total records in CSV: {total:,}", flush=True)
+        
+        if kept:
+            filtered_df = pd.concat(kept, ignore_index=True)
+        else:
+            filtered_df = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in EPSS_DTYPES.items()})
+        
+        # float32 is only the parsing format - store the scores as published
+        for column in ['epss_score', 'percentile']:
+            filtered_df[column] = filtered_df[column].astype('float64').round(EPSS_PRECISION)
+        
+        print(f"Filtered to {len(filtered_df):,} records for {_scope(target_year)}", flush=True)
+        return filtered_df
+    
     def sanity_check_epss_data(self, filtered_df, target_year):
         """
         Perform sanity checks on the filtered EPSS data.
@@ -73,11 +162,11 @@ class EPSSFetcher:
         
         # 1. Check DataFrame is not empty
         if filtered_df.empty:
-            print(f"  ERROR: No data found for year {target_year}", flush=True)
+            print(f"  ERROR: No data found for {_scope(target_year)}", flush=True)
             return False
         
         record_count = len(filtered_df)
-        print(f"  Record count: {record_count:,} CVEs for year {target_year}", flush=True)
+        print(f"  Record count: {record_count:,} CVEs for {_scope(target_year)}", flush=True)
         
         # 2. Check required columns exist (MOST IMPORTANT)
         required_columns = ['cve_id', 'epss_score', 'percentile']
@@ -90,15 +179,15 @@ class EPSSFetcher:
         else:
             print(f"  SUCCESS: Required columns present: {required_columns}", flush=True)
         
-        # 3. Check CVE ID format (must start with CVE-{year}-)
+        # 3. Check CVE ID format (must start with CVE-{year}-, or CVE- for all years)
         sample_cves = filtered_df['cve_id'].head(10).tolist()
         valid_format_count = 0
         for cve in sample_cves:
-            if str(cve).startswith(f'CVE-{target_year}-'):
+            if str(cve).startswith(_cve_prefix(target_year)):
                 valid_format_count += 1
         
         if valid_format_count == 0:
-            print(f"  ERROR: No CVEs found with expected format 'CVE-{target_year}-XXXX'", flush=True)
+            print(f"  ERROR: No CVEs found with expected format '{_cve_prefix(target_year)}XXXX'", flush=True)
             print(f"  Sample CVEs: {sample_cves[:3]}", flush=True)
             return False
         elif valid_format_count < len(sample_cves):
@@ -172,12 +261,8 @@ class EPSSFetcher:
     def clear_epss_table(self):
         """Clear all existing EPSS records before daily update"""
         try:
-            DB_PATH = Path("data/viper.db")
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM epss_scores")
-            conn.commit()
-            conn.close()
+            with self.connections.writer() as conn:
+                conn.execute("DELETE FROM epss_scores")
             print("Cleared existing EPSS data for fresh daily update", flush=True)
             return True
         except Exception as e:
@@ -185,66 +270,20 @@ class EPSSFetcher:
             return False
     
     def update_cves_table(self, total_records):
-        """Update the cves table with EPSS scores in batches with progress"""
+        """Update the cves table with EPSS scores in one set-based update"""
         try:
-            DB_PATH = Path("data/viper.db")
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT COUNT(*) FROM cves WHERE cve_id IN (SELECT cve_id FROM epss_scores)")
-            total_to_update = cursor.fetchone()[0]
-            
-            if total_to_update == 0:
-                print("No EPSS records to update in CVEs table.", flush=True)
-                return True
-            
-            print(f"Updating CVEs table with EPSS scores ({total_to_update:,} records to update)...", flush=True)
+            from src.utils.database_handler import DatabaseHandler
             
-            batch_size = 10000
-            offset = 0
-            updated = 0
+            print(f"Updating CVEs table with EPSS scores...", flush=True)
+            start = time.perf_counter()
             
-            while True:
-                cursor.execute("""
-                    SELECT cve_id FROM epss_scores 
-                    ORDER BY cve_id 
-                    LIMIT ? OFFSET ?
-                """, (batch_size, offset))
-                
-                batch_ids = [row[0] for row in cursor.fetchall()]
-                
-                if not batch_ids:
-                    break
-                
-                placeholders = ','.join(['?'] * len(batch_ids))
-                cursor.execute(f"""
-                    UPDATE cves 
-                    SET epss_score = (
-                        SELECT epss_score FROM epss_scores 
-                        WHERE epss_scores.cve_id = cves.cve_id
-                    )
-                    WHERE cve_id IN ({placeholders})
-                """, batch_ids)
-                
-                conn.commit()
-                
-                updated += len(batch_ids)
-                percent = (updated / total_to_update) * 100
-                print(f"  Progress: {updated:,} / {total_to_update:,} ({percent:.1f}%)", flush=True)
-                
-                offset += batch_size
+            db = DatabaseHandler(self.db_path)
+            changed = db.update_cve_epss()
             
-            conn.close()
-            print("CVEs table updated successfully", flush=True)
+            print(f"CVEs table updated successfully: {changed:,} scores changed "
+                  f"in {time.perf_counter() - start:.1f}s", flush=True)
             
-            update_conn = sqlite3.connect(DB_PATH)
-            update_cursor = update_conn.cursor()
-            update_cursor.execute("""
-                INSERT OR REPLACE INTO updates (source, last_run, records_count)
-                VALUES ('epss', ?, ?)
-            """, (datetime.now().isoformat(), total_records))
-            update_conn.commit()
-            update_conn.close()
+            db.record_update('epss', total_records)
             print(f"Updated EPSS timestamp: {total_records:,} records", flush=True)
             
             return True
@@ -252,48 +291,44 @@ class EPSSFetcher:
             print(f"Failed to update CVEs table: {e}", flush=True)
             return False
     
-    def download_and_filter_csv(self, target_year):
+    def fetch_scores(self, target_year=None):
         """
-        Download EPSS CSV, filter by CVE ID year, then save to database.
+        Stream the EPSS CSV and filter it by CVE ID year (None keeps every
+        CVE), without touching the database.
         Includes pre-flight validation and sanity checks.
+        
+        The download is parsed as it arrives (see read_epss_stream).
+        
+        Returns:
+            DataFrame of checked scores with their date column, or None if
+            the download, format validation or sanity checks failed
         """
         try:
-            from src.utils.database_handler import DatabaseHandler
-            
-            # Clear existing data first
-            self.clear_epss_table()
-            
-            gz_path = self.data_dir / "epss_temp.csv.gz"
-            csv_path = self.data_dir / "epss_temp.csv"
-            
             print(f"Downloading EPSS CSV file...", flush=True)
             print(f"URL: {self.csv_url}", flush=True)
             
-            # Download with progress
+            # Download and parse with retries
             retry_count = 0
             max_retries = 3
-            success = False
+            filtered_df = None
             
-            while retry_count < max_retries and not success:
+            while retry_count < max_retries and filtered_df is None:
                 try:
                     headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
                     response = requests.get(self.csv_url, timeout=300, stream=True, headers=headers)
                     
                     if response.status_code == 200:
-                        total_size = int(response.headers.get('content-length', 0))
-                        downloaded = 0
-                        
-                        with open(gz_path, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=65536):
-                                if chunk:
-                                    f.write(chunk)
-                                    downloaded += len(chunk)
-                                    if total_size > 0:
-                                        percent = (downloaded / total_size) * 100
-                                        print(f"  Download progress: {percent:.1f}% ({downloaded / 1024 / 1024:.1f} MB / {total_size / 1024 / 1024:.1f} MB)", flush=True)
+                        # The body is the .gz file itself; gunzip it here even if
+                        # the server also labels it with a gzip Content-Encoding
+                        response.raw.decode_content = False
+                        with response:
+                            filtered_df = self.read_epss_stream(response.raw, target_year)
                         
+                        if filtered_df is None:
+                            print(f"CSV format validation failed. The file structure may have changed.", flush=True)
+                            print(f"Please check the EPSS documentation for format updates.", flush=True)
+                            return None
                         print(f"  Download complete.", flush=True)
-                        success = True
                     else:
                         print(f"  HTTP {response.status_code}, retrying...", flush=True)
                         retry_count += 1
@@ -303,83 +338,80 @@ class EPSSFetcher:
                     retry_count += 1
                     time.sleep(30)
             
-            if not success:
+            if filtered_df is None:
                 print(f"Failed to download EPSS CSV", flush=True)
-                return False
-            
-            # Extract CSV
-            print(f"Extracting CSV...", flush=True)
-            with gzip.open(gz_path, 'rb') as f_in:
-                with open(csv_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            
-            # PRE-FLIGHT CHECK: Validate CSV format
-            print(f"Validating CSV format...", flush=True)
-            if not self.validate_csv_format(csv_path):
-                print(f"CSV format validation failed. The file structure may have changed.", flush=True)
-                print(f"Please check the EPSS documentation for format updates.", flush=True)
-                return False
-            
-            # Read CSV - skip the first row (metadata), use second row as headers
-            print(f"Reading CSV file...", flush=True)
-            df = pd.read_csv(csv_path, skiprows=1, names=['cve_id', 'epss_score', 'percentile'], dtype={'cve_id': str})
-            
-            print(f"Total records in CSV: {len(df):,}", flush=True)
-            
-            # Filter by year using CVE ID pattern
-            filtered_df = df[df['cve_id'].str.contains(f"CVE-{target_year}-", na=False)].copy()
-            print(f"Filtered to {len(filtered_df):,} records for year {target_year}", flush=True)
+                return None
             
             if filtered_df.empty:
-                print(f"No records found for year {target_year}", flush=True)
-                return True
+                print(f"No records found for {_scope(target_year)}", flush=True)
+                return filtered_df
             
             # SANITY CHECK: Validate the filtered data (this will also convert types)
             if not self.sanity_check_epss_data(filtered_df, target_year):
                 print(f"Sanity checks failed. Aborting database update.", flush=True)
-                return False
+                return None
             
             # Add date column (using .loc to avoid SettingWithCopyWarning)
-            filtered_df.loc[:, 'date'] = datetime.now().date().isoformat()
-            
-            # Save in batches - pass DataFrame, not list of records
-            total_saved = 0
-            batch_size = 50000
-            db = DatabaseHandler()
-            
-            for i in range(0, len(filtered_df), batch_size):
-                batch_df = filtered_df.iloc[i:i+batch_size]
-                db.update_epss_scores(batch_df, append_mode=True, update_cves=False)
-                total_saved += len(batch_df)
-                print(f"  Saved batch {i//batch_size + 1}: {len(batch_df)} records - Total saved: {total_saved:,}", flush=True)
-            
-            # Close the database connection
-            if hasattr(db, 'conn') and db.conn:
-                db.conn.close()
-            
-            print(f"EPSS CSV download complete: {total_saved:,} records for year {target_year} saved", flush=True)
+            filtered_df.loc[:, 'date'] = self.score_date or datetime.now().date().isoformat()
+            return filtered_df
+        
+        except Exception as e:
+            print(f"EPSS CSV failed: {e}", flush=True)
+            import traceback
+            traceback.print_exc()
+            return None
+    
+    def save_scores(self, filtered_df, target_year=None):
+        """
+        Replace the stored EPSS scores with scores from fetch_scores(), then
+        copy them to the cves table. The existing scores are only cleared
+        now that the new ones have passed the checks.
+        """
+        if filtered_df.empty:
+            return True
+        
+        try:
+            from src.utils.database_handler import DatabaseHandler
             
-            # Update CVEs table once at the end
-            self.update_cves_table(total_saved)
+            # The swap, the copy onto cves, the new priorities and the 'epss'
+            # update record commit together, so the dashboard sees either
+            # all of the old scores or all of the new ones
+            start = time.perf_counter()
+            db = DatabaseHandler(self.db_path)
+            db.update_epss_scores(filtered_df)
+            total_saved = len(filtered_df)
             
-            # Cleanup temp files
-            gz_path.unlink(missing_ok=True)
-            csv_path.unlink(missing_ok=True)
+            print(f"EPSS CSV download complete: {total_saved:,} records for {_scope(target_year)} saved "
+                  f"and copied to the CVEs table in {time.perf_counter() - start:.1f}s", flush=True)
             
             return True
-            
+        
         except Exception as e:
             print(f"EPSS CSV failed: {e}", flush=True)
             import traceback
             traceback.print_exc()
             return False
     
+    def download_and_filter_csv(self, target_year=None):
+        """
+        Stream the EPSS CSV, filter by CVE ID year (None keeps every CVE),
+        then save to database (fetch_scores followed by save_scores).
+        """
+        filtered_df = self.fetch_scores(target_year)
+        if filtered_df is None:
+            return False
+        return self.save_scores(filtered_df, target_year)
+    
     def update_database(self) -> bool:
-        """Main update method - downloads CSV and filters for current year"""
-        current_year = datetime.now().year
-        print(f"Running EPSS update for year {current_year}...", flush=True)
+        """
+        Main update method - downloads CSV and loads scores for every CVE.
+        
+        KEV entries and older CVEs need scores too, or they sink to the
+        bottom of the priority order.
+        """
+        print(f"Running EPSS update for all CVEs...", flush=True)
         
-        if self.download_and_filter_csv(current_year):
+        if self.download_and_filter_csv():
             print("EPSS update completed successfully", flush=True)
             return True
         else:
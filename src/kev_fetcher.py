@@ -9,9 +9,24 @@ exploited in the wild. This is a critical data source for prioritization
 
 import requests
 import json
+import time
 from pathlib import Path
 from datetime import datetime
 
+# Seconds a cached catalog is trusted before the file is checked for changes
+CACHE_CHECK_SECONDS = 1.0
+
+# Catalog fields kept for each entry, as (kev_entries column, catalog key)
+KEV_ENTRY_FIELDS = [
+    ('cve_id', 'cveID'),
+    ('vendor_project', 'vendorProject'),
+    ('product', 'product'),
+    ('vulnerability_name', 'vulnerabilityName'),
+    ('date_added', 'dateAdded'),
+    ('due_date', 'dueDate'),
+    ('known_ransomware', 'knownRansomwareCampaignUse'),
+]
+
 class KEVFetcher:
     """
     Fetches the CISA KEV catalog and provides methods to check if CVEs are actively exploited.
@@ -19,8 +34,16 @@ class KEVFetcher:
     The KEV catalog is updated regularly and contains vulnerabilities that have been
     confirmed as exploited in the wild. This class handles downloading, caching,
     and providing access to the exploited CVE list.
+    
+    The parsed catalog is cached per process and shared by every fetcher,
+    so lookups do not re-read the file. The cache is replaced when the
+    file's modification time or size changes, or when a download brings a
+    new catalog version.
     """
     
+    # Parsed catalogs by file path: {path: {version, entries, kev_set, stamp, checked}}
+    _catalog_cache = {}
+    
     def __init__(self):
         """Initialize the KEV fetcher with API endpoint and local storage paths."""
         self.url = "https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json"
@@ -45,6 +68,7 @@ class KEVFetcher:
                 # Save raw data to cache
                 with open(self.data_file, 'w') as f:
                     json.dump(data, f, indent=2)
+                self._cache_catalog(data)
                 
                 print(f"KEV catalog updated: {data.get('count', 0)} vulnerabilities")
                 return data
@@ -55,33 +79,81 @@ class KEVFetcher:
             print(f"KEV fetch failed: {e}")
             return None
     
-    def get_kev_set(self):
+    def _file_stamp(self):
+        """(mtime, size) of the cached catalog file, or None if there is none"""
+        try:
+            stat = self.data_file.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _cache_catalog(self, data):
+        """Parse a catalog into entries and a KEV set and cache them for the current file"""
+        cached = self._catalog_cache.get(str(self.data_file))
+        version = data.get('catalogVersion')
+        if cached is None or not version or cached['version'] != version:
+            entries = []
+            for vuln in data.get('vulnerabilities', []):
+                if vuln.get('cveID'):
+                    entries.append({column: vuln.get(key) for column, key in KEV_ENTRY_FIELDS})
+            cached = {
+                'version': version,
+                'entries': entries,
+                'kev_set': frozenset(entry['cve_id'] for entry in entries),
+            }
+        # A re-download of the same catalog version keeps the parsed copy
+        cached.update(stamp=self._file_stamp(), checked=time.monotonic())
+        self._catalog_cache[str(self.data_file)] = cached
+        return cached
+    
+    def _load_catalog(self):
         """
-        Return a set of all CVE IDs that are in the KEV catalog.
+        Return the cached catalog (version, entries, kev_set), reading the
+        file only if it changed. The file is checked at most once every
+        CACHE_CHECK_SECONDS, so lookups in a loop cost no system calls.
+        """
+        cached = self._catalog_cache.get(str(self.data_file))
+        if cached and time.monotonic() - cached['checked'] < CACHE_CHECK_SECONDS:
+            return cached
         
-        This is the primary method used by the database handler to mark
-        exploited CVEs. Using a set allows for fast O(1) lookups.
+        stamp = self._file_stamp()
+        if cached and stamp is not None and cached['stamp'] == stamp:
+            cached['checked'] = time.monotonic()
+            return cached
         
-        Returns:
-            Set of CVE ID strings that are actively exploited
-        """
-        # Try to load from cache first
-        if not self.data_file.exists():
+        # No catalog on disk yet - download it
+        if stamp is None:
             data = self.fetch_catalog()
             if not data:
-                return set()
+                return {'version': None, 'entries': [], 'kev_set': frozenset()}
         else:
             with open(self.data_file, 'r') as f:
                 data = json.load(f)
+        return self._cache_catalog(data)
+    
+    def get_kev_set(self):
+        """
+        Return a set of all CVE IDs that are in the KEV catalog.
         
-        # Extract all CVE IDs from the catalog
-        kev_set = set()
-        for vuln in data.get('vulnerabilities', []):
-            cve_id = vuln.get('cveID')
-            if cve_id:
-                kev_set.add(cve_id)
+        This is the primary method used by the database handler to mark
+        exploited CVEs. Using a set allows for fast O(1) lookups.
         
-        return kev_set
+        Returns:
+            Frozen set of CVE ID strings that are actively exploited
+        """
+        return self._load_catalog()['kev_set']
+    
+    def get_kev_entries(self):
+        """
+        Return the catalog entries with the fields in KEV_ENTRY_FIELDS
+        (CVE ID, vendor, product, name, date added, due date and known
+        ransomware use), as stored in the kev_entries table.
+        """
+        return self._load_catalog()['entries']
+    
+    def get_catalog_version(self):
+        """Return the catalogVersion of the cached catalog, or None"""
+        return self._load_catalog()['version']
     
     def is_in_kev(self, cve_id):
         """
@@ -89,12 +161,11 @@ class KEVFetcher:
         
         Args:
             cve_id: The CVE identifier to check
-            
+        
         Returns:
             True if the CVE is actively exploited, False otherwise
         """
-        kev_set = self.get_kev_set()
-        return cve_id in kev_set
+        return cve_id in self.get_kev_set()
 
 
 # Simple test when run directly
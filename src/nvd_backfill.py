@@ -0,0 +1,351 @@
+"""
+NVD Historical Backfill
+Loads the yearly NVD JSON feeds for a range of years in parallel.
+
+Each year is downloaded and parsed in its own worker process. Parsed rows
+are streamed over a queue to a single writer process, which owns the
+SQLite connection - workers never open the database, so they never
+contend for its write lock. If the writer dies, the years not yet
+written fail instead of waiting on a queue nobody reads.
+"""
+
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from src.nvd_fetcher import NVDFetcher, NVD_FIRST_FEED_YEAR
+from src.utils.db_connection import DEFAULT_DB_PATH
+
+# Rows per message sent from a worker to the writer process
+WRITER_BATCH_SIZE = 5000
+
+# Maximum batches buffered between workers and the writer
+QUEUE_MAX_BATCHES = 32
+
+# Parallel downloads are kept modest to stay within NVD rate limits
+DEFAULT_WORKERS = 4
+
+# How long a put on the full queue waits before checking the writer is still there
+QUEUE_PUT_TIMEOUT_SECONDS = 1
+
+# How often the coordinator checks the writer while waiting for workers
+WRITER_CHECK_SECONDS = 1
+
+# How long the writer gets to exit once it has reported before it is terminated
+WRITER_EXIT_TIMEOUT_SECONDS = 30
+
+# Sent by the coordinator to tell the writer all workers are finished
+_DONE = None
+
+# Queue shared with pool workers and the event set once the writer has
+# stopped, set by _init_worker
+_row_queue = None
+_writer_stopped = None
+
+
+class WriterStopped(RuntimeError):
+    """Raised in a worker when the writer process is gone"""
+
+
+def parse_year_range(spec):
+    """
+    Parse a --years value into a sorted list of feed years.
+    
+    Accepts a single year ("2024"), a range ("2002-2026") or a
+    comma-separated mix of both ("2002-2010,2024").
+    
+    Raises:
+        ValueError: If the spec is malformed or outside the feed range
+    """
+    years = set()
+    current_year = datetime.now().year
+    
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = (int(p) for p in part.split('-', 1))
+        else:
+            start = end = int(part)
+        if start > end:
+            raise ValueError(f"Invalid year range: {part}")
+        if start < NVD_FIRST_FEED_YEAR or end > current_year:
+            raise ValueError(f"Years must be between {NVD_FIRST_FEED_YEAR} and {current_year}: {part}")
+        years.update(range(start, end + 1))
+    
+    if not years:
+        raise ValueError(f"No years given: {spec!r}")
+    return sorted(years)
+
+
+def _init_worker(row_queue, writer_stopped):
+    """Pool initializer - hands each worker the queue to the writer process."""
+    global _row_queue, _writer_stopped
+    _row_queue = row_queue
+    _writer_stopped = writer_stopped
+
+
+def _send(message):
+    """
+    Put a message on the writer's queue, waiting while it is full. Raises
+    WriterStopped instead of blocking forever if the writer has gone.
+    """
+    while not _writer_stopped.is_set():
+        try:
+            _row_queue.put(message, timeout=QUEUE_PUT_TIMEOUT_SECONDS)
+            return
+        except queue.Full:
+            pass
+    raise WriterStopped("writer process is no longer running")
+
+
+def _backfill_year(year, api_key, previous_meta):
+    """
+    Worker: download and parse one yearly feed, then stream it to the writer.
+    
+    The feed's .meta is checked first; a year whose sha256 matches
+    previous_meta is skipped without downloading.
+    
+    Returns:
+        Dictionary with the year, success flag, skipped flag, record count
+        and fetch time
+    """
+    start = time.perf_counter()
+    fetcher = NVDFetcher(api_key=api_key)
+    result = {'year': year, 'ok': False, 'skipped': False, 'records': 0}
+    
+    try:
+        meta = fetcher.fetch_feed_meta(year)
+        if meta is not None and fetcher.feed_unchanged(meta, previous_meta):
+            print(f"[{year}] Feed unchanged since last import - skipping.", flush=True)
+            result.update(ok=True, skipped=True, fetch_seconds=time.perf_counter() - start)
+            return result
+        cves = fetcher.prepare_year(year, meta=meta)
+    except Exception as e:
+        print(f"[{year}] Worker failed: {e}", flush=True)
+        cves = None
+    
+    result['fetch_seconds'] = time.perf_counter() - start
+    if cves is None:
+        return result
+    
+    try:
+        for i in range(0, len(cves), WRITER_BATCH_SIZE):
+            _send(('rows', year, cves[i:i + WRITER_BATCH_SIZE]))
+        if meta is not None:
+            _send(('meta', year, meta))
+    except WriterStopped as e:
+        print(f"[{year}] Not written: {e}", flush=True)
+        return result
+    
+    fetcher.feed_path(year).unlink(missing_ok=True)
+    result.update(ok=True, records=len(cves))
+    return result
+
+
+def _writer_main(row_queue, stats_queue, writer_stopped, db_path):
+    """
+    Writer process: the only process that writes to the database.
+    
+    Consumes ('rows', year, batch) and ('meta', year, meta) messages until
+    _DONE arrives, then reports per-year
+    written counts and write time back through stats_queue.
+    
+    writer_stopped is set however the writer exits, so workers waiting to
+    queue rows give up instead of blocking on a queue nobody reads.
+    """
+    from src.utils.database_handler import DatabaseHandler
+    
+    try:
+        db = DatabaseHandler(db_path)
+        written = {}
+        write_seconds = {}
+        
+        while True:
+            message = row_queue.get()
+            if message is _DONE:
+                break
+            kind, year, payload = message
+            if kind == 'meta':
+                # Only recorded once every row of the year has been written
+                db.record_feed_meta(f"nvdcve-2.0-{year}", payload.get('sha256'), payload.get('lastModifiedDate'))
+                continue
+            batch = payload
+            start = time.perf_counter()
+            db.update_cve_data(batch)
+            write_seconds[year] = write_seconds.get(year, 0.0) + time.perf_counter() - start
+            written[year] = written.get(year, 0) + len(batch)
+        
+        total = sum(written.values())
+        if total:
+            db.record_update('nvd', total)
+        stats_queue.put((written, write_seconds))
+    finally:
+        writer_stopped.set()
+
+
+def _discard_rows(row_queue, stop):
+    """
+    Read and drop whatever workers queue once the writer has gone. A
+    process exits only after its queued messages reach the pipe, so
+    without a reader workers would hang on exit.
+    """
+    while not stop.is_set():
+        try:
+            row_queue.get(timeout=QUEUE_PUT_TIMEOUT_SECONDS)
+        except queue.Empty:
+            pass
+
+
+def run_backfill(years, db_path=None, api_key=None, workers=DEFAULT_WORKERS):
+    """
+    Load the NVD feeds for the given years using a process pool.
+    
+    Args:
+        years: Iterable of feed years to load
+        db_path: Database path (defaults to the DatabaseHandler default)
+        api_key: Optional NVD API key passed to each worker
+        workers: Number of concurrent download/parse processes
+    
+    Returns:
+        List of per-year result dictionaries (year, ok, records,
+        fetch_seconds, write_seconds)
+    """
+    years = sorted(set(years))
+    if db_path is None:
+        db_path = DEFAULT_DB_PATH
+    
+    print(f"Backfilling NVD feeds for {len(years)} years ({years[0]}-{years[-1]}) "
+          f"with {workers} workers...", flush=True)
+    
+    # Read what was last imported before the writer takes ownership of the database
+    from src.utils.database_handler import DatabaseHandler
+    db = DatabaseHandler(db_path)
+    previous_meta = {year: db.get_feed_meta(f"nvdcve-2.0-{year}") for year in years}
+    
+    ctx = mp.get_context()
+    row_queue = ctx.Queue(maxsize=QUEUE_MAX_BATCHES)
+    stats_queue = ctx.Queue()
+    writer_stopped = ctx.Event()
+    writer = ctx.Process(target=_writer_main, args=(row_queue, stats_queue, writer_stopped, str(db_path)))
+    writer.start()
+    
+    started = time.perf_counter()
+    results = {}
+    stop_discarding = threading.Event()
+    discarder = None
+    
+    def check_writer():
+        """Once the writer has gone, fail what is left instead of waiting on it"""
+        nonlocal discarder
+        # A writer killed outright never sets the event itself
+        if not writer.is_alive():
+            writer_stopped.set()
+        if writer_stopped.is_set() and discarder is None:
+            print(f"Writer process stopped - failing the years not yet written", flush=True)
+            discarder = threading.Thread(target=_discard_rows, args=(row_queue, stop_discarding), daemon=True)
+            discarder.start()
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(row_queue, writer_stopped)) as pool:
+            futures = {
+                pool.submit(_backfill_year, year, api_key, previous_meta[year]): year
+                for year in years
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=WRITER_CHECK_SECONDS, return_when=FIRST_COMPLETED)
+                check_writer()
+                if discarder is not None:
+                    # Years not started yet are not downloaded at all
+                    pending -= {future for future in pending if future.cancel()}
+                
+                for future in done:
+                    year = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"[{year}] Worker crashed: {e}", flush=True)
+                        result = {'year': year, 'ok': False, 'skipped': False, 'records': 0, 'fetch_seconds': 0.0}
+                    results[year] = result
+                    
+                    if result['skipped']:
+                        continue
+                    if result['ok']:
+                        rate = result['records'] / result['fetch_seconds'] if result['fetch_seconds'] else 0
+                        print(f"[{year}] Parsed {result['records']:,} CVEs in {result['fetch_seconds']:.1f}s "
+                              f"({rate:,.0f} CVEs/s)", flush=True)
+                    else:
+                        print(f"[{year}] FAILED after {result['fetch_seconds']:.1f}s", flush=True)
+            # Workers exit when the pool closes, which needs their queued rows read
+            check_writer()
+    finally:
+        # Only a running writer is told to finish; the queue may be full otherwise
+        while writer.is_alive() and not writer_stopped.is_set():
+            try:
+                row_queue.put(_DONE, timeout=QUEUE_PUT_TIMEOUT_SECONDS)
+                break
+            except queue.Full:
+                pass
+    
+    # The writer drains what is still queued, then reports
+    stats = None
+    while stats is None:
+        try:
+            stats = stats_queue.get(timeout=WRITER_CHECK_SECONDS)
+        except queue.Empty:
+            if not writer.is_alive():
+                break
+    writer.join(timeout=WRITER_EXIT_TIMEOUT_SECONDS)
+    if writer.is_alive():
+        print(f"WARNING: Writer process did not exit within {WRITER_EXIT_TIMEOUT_SECONDS}s - terminating it",
+              flush=True)
+        writer.terminate()
+        writer.join()
+    if writer.exitcode != 0:
+        print(f"WARNING: Writer process exited with code {writer.exitcode}", flush=True)
+    stop_discarding.set()
+    
+    if stats is None:
+        # Without the writer's report nothing is known to have been written
+        written, write_seconds = {}, {}
+        for result in results.values():
+            if not result['skipped']:
+                result['ok'] = False
+    else:
+        written, write_seconds = stats
+    
+    elapsed = time.perf_counter() - started
+    
+    # Per-year throughput report
+    print("\n" + "=" * 60, flush=True)
+    print("NVD BACKFILL SUMMARY", flush=True)
+    print("=" * 60, flush=True)
+    print(f"{'Year':<6}{'Status':<8}{'CVEs':>10}{'Fetch s':>10}{'Write s':>10}{'CVEs/s':>10}", flush=True)
+    
+    summary = []
+    for year in years:
+        result = results.get(year, {'year': year, 'ok': False, 'skipped': False, 'records': 0, 'fetch_seconds': 0.0})
+        result['records'] = written.get(year, 0)
+        result['write_seconds'] = write_seconds.get(year, 0.0)
+        busy = result['fetch_seconds'] + result['write_seconds']
+        rate = result['records'] / busy if busy else 0
+        status = 'SKIP' if result['skipped'] else ('OK' if result['ok'] else 'FAILED')
+        print(f"{year:<6}{status:<8}{result['records']:>10,}{result['fetch_seconds']:>10.1f}"
+              f"{result['write_seconds']:>10.1f}{rate:>10,.0f}", flush=True)
+        summary.append(result)
+    
+    total_records = sum(r['records'] for r in summary)
+    failed = [r['year'] for r in summary if not r['ok']]
+    print("-" * 60, flush=True)
+    print(f"Total: {total_records:,} CVEs in {elapsed:.1f}s "
+          f"({total_records / elapsed if elapsed else 0:,.0f} CVEs/s overall)", flush=True)
+    if failed:
+        print(f"Failed years: {failed}", flush=True)
+    
+    return summary
@@ -6,12 +6,170 @@ More reliable than API - single download per year
 
 import requests
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+import hashlib
+import io
 import json
-import sqlite3
+import re
 import gzip
-import shutil
+
+NVD_FEED_BASE_URL = "https://nvd.nist.gov/feeds/json/cve/2.0"
+NVD_API_URL = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+NVD_API_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.000Z"
+
+# The NVD API rejects date ranges longer than 120 days
+NVD_API_MAX_RANGE_DAYS = 120
+
+# updates table row holding the lastModified high-water mark for incremental sync
+NVD_SYNC_SOURCE = 'nvd_lastmod'
+
+# Overlap applied to the high-water mark after a full feed import, since the
+# yearly feed can lag the API by up to a day
+NVD_FEED_LAG = timedelta(days=1)
+
+# Read size (in characters) for the streaming feed parser
+FEED_READ_SIZE = 1024 * 1024
+
+# Number of leading feed items checked by validate_feed_item
+FEED_VALIDATION_SAMPLE = 10
+
+# The first yearly feed also carries every CVE published before it (CVE-1999-*)
+NVD_FIRST_FEED_YEAR = 2002
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _JSONStreamReader:
+    """Minimal pull reader over a JSON text stream, backed by a sliding buffer."""
+    
+    def __init__(self, stream, read_size=FEED_READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self):
+        """Append the next chunk to the buffer, dropping what was consumed."""
+        chunk = self.stream.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+    
+    def take(self, expected):
+        """Consume the next non-whitespace character, which must be one of expected."""
+        char = self.peek()
+        if not char or char not in expected:
+            found = repr(char) if char else 'end of file'
+            raise ValueError(f"Expected one of {expected!r} but found {found}")
+        self.pos += 1
+        return char
+    
+    def value(self):
+        """Decode the next complete JSON value, reading more input as needed."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number ending exactly at the buffer edge may be truncated
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+class _HashingReader(io.RawIOBase):
+    """Binary stream wrapper that feeds everything read through a hash object."""
+    
+    def __init__(self, raw, digest):
+        self.raw = raw
+        self.digest = digest
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        size = len(data)
+        buffer[:size] = data
+        self.digest.update(data)
+        return size
+
+
+def iter_json_array_items(stream, array_key, header=None, read_size=FEED_READ_SIZE):
+    """
+    Yield the items of a top-level array in a JSON object one at a time.
+    
+    Only the current item (plus one read buffer) is kept in memory, so the
+    whole document never has to be loaded. Other top-level values are stored
+    in header when a dict is given. Raises ValueError if the document is not
+    an object, array_key is missing, or array_key is not a list.
+    """
+    reader = _JSONStreamReader(stream, read_size)
+    reader.take('{')
+    found = False
+    
+    if reader.peek() == '}':
+        reader.pos += 1
+    else:
+        while True:
+            key = reader.value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected an object key but found {key!r}")
+            reader.take(':')
+            
+            if key == array_key:
+                found = True
+                if reader.peek() != '[':
+                    raise ValueError(f"'{array_key}' is not a list")
+                reader.pos += 1
+                if reader.peek() == ']':
+                    reader.pos += 1
+                else:
+                    while True:
+                        yield reader.value()
+                        if reader.take(',]') == ']':
+                            break
+            else:
+                value = reader.value()
+                if header is not None:
+                    header[key] = value
+            
+            if reader.take(',}') == '}':
+                break
+    
+    if not found:
+        keys = list(header.keys()) if header is not None else []
+        raise ValueError(f"'{array_key}' key not found (found keys: {keys})")
+
+
+def cve_in_feed_year(cve_id, year):
+    """Return True if cve_id belongs in the yearly feed for year"""
+    if cve_id.startswith(f"CVE-{year}-"):
+        return True
+    if year == NVD_FIRST_FEED_YEAR:
+        id_year = cve_id[4:8]
+        return id_year.isdigit() and int(id_year) < NVD_FIRST_FEED_YEAR
+    return False
+
 
 class NVDFetcher:
     """Fetches CVE data from NVD using JSON feed downloads"""
@@ -24,49 +182,53 @@ class NVDFetcher:
         self.api_key = "PUT_API_KEY_HERE"  # <-- REPLACE THIS WITH YOUR ACTUAL API KEY
         # =========================================================
         
+        # Overridable so the feed logic can be pointed at a local HTTP server
+        self.feed_base_url = NVD_FEED_BASE_URL
+        
         self.data_dir = Path("data/nvd")
         self.data_dir.mkdir(parents=True, exist_ok=True)
     
-    def validate_json_format(self, json_path):
+    def validate_feed_item(self, cve_item):
         """
-        Pre-flight check: Validate that the JSON file has the expected structure.
+        Pre-flight check: Validate that a feed item has the expected structure.
+        Run against the first items streamed from the feed, so a format change
+        is caught before the rest of the file is parsed.
         Returns True if valid, False otherwise.
         """
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Check for expected top-level keys
-            if 'vulnerabilities' not in data:
-                print(f"ERROR: JSON format changed - 'vulnerabilities' key not found", flush=True)
-                print(f"  Found keys: {list(data.keys())}", flush=True)
-                return False
-            
-            if not isinstance(data['vulnerabilities'], list):
-                print(f"ERROR: JSON format changed - 'vulnerabilities' is not a list", flush=True)
-                return False
-            
-            # Check a sample CVE has expected structure
-            if len(data['vulnerabilities']) > 0:
-                sample = data['vulnerabilities'][0]
-                if 'cve' not in sample:
-                    print(f"ERROR: JSON format changed - 'cve' key not found in vulnerability", flush=True)
-                    print(f"  Found keys: {list(sample.keys())}", flush=True)
-                    return False
-                
-                if 'id' not in sample.get('cve', {}):
-                    print(f"ERROR: JSON format changed - 'id' key not found in cve object", flush=True)
-                    return False
-            
-            print(f"JSON format validation passed.", flush=True)
-            return True
-            
-        except json.JSONDecodeError as e:
-            print(f"ERROR: Invalid JSON file: {e}", flush=True)
+        if not isinstance(cve_item, dict):
+            print(f"ERROR: JSON format changed - vulnerability item is not an object", flush=True)
             return False
-        except Exception as e:
-            print(f"ERROR: Failed to validate JSON: {e}", flush=True)
+        
+        if 'cve' not in cve_item:
+            print(f"ERROR: JSON format changed - 'cve' key not found in vulnerability", flush=True)
+            print(f"  Found keys: {list(cve_item.keys())}", flush=True)
             return False
+        
+        if 'id' not in cve_item.get('cve', {}):
+            print(f"ERROR: JSON format changed - 'id' key not found in cve object", flush=True)
+            return False
+        
+        return True
+    
+    def iter_feed_items(self, gz_path, header=None, digest=None):
+        """
+        Stream the 'vulnerabilities' items out of a yearly .json.gz feed.
+        
+        The feed is decompressed and parsed incrementally, so only one item
+        is held in memory at a time. Top-level keys other than
+        'vulnerabilities' (e.g. totalResults) are collected into header
+        if a dict is passed in. If digest (a hashlib object) is given, the
+        decompressed bytes are fed through it as they are read.
+        """
+        with gzip.open(gz_path, 'rb') as raw:
+            if digest is not None:
+                raw = io.BufferedReader(_HashingReader(raw, digest))
+            with io.TextIOWrapper(raw, encoding='utf-8') as f:
+                yield from iter_json_array_items(f, 'vulnerabilities', header=header)
+                if digest is not None:
+                    # Hash any trailing bytes after the closing brace too
+                    while f.read(FEED_READ_SIZE):
+                        pass
     
     def sanity_check_nvd_data(self, cve_list, target_year):
         """
@@ -95,7 +257,7 @@ class NVDFetcher:
         # 2. Check CVE ID format
         valid_ids = 0
         for cve in sample:
-            if cve.get('cve_id', '').startswith(f'CVE-{target_year}-'):
+            if cve_in_feed_year(cve.get('cve_id', ''), target_year):
                 valid_ids += 1
         
         if valid_ids == 0:
@@ -133,116 +295,20 @@ class NVDFetcher:
         Includes pre-flight validation and sanity checks.
         """
         try:
-            # Construct URL for the current year's feed
-            csv_url = f"https://nvd.nist.gov/feeds/json/cve/2.0/nvdcve-2.0-{year}.json.gz"
-            
-            print(f"Downloading NVD JSON feed for year {year}...", flush=True)
-            print(f"URL: {csv_url}", flush=True)
-            
-            gz_path = self.data_dir / f"nvdcve-2.0-{year}.json.gz"
-            json_path = self.data_dir / f"nvdcve-2.0-{year}.json"
-            
-            # Check if file already exists locally
-            if gz_path.exists():
-                print(f"File already exists locally: {gz_path}", flush=True)
-                print(f"Using existing file. Delete it if you want to re-download.", flush=True)
-            else:
-                # Prepare headers with API key
-                headers = {}
-                if self.api_key and self.api_key != "PUT_API_KEY_HERE":
-                    headers['apiKey'] = self.api_key
-                    print(f"Using API key for authentication (higher rate limits)", flush=True)
-                else:
-                    print(f"WARNING: No valid API key provided. Rate limits will be very low.", flush=True)
-                    print(f"Get a free API key from: https://nvd.nist.gov/developers/request-an-api-key", flush=True)
-                
-                # Download with progress
-                retry_count = 0
-                max_retries = 3
-                success = False
-                
-                while retry_count < max_retries and not success:
-                    try:
-                        response = requests.get(csv_url, timeout=300, stream=True, headers=headers)
-                        
-                        if response.status_code == 200:
-                            total_size = int(response.headers.get('content-length', 0))
-                            downloaded = 0
-                            
-                            with open(gz_path, 'wb') as f:
-                                for chunk in response.iter_content(chunk_size=65536):
-                                    if chunk:
-                                        f.write(chunk)
-                                        downloaded += len(chunk)
-                                        if total_size > 0:
-                                            percent = (downloaded / total_size) * 100
-                                            print(f"  Download progress: {percent:.1f}% ({downloaded / 1024 / 1024:.1f} MB / {total_size / 1024 / 1024:.1f} MB)", flush=True)
-                            
-                            print(f"  Download complete.", flush=True)
-                            success = True
-                        elif response.status_code == 503:
-                            print(f"  Server busy (503). Waiting 60 seconds before retry...", flush=True)
-                            retry_count += 1
-                            time.sleep(60 * (retry_count + 1))
-                        elif response.status_code == 403:
-                            print(f"  API key invalid or rate limit exceeded. Status: {response.status_code}", flush=True)
-                            print(f"  Please check your API key or wait a few minutes.", flush=True)
-                            retry_count += 1
-                            time.sleep(60 * (retry_count + 1))
-                        else:
-                            print(f"  HTTP {response.status_code}, retrying...", flush=True)
-                            retry_count += 1
-                            time.sleep(30 * (retry_count + 1))
-                            
-                    except Exception as e:
-                        print(f"  Download failed: {e}, retrying ({retry_count + 1}/{max_retries})...", flush=True)
-                        retry_count += 1
-                        time.sleep(30 * (retry_count + 1))
-                
-                if not success:
-                    print(f"Failed to download NVD feed for year {year}", flush=True)
-                    return False
+            import_started = datetime.now(timezone.utc)
+            feed_name = self.feed_name(year)
             
-            # Extract JSON
-            print(f"Extracting JSON...", flush=True)
-            with gzip.open(gz_path, 'rb') as f_in:
-                with open(json_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
+            # CHANGE DETECTION: skip everything if the feed is unchanged
+            meta = self.fetch_feed_meta(year)
+            if meta is None:
+                print(f"WARNING: Could not fetch {feed_name}.meta - change detection disabled for this run", flush=True)
+            elif self.feed_unchanged(meta, db_handler.get_feed_meta(feed_name)):
+                print(f"NVD feed for year {year} unchanged since last import "
+                      f"(lastModifiedDate {meta.get('lastModifiedDate', 'unknown')}) - skipping.", flush=True)
+                return True
             
-            # PRE-FLIGHT CHECK: Validate JSON format
-            print(f"Validating JSON format...", flush=True)
-            if not self.validate_json_format(json_path):
-                print(f"JSON format validation failed. The file structure may have changed.", flush=True)
-                print(f"Please check the NVD documentation for format updates.", flush=True)
-                return False
-            
-            # Parse JSON
-            print(f"Parsing JSON...", flush=True)
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            cve_items = data.get('vulnerabilities', [])
-            print(f"Found {len(cve_items):,} CVEs in the feed", flush=True)
-            
-            # Parse and filter for current year
-            all_parsed_cves = []
-            for i, cve_item in enumerate(cve_items):
-                parsed_cve = self.parse_cve(cve_item)
-                if parsed_cve and parsed_cve['description']:
-                    # Double-check year in CVE ID
-                    if f"CVE-{year}-" in parsed_cve['cve_id']:
-                        all_parsed_cves.append(parsed_cve)
-                
-                # Show progress every 10,000 CVEs
-                if (i + 1) % 10000 == 0:
-                    percent = (i + 1) / len(cve_items) * 100
-                    print(f"  Processing progress: {i + 1:,}/{len(cve_items):,} ({percent:.1f}%)", flush=True)
-            
-            print(f"Filtered to {len(all_parsed_cves):,} CVEs for year {year}", flush=True)
-            
-            # SANITY CHECK: Validate the parsed data
-            if not self.sanity_check_nvd_data(all_parsed_cves, year):
-                print(f"Sanity checks failed. Aborting database update.", flush=True)
+            all_parsed_cves = self.prepare_year(year, meta=meta)
+            if all_parsed_cves is None:
                 return False
             
             # Save to database
@@ -253,19 +319,18 @@ class NVDFetcher:
                 print(f"No CVEs found for year {year}", flush=True)
             
             # Cleanup temp files
-            gz_path.unlink(missing_ok=True)
-            json_path.unlink(missing_ok=True)
+            self.feed_path(year).unlink(missing_ok=True)
             
             # Update updates table
-            now = datetime.now().isoformat()
-            conn = sqlite3.connect('data/viper.db')
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT OR REPLACE INTO updates (source, last_run, records_count)
-                VALUES ('nvd', ?, ?)
-            """, (now, len(all_parsed_cves)))
-            conn.commit()
-            conn.close()
+            db_handler.record_update('nvd', len(all_parsed_cves))
+            
+            # Remember what was imported for the next change check
+            if meta is not None:
+                db_handler.record_feed_meta(feed_name, meta.get('sha256'), meta.get('lastModifiedDate'))
+            
+            # Seed the incremental sync high-water mark after the first full import
+            if not db_handler.get_last_update(NVD_SYNC_SOURCE):
+                db_handler.record_update(NVD_SYNC_SOURCE, 0, last_run=(import_started - NVD_FEED_LAG).isoformat())
             
             print(f"\n[OK] Completed: Saved {len(all_parsed_cves):,} CVEs for year {year}", flush=True)
             return True
@@ -276,6 +341,215 @@ class NVDFetcher:
             traceback.print_exc()
             return False
     
+    def feed_name(self, year):
+        """Base name of the NVD feed for a year"""
+        return f"nvdcve-2.0-{year}"
+    
+    def feed_path(self, year):
+        """Local path of the downloaded .json.gz feed for a year"""
+        return self.data_dir / f"{self.feed_name(year)}.json.gz"
+    
+    def fetch_feed_meta(self, year):
+        """
+        Download the small .meta file published alongside a yearly feed.
+        
+        The file is a list of 'key:value' lines (lastModifiedDate, size,
+        zipSize, gzSize, sha256). The sha256 is of the uncompressed JSON.
+        Returns a dictionary of those fields, or None if unavailable.
+        """
+        meta_url = f"{self.feed_base_url}/{self.feed_name(year)}.meta"
+        try:
+            response = requests.get(meta_url, timeout=30)
+            if response.status_code != 200:
+                print(f"  .meta request returned HTTP {response.status_code}", flush=True)
+                return None
+        except Exception as e:
+            print(f"  .meta request failed: {e}", flush=True)
+            return None
+        
+        meta = {}
+        for line in response.text.splitlines():
+            key, sep, value = line.partition(':')
+            if sep:
+                meta[key.strip()] = value.strip()
+        
+        if not meta.get('sha256') and not meta.get('lastModifiedDate'):
+            print(f"  .meta file has no sha256 or lastModifiedDate: {response.text[:100]!r}", flush=True)
+            return None
+        return meta
+    
+    def feed_unchanged(self, meta, previous):
+        """
+        Compare freshly fetched .meta fields to the (sha256, last_modified)
+        recorded at the last import. sha256 is authoritative when present.
+        """
+        if not meta or not previous:
+            return False
+        previous_sha256, previous_modified = previous
+        if meta.get('sha256') and previous_sha256:
+            return meta['sha256'].lower() == previous_sha256.lower()
+        if meta.get('lastModifiedDate') and previous_modified:
+            return meta['lastModifiedDate'] == previous_modified
+        return False
+    
+    def download_feed(self, year):
+        """
+        Download the NVD JSON feed for a year, reusing a local copy if present.
+        Returns the path to the .json.gz file, or None if the download failed.
+        """
+        # Construct URL for the year's feed
+        csv_url = f"{self.feed_base_url}/{self.feed_name(year)}.json.gz"
+        
+        print(f"Downloading NVD JSON feed for year {year}...", flush=True)
+        print(f"URL: {csv_url}", flush=True)
+        
+        gz_path = self.feed_path(year)
+        
+        # Check if file already exists locally
+        if gz_path.exists():
+            print(f"File already exists locally: {gz_path}", flush=True)
+            print(f"Using existing file. Delete it if you want to re-download.", flush=True)
+            return gz_path
+        
+        # Prepare headers with API key
+        headers = {}
+        if self.api_key and self.api_key != "PUT_API_KEY_HERE":
+            headers['apiKey'] = self.api_key
+            print(f"Using API key for authentication (higher rate limits)", flush=True)
+        else:
+            print(f"WARNING: No valid API key provided. Rate limits will be very low.", flush=True)
+            print(f"Get a free API key from: https://nvd.nist.gov/developers/request-an-api-key", flush=True)
+        
+        # Download with progress
+        retry_count = 0
+        max_retries = 3
+        
+        while retry_count < max_retries:
+            try:
+                response = requests.get(csv_url, timeout=300, stream=True, headers=headers)
+                
+                if response.status_code == 200:
+                    total_size = int(response.headers.get('content-length', 0))
+                    downloaded = 0
+                    
+                    with open(gz_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=65536):
+                            if chunk:
+                                f.write(chunk)
+                                downloaded += len(chunk)
+                                if total_size > 0:
+                                    percent = (downloaded / total_size) * 100
+                                    print(f"  Download progress: {percent:.1f}% ({downloaded / 1024 / 1024:.1f} MB / {total_size / 1024 / 1024:.1f} MB)", flush=True)
+                    
+                    print(f"  Download complete.", flush=True)
+                    return gz_path
+                elif response.status_code == 503:
+                    print(f"  Server busy (503). Waiting 60 seconds before retry...", flush=True)
+                    retry_count += 1
+                    time.sleep(60 * (retry_count + 1))
+                elif response.status_code == 403:
+                    print(f"  API key invalid or rate limit exceeded. Status: {response.status_code}", flush=True)
+                    print(f"  Please check your API key or wait a few minutes.", flush=True)
+                    retry_count += 1
+                    time.sleep(60 * (retry_count + 1))
+                else:
+                    print(f"  HTTP {response.status_code}, retrying...", flush=True)
+                    retry_count += 1
+                    time.sleep(30 * (retry_count + 1))
+                    
+            except Exception as e:
+                print(f"  Download failed: {e}, retrying ({retry_count + 1}/{max_retries})...", flush=True)
+                # Don't leave a partial file behind to be reused next run
+                gz_path.unlink(missing_ok=True)
+                retry_count += 1
+                time.sleep(30 * (retry_count + 1))
+        
+        print(f"Failed to download NVD feed for year {year}", flush=True)
+        return None
+    
+    def prepare_year(self, year, meta=None):
+        """
+        Download, parse and sanity check the feed for a year without touching the database.
+        If meta (from fetch_feed_meta) is given, the decompressed feed must
+        match its sha256 - a stale or corrupt local file is re-downloaded once.
+        Returns the list of parsed CVEs, or None if any step failed.
+        """
+        expected_sha256 = (meta or {}).get('sha256')
+        
+        for attempt in range(2):
+            gz_path = self.download_feed(year)
+            if gz_path is None:
+                return None
+            
+            # Stream-parse the feed straight from the .json.gz
+            print(f"Parsing JSON feed...", flush=True)
+            all_parsed_cves, feed_sha256 = self.parse_feed_file(gz_path, year)
+            if all_parsed_cves is None:
+                print(f"Please check the NVD documentation for format updates.", flush=True)
+                return None
+            
+            if not expected_sha256 or feed_sha256 == expected_sha256.lower():
+                break
+            
+            print(f"WARNING: Feed sha256 does not match {self.feed_name(year)}.meta - local file is stale or corrupt.", flush=True)
+            gz_path.unlink(missing_ok=True)
+        else:
+            print(f"ERROR: Downloaded feed still does not match the published sha256.", flush=True)
+            return None
+        
+        print(f"Filtered to {len(all_parsed_cves):,} CVEs for year {year}", flush=True)
+        
+        # SANITY CHECK: Validate the parsed data
+        if not self.sanity_check_nvd_data(all_parsed_cves, year):
+            print(f"Sanity checks failed. Aborting database update.", flush=True)
+            return None
+        
+        return all_parsed_cves
+    
+    def parse_feed_file(self, gz_path, year):
+        """
+        Parse a downloaded yearly feed and keep the CVEs for that year.
+        The first items are structurally validated as they are streamed.
+        Returns (list of parsed CVEs, sha256 hex of the decompressed feed),
+        or (None, None) if the feed is malformed.
+        """
+        header = {}
+        digest = hashlib.sha256()
+        all_parsed_cves = []
+        seen = 0
+        
+        try:
+            for cve_item in self.iter_feed_items(gz_path, header=header, digest=digest):
+                if seen < FEED_VALIDATION_SAMPLE and not self.validate_feed_item(cve_item):
+                    print(f"JSON format validation failed. The file structure may have changed.", flush=True)
+                    return None, None
+                seen += 1
+                if seen == FEED_VALIDATION_SAMPLE:
+                    print(f"JSON format validation passed.", flush=True)
+                
+                parsed_cve = self.parse_cve(cve_item)
+                if parsed_cve and parsed_cve['description']:
+                    # Double-check year in CVE ID
+                    if cve_in_feed_year(parsed_cve['cve_id'], year):
+                        all_parsed_cves.append(parsed_cve)
+                
+                # Show progress every 10,000 CVEs
+                if seen % 10000 == 0:
+                    total_results = header.get('totalResults')
+                    if total_results:
+                        percent = seen / total_results * 100
+                        print(f"  Processing progress: {seen:,}/{total_results:,} ({percent:.1f}%)", flush=True)
+                    else:
+                        print(f"  Processing progress: {seen:,} CVEs", flush=True)
+        except (ValueError, EOFError, OSError) as e:
+            # json.JSONDecodeError is a ValueError; truncated or corrupt gzip
+            # data surfaces as EOFError / OSError
+            print(f"ERROR: Invalid JSON feed: {e}", flush=True)
+            return None, None
+        
+        print(f"Found {seen:,} CVEs in the feed", flush=True)
+        return all_parsed_cves, digest.hexdigest()
+    
     def fetch_cves_by_current_year(self, db_handler):
         """Fetch CVEs for the current year using CSV download."""
         current_year = datetime.now().year
@@ -291,13 +565,15 @@ class NVDFetcher:
         print(f"Saving {total:,} CVEs to database in batches of {batch_size:,}...", flush=True)
         
         saved = 0
+        changed = 0
         for i in range(0, total, batch_size):
             batch = cve_list[i:i+batch_size]
-            db_handler.update_cve_data(batch)
+            changed += db_handler.update_cve_data(batch) or 0
             saved += len(batch)
             percent = (saved / total) * 100
             print(f"  Progress: {saved:,} / {total:,} ({percent:.1f}%)", flush=True)
         
+        print(f"  {changed:,} CVEs new or changed, {saved - changed:,} unchanged (skipped)", flush=True)
         return saved
     
     def fetch_recent_cves(self, days_back=30, limit=None):
@@ -306,9 +582,30 @@ class NVDFetcher:
         
         end = datetime.now()
         start = end - timedelta(days=days_back)
-        start_str = start.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        end_str = end.strftime("%Y-%m-%dT%H:%M:%S.000Z")
         
+        all_cves, _ = self._fetch_api_pages({
+            'pubStartDate': start.strftime(NVD_API_DATE_FORMAT),
+            'pubEndDate': end.strftime(NVD_API_DATE_FORMAT)
+        }, limit=limit)
+        return all_cves
+    
+    def fetch_modified_cves(self, start, end, limit=None):
+        """
+        Fetch CVEs whose lastModified falls between start and end (UTC datetimes).
+        The range must not exceed NVD_API_MAX_RANGE_DAYS.
+        Returns (list of raw CVE items, True if every page was fetched).
+        """
+        print(f"Fetching CVEs modified {start.strftime('%Y-%m-%d %H:%M')} - {end.strftime('%Y-%m-%d %H:%M')} UTC...", flush=True)
+        return self._fetch_api_pages({
+            'lastModStartDate': start.strftime(NVD_API_DATE_FORMAT),
+            'lastModEndDate': end.strftime(NVD_API_DATE_FORMAT)
+        }, limit=limit)
+    
+    def _fetch_api_pages(self, query, limit=None):
+        """
+        Page through the NVD CVE API for the given date-range query.
+        Returns (list of raw CVE items, True if every page was fetched).
+        """
         all_cves = []
         results_per_page = 2000
         start_index = 0
@@ -319,15 +616,12 @@ class NVDFetcher:
         
         try:
             while True:
-                params = {
-                    'pubStartDate': start_str,
-                    'pubEndDate': end_str,
-                    'resultsPerPage': results_per_page,
-                    'startIndex': start_index
-                }
+                params = dict(query)
+                params['resultsPerPage'] = results_per_page
+                params['startIndex'] = start_index
                 
                 response = requests.get(
-                    "https://services.nvd.nist.gov/rest/json/cves/2.0",
+                    NVD_API_URL,
                     headers=headers,
                     params=params,
                     timeout=30
@@ -343,7 +637,7 @@ class NVDFetcher:
                         print(f"  Fetched {len(page_cves)} CVEs (offset {start_index}) - Total so far: {len(all_cves)}", flush=True)
                         
                         total_results = data.get('totalResults', 0)
-                        if start_index + len(page_cves) >= total_results:
+                        if start_index + len(page_cves) >= total_results or not page_cves:
                             break
                             
                         start_index += len(page_cves)
@@ -355,19 +649,63 @@ class NVDFetcher:
                         break
                 elif response.status_code == 403:
                     print("API key required or invalid. Please check your API key.", flush=True)
-                    return []
+                    return [], False
                 else:
                     print(f"API error: {response.status_code}", flush=True)
-                    break
+                    return all_cves, False
                 
                 time.sleep(6)
             
             print(f"Fetched {len(all_cves)} CVEs from NVD", flush=True)
-            return all_cves
+            return all_cves, True
             
         except Exception as e:
             print(f"NVD fetch failed: {e}", flush=True)
-            return []
+            return all_cves, False
+    
+    def sync_modified_cves(self, db_handler):
+        """
+        Incremental NVD sync: upsert only the CVEs modified since the last sync.
+        
+        The high-water mark is kept in the updates table under
+        NVD_SYNC_SOURCE and only advances past windows that were fetched
+        and saved completely. Returns None if there is no high-water mark
+        yet (a full feed import is needed first), otherwise True/False.
+        """
+        last_sync = db_handler.get_last_update(NVD_SYNC_SOURCE)
+        if not last_sync or not last_sync[0]:
+            print("No incremental sync high-water mark found - a full feed import is required.", flush=True)
+            return None
+        
+        window_start = datetime.fromisoformat(last_sync[0])
+        sync_end = datetime.now(timezone.utc)
+        total_saved = 0
+        
+        while window_start < sync_end:
+            window_end = min(window_start + timedelta(days=NVD_API_MAX_RANGE_DAYS), sync_end)
+            
+            cve_items, complete = self.fetch_modified_cves(window_start, window_end)
+            if not complete:
+                print(f"Incremental sync stopped at {window_start.isoformat()} - will resume from there next run.", flush=True)
+                return False
+            
+            parsed_cves = []
+            for cve_item in cve_items:
+                parsed_cve = self.parse_cve(cve_item)
+                if parsed_cve and parsed_cve['cve_id'] and parsed_cve['description']:
+                    parsed_cves.append(parsed_cve)
+            
+            if parsed_cves:
+                self.save_cves_to_database_with_progress(db_handler, parsed_cves)
+                total_saved += len(parsed_cves)
+            
+            # Advance the high-water mark only once the window is saved
+            db_handler.record_update(NVD_SYNC_SOURCE, len(parsed_cves), last_run=window_end.isoformat())
+            window_start = window_end
+        
+        db_handler.record_update('nvd', total_saved)
+        print(f"\n[OK] Incremental sync complete: {total_saved:,} changed CVEs saved", flush=True)
+        return True
     
     def parse_cve(self, cve_data):
         """Extract relevant fields from NVD JSON feed response"""
@@ -390,23 +728,24 @@ class NVDFetcher:
             if not description and descriptions:
                 description = descriptions[0].get('value', '')
             
-            # Get CVSS score
-            cvss_score = 0.0
+            # Get CVSS score (None if NVD has not scored the CVE yet, so it
+            # is not mistaken for a real 0.0)
+            cvss_score = None
             severity = "UNKNOWN"
             
             metrics = cve.get('metrics', {})
             
             if 'cvssMetricV31' in metrics:
                 cvss_data = metrics['cvssMetricV31'][0]
-                cvss_score = cvss_data.get('cvssData', {}).get('baseScore', 0)
+                cvss_score = cvss_data.get('cvssData', {}).get('baseScore')
                 severity = cvss_data.get('cvssData', {}).get('baseSeverity', 'UNKNOWN')
             elif 'cvssMetricV30' in metrics:
                 cvss_data = metrics['cvssMetricV30'][0]
-                cvss_score = cvss_data.get('cvssData', {}).get('baseScore', 0)
+                cvss_score = cvss_data.get('cvssData', {}).get('baseScore')
                 severity = cvss_data.get('cvssData', {}).get('baseSeverity', 'UNKNOWN')
             elif 'cvssMetricV2' in metrics:
                 cvss_data = metrics['cvssMetricV2'][0]
-                cvss_score = cvss_data.get('cvssData', {}).get('baseScore', 0)
+                cvss_score = cvss_data.get('cvssData', {}).get('baseScore')
                 severity = cvss_data.get('baseSeverity', 'UNKNOWN')
             
             published = cve.get('published', '')
@@ -433,6 +772,18 @@ if __name__ == "__main__":
     class MockDB:
         def update_cve_data(self, cves):
             print(f"Would save {len(cves)} CVEs")
+        
+        def get_last_update(self, source):
+            return None
+        
+        def record_update(self, source, records_count, last_run=None):
+            print(f"Would record {source} update: {records_count} records")
+        
+        def get_feed_meta(self, feed):
+            return None
+        
+        def record_feed_meta(self, feed, sha256, last_modified):
+            print(f"Would record {feed} sha256: {sha256}")
     
     print(f"Testing NVD CSV download for year {current_year}...")
     fetcher.fetch_cves_by_csv(current_year, MockDB())
\ No newline at end of file
@@ -0,0 +1,297 @@
+"""
+Background Update Jobs for VIPER
+Runs the updater in a process of its own, started from the dashboard but
+independent of it.
+
+Starting a job records it in the update_jobs table, takes the update
+lockfile and launches a detached runner (python -m src.update_jobs run),
+which runs python -m src.updater with all output going to the job's log
+file, then records the exit code and releases the lock. The dashboard
+only polls the job row and the end of the log, so its script runs stay
+short, and closing the browser tab does not stop the update.
+
+The lockfile holds the ID of the job that owns it, created atomically,
+so a second click - from any tab or session - follows the running job
+instead of launching another update. A lock whose job has finished or
+whose runner has died is treated as stale and replaced.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from src.utils.database_handler import DatabaseHandler
+
+# Held while an update job runs; contains the job ID
+LOCK_FILE = Path("data/update.lock")
+
+# One log file per job
+LOG_DIR = Path("data/logs")
+
+# Statuses of a job that has not finished
+ACTIVE_STATUSES = ('starting', 'running')
+
+# A job still starting after this long never got a runner
+STARTING_TIMEOUT_SECONDS = 60
+
+# Bytes read from the end of a log to show its last lines
+LOG_TAIL_BYTES = 64 * 1024
+
+# Windows process flags for a runner that outlives the dashboard
+_DETACHED_PROCESS = 0x00000008
+_CREATE_NEW_PROCESS_GROUP = 0x00000200
+
+# Runners started by this process, polled so exited ones are reaped
+_launched = []
+
+
+def _pid_alive(pid):
+    """True if a process with this ID is running"""
+    if not pid:
+        return False
+    if sys.platform == 'win32':
+        import ctypes
+        # PROCESS_QUERY_LIMITED_INFORMATION; STILL_ACTIVE exit code
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        ctypes.windll.kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return exit_code.value == 259
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _reap_finished():
+    """
+    Collect the exit status of runners this process started that have
+    exited - until then they still count as running processes
+    """
+    _launched[:] = [process for process in _launched if process.poll() is None]
+
+
+def _is_active(job):
+    """True if a job is starting or running and its runner is still alive"""
+    if job['status'] not in ACTIVE_STATUSES:
+        return False
+    if job['pid'] is None:
+        started = datetime.fromisoformat(job['started_at'])
+        return datetime.now() - started < timedelta(seconds=STARTING_TIMEOUT_SECONDS)
+    return _pid_alive(job['pid'])
+
+
+def get_job(db, job_id=None):
+    """
+    Return an update job as a dictionary, with 'active' set if it is still
+    running. Without a job ID, returns the latest job (None if there is none).
+    """
+    _reap_finished()
+    if job_id is None:
+        rows = db.query("SELECT * FROM update_jobs ORDER BY id DESC LIMIT 1")
+    else:
+        rows = db.query("SELECT * FROM update_jobs WHERE id = ?", (job_id,))
+    if not rows:
+        return None
+    job = rows[0]
+    job['args'] = json.loads(job['args'])
+    job['active'] = _is_active(job)
+    return job
+
+
+def _finish_job(db, job_id, status, exit_code=None):
+    """Record how a job ended"""
+    with db.connections.writer() as conn:
+        conn.execute(
+            "UPDATE update_jobs SET status = ?, exit_code = ?, finished_at = ? WHERE id = ?",
+            (status, exit_code, datetime.now().isoformat(), job_id)
+        )
+
+
+def _read_lock():
+    """ID of the job holding the update lock, or None if it is free"""
+    try:
+        return int(LOCK_FILE.read_text().strip() or 0) or None
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        # Written by a launcher that died mid-write
+        return 0
+
+
+def _lock_age():
+    """Seconds since the lockfile was written (0 if there is none)"""
+    try:
+        return datetime.now().timestamp() - LOCK_FILE.stat().st_mtime
+    except FileNotFoundError:
+        return 0
+
+
+def _take_lock(job_id):
+    """Create the lockfile for a job; False if another job holds it"""
+    LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as f:
+        f.write(str(job_id))
+    return True
+
+
+def _release_lock(job_id):
+    """Remove the lockfile if it still belongs to this job"""
+    if _read_lock() == job_id:
+        try:
+            LOCK_FILE.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def start_update_job(db, args=()):
+    """
+    Start python -m src.updater [args] as a background job, unless one is
+    already running.
+    
+    Args:
+        db: DatabaseHandler holding the update_jobs table
+        args: Updater arguments (none for a full update)
+    
+    Returns:
+        (job, started) - the new job, or the one already running with
+        started False
+    """
+    for _ in range(3):
+        holder = _read_lock()
+        if holder == 0 and _lock_age() < STARTING_TIMEOUT_SECONDS:
+            # Just created by another launcher that has not written its job ID yet
+            return get_job(db), False
+        if holder is not None:
+            job = get_job(db, holder) if holder else None
+            if job and job['active']:
+                return job, False
+            # The holder finished without releasing the lock, or its runner died
+            if job and job['status'] in ACTIVE_STATUSES:
+                _finish_job(db, job['id'], 'failed')
+            print(f"Removing stale update lock (job {holder})")
+            _release_lock(holder)
+        
+        with db.connections.writer() as conn:
+            cursor = conn.execute(
+                "INSERT INTO update_jobs (args, status, started_at) VALUES (?, 'starting', ?)",
+                (json.dumps(list(args)), datetime.now().isoformat())
+            )
+            job_id = cursor.lastrowid
+        if _take_lock(job_id):
+            break
+        # Another launcher took the lock first - follow its job instead
+        with db.connections.writer() as conn:
+            conn.execute("DELETE FROM update_jobs WHERE id = ?", (job_id,))
+    else:
+        print("Could not take the update lock")
+        return get_job(db), False
+    
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_path = LOG_DIR / f"update_job_{job_id}.log"
+    
+    command = [sys.executable, "-u", "-m", "src.update_jobs", "run", str(job_id),
+               "--db", str(Path(db.db_path).resolve())]
+    if sys.platform == 'win32':
+        detach = {'creationflags': _DETACHED_PROCESS | _CREATE_NEW_PROCESS_GROUP}
+    else:
+        detach = {'start_new_session': True}
+    
+    try:
+        with open(log_path, 'w') as log:
+            process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log,
+                                       stderr=subprocess.STDOUT, close_fds=True, **detach)
+    except Exception as e:
+        print(f"Could not start update job {job_id}: {e}")
+        _finish_job(db, job_id, 'failed')
+        _release_lock(job_id)
+        return get_job(db, job_id), False
+    
+    with db.connections.writer() as conn:
+        conn.execute("UPDATE update_jobs SET pid = ?, log_path = ? WHERE id = ?",
+                     (process.pid, str(log_path), job_id))
+    # Remember the runner so it is reaped once it exits
+    _launched.append(process)
+    return get_job(db, job_id), True
+
+
+def run_job(job_id, db_path=None):
+    """
+    Run an update job to completion (the detached runner's entry point).
+    Output goes to the job's log file, set up as stdout by the launcher.
+    
+    Returns:
+        The updater's exit code
+    """
+    db = DatabaseHandler(db_path)
+    job = get_job(db, job_id)
+    if job is None:
+        print(f"Update job {job_id} not found")
+        return 2
+    
+    with db.connections.writer() as conn:
+        conn.execute("UPDATE update_jobs SET status = 'running', pid = ? WHERE id = ?",
+                     (os.getpid(), job_id))
+    print(f"Update job {job_id} started {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", flush=True)
+    
+    exit_code = 1
+    try:
+        exit_code = subprocess.call([sys.executable, "-u", "-m", "src.updater", *job['args']],
+                                    stdin=subprocess.DEVNULL)
+    finally:
+        _finish_job(db, job_id, 'succeeded' if exit_code == 0 else 'failed', exit_code)
+        _release_lock(job_id)
+        print(f"Update job {job_id} finished with exit code {exit_code}", flush=True)
+    return exit_code
+
+
+def tail_log(log_path, lines=50):
+    """Return the last lines of a job's log file ('' if there is none yet)"""
+    if not log_path:
+        return ""
+    try:
+        with open(log_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - LOG_TAIL_BYTES))
+            text = f.read().decode('utf-8', errors='replace')
+    except FileNotFoundError:
+        return ""
+    return "\n".join(text.splitlines()[-lines:])
+
+
+if __name__ == "__main__":
+    # python -m src.update_jobs run JOB_ID [--db PATH]   (started by start_update_job)
+    # python -m src.update_jobs start [updater args...]
+    # python -m src.update_jobs status
+    cmd = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    
+    if cmd == 'run':
+        db_path = sys.argv[sys.argv.index('--db') + 1] if '--db' in sys.argv else None
+        sys.exit(run_job(int(sys.argv[2]), db_path))
+    
+    db = DatabaseHandler()
+    if cmd == 'start':
+        job, started = start_update_job(db, sys.argv[2:])
+        print(f"{'Started' if started else 'Already running:'} update job {job['id']} - log: {job['log_path']}")
+    else:
+        job = get_job(db)
+        if job is None:
+            print("No update jobs yet")
+        else:
+            state = "running" if job['active'] else job['status']
+            print(f"Job {job['id']} ({' '.join(job['args']) or 'full update'}): {state}, "
+                  f"started {job['started_at'][:19]}")
+            print(tail_log(job['log_path'], lines=20))
@@ -1,17 +1,23 @@
 """
 Master Updater for VIPER
-Runs all data fetchers in sequence
+Runs all data fetchers - downloads concurrently, database steps in dependency order
 NVD is CRITICAL - update fails if NVD fails
 """
 
 import time
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
-from src.nvd_fetcher import NVDFetcher
+from src.nvd_fetcher import NVDFetcher, NVD_FIRST_FEED_YEAR
+from src.nvd_backfill import run_backfill, parse_year_range, DEFAULT_WORKERS
 from src.kev_fetcher import KEVFetcher
 from src.data_collection.epss_fetcher import EPSSFetcher
+from src.data_collection.epss_backfill import (
+    run_epss_backfill, parse_day, date_range, DEFAULT_DOWNLOAD_WORKERS
+)
 from src.utils.database_handler import DatabaseHandler
+from src.utils.sector_tags import SectorTagger
+from src.utils.stages import Stage, run_stages, print_stage_timings
 
 class VIPERUpdater:
     """Orchestrates all data updates - NVD is CRITICAL"""
@@ -21,30 +27,35 @@ class VIPERUpdater:
         self.kev_fetcher = KEVFetcher()
         self.epss_fetcher = EPSSFetcher()
         self.db = DatabaseHandler()
-        
+    
     def run_all_updates(self):
-        """Run complete update cycle - NVD failure stops everything"""
+        """
+        Run complete update cycle - NVD failure stops everything.
+        
+        The KEV catalog and EPSS scores are downloaded and checked while
+        NVD updates, since none of the downloads depend on another. KEV
+        status and EPSS scores are only applied once NVD has finished, so
+        CVEs that are new in this update are marked and scored too.
+        """
         print("\n" + "="*60)
         print(f"VIPER UPDATE - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("="*60)
         
-        # Step 1: CISA KEV Catalog (fastest, provides immediate feedback)
-        print("\nSTEP 1: CISA KEV Catalog")
-        kev_data = self.kev_fetcher.fetch_catalog()
-        if kev_data:
-            kev_set = self.kev_fetcher.get_kev_set()
-            self.db.update_kev_status(kev_set)
-            print("KEV update successful")
-        else:
-            print("WARNING: KEV update failed - continuing anyway")
-        
-        # Step 2: NVD CVE Data (CRITICAL - fetch ALL CVEs in batches)
-        print("\nSTEP 2: NVD CVE Data (CRITICAL)")
-        print("Fetching ALL CVEs from NVD in batches (this may take 10-30 minutes)...")
+        stages = [
+            # CISA KEV Catalog, NVD CVE Data (CRITICAL) and EPSS Scores, concurrently
+            Stage('kev_fetch', lambda results: self.kev_fetcher.fetch_catalog()),
+            Stage('nvd', lambda results: self.update_nvd(), critical=True),
+            Stage('epss_fetch', lambda results: self.epss_fetcher.fetch_scores()),
+            # Then the steps that need the NVD data in the database
+            Stage('sector_tags', self._refresh_tags_stage, deps=['nvd']),
+            Stage('kev_apply', self._apply_kev_stage, deps=['kev_fetch', 'nvd']),
+            Stage('epss_apply', self._apply_epss_stage, deps=['epss_fetch', 'nvd']),
+        ]
+        print("\nDownloading CISA KEV, NVD and EPSS data concurrently (output is prefixed by stage)")
+        runs = run_stages(stages)
+        print_stage_timings(stages, runs)
         
-        success = self.nvd_fetcher.fetch_cves_by_current_year(self.db)
-        
-        if not success:
+        if runs['nvd']['status'] != 'ok':
             print("\n" + "!"*60)
             print("CRITICAL FAILURE: NVD FETCH FAILED")
             print("VIPER cannot function without CVE descriptions")
@@ -52,12 +63,14 @@ class VIPERUpdater:
             print("!"*60 + "\n")
             return False
         
-        print("NVD update successful - database populated")
+        print("\nNVD update successful - database populated")
         
-        # Step 3: EPSS Scores (nice to have, not critical)
-        print("\nSTEP 3: EPSS Scores")
-        epss_success = self.epss_fetcher.update_database()
-        if epss_success:
+        if runs['kev_apply']['status'] == 'ok':
+            print("KEV update successful")
+        else:
+            print("WARNING: KEV update failed - continuing anyway")
+        
+        if runs['epss_apply']['status'] == 'ok':
             print("EPSS update successful")
         else:
             print("WARNING: EPSS update failed - continuing anyway")
@@ -67,15 +80,54 @@ class VIPERUpdater:
         print("="*60 + "\n")
         return True
     
+    def _refresh_tags_stage(self, results):
+        """
+        New CVEs are tagged as they are saved; a full retag is only
+        needed when keywords.json changed since the last one
+        """
+        self.refresh_sector_tags()
+        return True
+    
+    def _apply_kev_stage(self, results):
+        """Store the downloaded KEV catalog and mark the CVEs in it"""
+        return self.db.update_kev_catalog(self.kev_fetcher.get_kev_entries())
+    
+    def _apply_epss_stage(self, results):
+        """Replace the stored EPSS scores with the downloaded ones"""
+        return self.epss_fetcher.save_scores(results['epss_fetch'])
+    
+    def refresh_sector_tags(self, force=False):
+        """Rebuild stored sector tags if the keywords changed (or always, if force=True)"""
+        tagger = SectorTagger(self.db)
+        if force:
+            tagger.retag_all()
+        else:
+            tagger.retag_if_stale()
+    
     def run_epss_only(self):
         """Run only EPSS update"""
         print("Running EPSS update only...")
         self.epss_fetcher.update_database()
     
-    def run_nvd_only(self):
-        """Run only NVD update (CRITICAL) - fetches CVEs for current year"""
-        print("Running NVD update only (fetching CVEs for current year)...")
-        success = self.nvd_fetcher.fetch_cves_by_current_year(self.db)
+    def update_nvd(self, full=False):
+        """
+        Bring NVD data up to date.
+        Uses the incremental lastModified sync when a high-water mark exists,
+        otherwise (or when full=True) imports the whole current-year feed.
+        """
+        if not full:
+            print("Syncing CVEs modified since the last NVD update...")
+            success = self.nvd_fetcher.sync_modified_cves(self.db)
+            if success is not None:
+                return success
+        
+        print("Fetching ALL CVEs for the current year from the NVD feed (this may take 10-30 minutes)...")
+        return self.nvd_fetcher.fetch_cves_by_current_year(self.db)
+    
+    def run_nvd_only(self, full=False):
+        """Run only NVD update (CRITICAL) - incremental sync, or the current-year feed if full=True"""
+        print("Running NVD update only...")
+        success = self.update_nvd(full=full)
         if success:
             print("NVD update successful")
             return True
@@ -83,13 +135,51 @@ class VIPERUpdater:
             print("CRITICAL ERROR: NVD update FAILED")
             return False
     
+    def run_backfill(self, years, workers=DEFAULT_WORKERS):
+        """
+        Load historical NVD feeds for the given years in parallel.
+        Older CVEs still appear in KEV and carry high EPSS, so KEV status is
+        re-applied afterwards from the cached catalog.
+        """
+        print(f"Running NVD backfill for {len(years)} years...")
+        summary = run_backfill(years, db_path=self.db.db_path,
+                               api_key=self.nvd_fetcher.api_key, workers=workers)
+        
+        if not any(result['ok'] for result in summary):
+            print("CRITICAL ERROR: NVD backfill FAILED for every year")
+            return False
+        
+        kev_entries = self.kev_fetcher.get_kev_entries()
+        if kev_entries:
+            self.db.update_kev_catalog(kev_entries)
+        
+        return all(result['ok'] for result in summary)
+    
+    def run_epss_backfill(self, days, source_dir=None, workers=DEFAULT_DOWNLOAD_WORKERS):
+        """
+        Record dated EPSS archives in the score history. Only the history
+        changes; current scores come from the daily EPSS update.
+        """
+        print(f"Running EPSS history backfill for {len(days)} days...")
+        summary = run_epss_backfill(days, db_path=self.db.db_path, source_dir=source_dir,
+                                    download_workers=workers)
+        return not any(result['status'] == 'failed' for result in summary)
+    
     def run_kev_only(self):
         """Run only KEV update"""
         print("Running KEV update only...")
         kev_data = self.kev_fetcher.fetch_catalog()
         if kev_data:
-            kev_set = self.kev_fetcher.get_kev_set()
-            self.db.update_kev_status(kev_set)
+            self.db.update_kev_catalog(self.kev_fetcher.get_kev_entries())
+
+
+def _option_value(args, name, default=None):
+    """Return the value following a --name option in args, or default"""
+    if name in args:
+        index = args.index(name)
+        if index + 1 < len(args):
+            return args[index + 1]
+    return default
 
 
 if __name__ == "__main__":
@@ -102,11 +192,45 @@ if __name__ == "__main__":
         if cmd == 'epss':
             updater.run_epss_only()
         elif cmd == 'nvd':
-            success = updater.run_nvd_only()
+            # python -m src.updater nvd [--full]
+            success = updater.run_nvd_only(full='--full' in sys.argv)
             if not success:
                 sys.exit(1)
         elif cmd == 'kev':
             updater.run_kev_only()
+        elif cmd == 'retag':
+            # python -m src.updater retag
+            updater.refresh_sector_tags(force=True)
+        elif cmd == 'check-indexes':
+            # python -m src.updater check-indexes
+            if not updater.db.check_query_plans():
+                sys.exit(1)
+        elif cmd == 'backfill':
+            # python -m src.updater backfill --years 2002-2026 [--workers 4]
+            default_years = f"{NVD_FIRST_FEED_YEAR}-{datetime.now().year}"
+            try:
+                years = parse_year_range(_option_value(sys.argv, '--years', default_years))
+                workers = int(_option_value(sys.argv, '--workers', DEFAULT_WORKERS))
+            except ValueError as e:
+                print(f"Invalid backfill options: {e}")
+                sys.exit(2)
+            success = updater.run_backfill(years, workers=workers)
+            if not success:
+                sys.exit(1)
+        elif cmd == 'epss-backfill':
+            # python -m src.updater epss-backfill --from 2025-01-01 [--to 2025-12-31] [--source DIR] [--workers 4]
+            try:
+                start = parse_day(_option_value(sys.argv, '--from', ''))
+                end = parse_day(_option_value(sys.argv, '--to', (datetime.now().date() - timedelta(days=1)).isoformat()))
+                days = date_range(start, end)
+                workers = int(_option_value(sys.argv, '--workers', DEFAULT_DOWNLOAD_WORKERS))
+            except ValueError as e:
+                print(f"Invalid EPSS backfill options: {e}")
+                sys.exit(2)
+            success = updater.run_epss_backfill(days, source_dir=_option_value(sys.argv, '--source'),
+                                                workers=workers)
+            if not success:
+                sys.exit(1)
         else:
             success = updater.run_all_updates()
             if not success:
@@ -1,6 +1,7 @@
 """
 Database Handler for VIPER
 Reads from epss_scores table with real data and sector assignment
+All connections come from the shared ConnectionManager (WAL mode)
 """
 
 import sqlite3
@@ -8,176 +9,636 @@ import pandas as pd
 from pathlib import Path
 from datetime import datetime
 
+from .db_connection import DEFAULT_DB_PATH, get_connection_manager
+from .epss_history import get_epss_movers, record_epss_history
+from .fulltext import candidate_condition, ensure_fulltext_index, text_matcher
+from .migrations import apply_migrations
+from .pagination import DEFAULT_PAGE_SIZE, PAGE_SORT_KEYS, keyset_branches, order_by, page_cursor
+from .priority import priority_label, refresh_priorities
+from .sector_tags import SectorTagger
+
+# CVEs in priority order, read straight off idx_cves_priority, with the
+# sectors they are tagged with (comma-separated, NULL if none)
+PRIORITIZED_CVES_QUERY = """
+    SELECT c.cve_id, c.description, c.cvss_score, c.in_kev, e.epss_score,
+           c.priority_tier, c.risk_score,
+           (SELECT group_concat(DISTINCT m.sector) FROM cve_sector_matches m
+            WHERE m.cve_id = c.cve_id) AS sectors
+    FROM cves c
+    LEFT JOIN epss_scores e ON c.cve_id = e.cve_id
+    ORDER BY c.priority_tier, c.epss_score DESC, c.cvss_score DESC
+    LIMIT ?
+"""
+
+# CVEs tagged with one sector, in priority order, with their matched keywords.
+# Driven from the sector's tags: a sector is a small slice of the catalogue,
+# so sorting just its CVEs beats walking the whole priority index to find them
+SECTOR_CVES_QUERY = """
+    SELECT c.cve_id, c.description, c.cvss_score, c.in_kev, e.epss_score,
+           c.priority_tier, c.risk_score,
+           (SELECT group_concat(keyword, ', ') FROM (
+                SELECT DISTINCT m.keyword FROM cve_sector_matches m
+                WHERE m.cve_id = c.cve_id AND m.sector = :sector
+            )) AS matched_keywords
+    FROM cves c
+    LEFT JOIN epss_scores e ON c.cve_id = e.cve_id
+    WHERE c.cve_id IN (
+        SELECT m.cve_id FROM cve_sector_matches m WHERE m.sector = :sector
+    )
+    ORDER BY c.priority_tier, c.epss_score DESC, c.cvss_score DESC
+    LIMIT :limit
+"""
+
+# CVEs passing a full-text candidate condition, optionally within a sector,
+# in priority order
+SEARCH_CVES_QUERY = """
+    SELECT c.cve_id, c.description, c.cvss_score, c.in_kev, e.epss_score,
+           c.priority_tier, c.risk_score
+    FROM cves c
+    LEFT JOIN epss_scores e ON c.cve_id = e.cve_id
+    WHERE {condition}
+    ORDER BY c.priority_tier, c.epss_score DESC, c.cvss_score DESC
+"""
+
+SECTOR_KEYWORDS_SQL = """
+    (SELECT group_concat(keyword, ', ') FROM (
+        SELECT DISTINCT m.keyword FROM cve_sector_matches m
+        WHERE m.cve_id = c.cve_id AND m.sector = :sector
+    ))
+"""
+
+SECTOR_CONDITION = """
+    EXISTS (SELECT 1 FROM cve_sector_matches m WHERE m.cve_id = c.cve_id AND m.sector = :sector)
+"""
+
+# One page of a CVE table (see src/utils/pagination.py). Each branch is
+# filled in with its own condition, ordering and a branch number; with a
+# sector, the CVE's keywords matched in that sector are listed too
+CVE_PAGE_BRANCH = """
+    SELECT * FROM (
+        SELECT c.id, c.cve_id, c.description, c.cvss_score, c.in_kev, c.epss_score,
+               c.priority_tier, c.risk_score,
+               (SELECT group_concat(DISTINCT m.sector) FROM cve_sector_matches m
+                WHERE m.cve_id = c.cve_id) AS sectors,
+               {keywords} AS matched_keywords,
+               {branch} AS branch
+        FROM cves c
+        WHERE {filters} AND {condition}
+        ORDER BY {order}
+        LIMIT :page_size
+    )
+"""
+
+# EPSS rows are replaced whole, so a re-sent CVE overwrites its old score
+EPSS_INSERT = """
+    INSERT OR REPLACE INTO {table} (cve_id, epss_score, percentile, date)
+    VALUES (?, ?, ?, ?)
+"""
+
+# A full EPSS load is written here first and swapped in once complete.
+# Same layout as epss_scores (see migration 9).
+EPSS_STAGING_SCHEMA = """
+    CREATE TABLE epss_scores_staging (
+        cve_id TEXT PRIMARY KEY,
+        epss_score REAL,
+        percentile REAL,
+        date TEXT
+    ) WITHOUT ROWID
+"""
+
+# UPDATE ... FROM (a join in an UPDATE) arrived in SQLite 3.33
+HAS_UPDATE_FROM = sqlite3.sqlite_version_info >= (3, 33, 0)
+
+# CVEs with no sector tag, in priority order
+UNCATEGORIZED_CVES_QUERY = """
+    SELECT c.cve_id, c.description, c.cvss_score, c.in_kev,
+           COALESCE(e.epss_score, 0) AS epss_score, c.priority_tier
+    FROM cves c
+    LEFT JOIN epss_scores e ON c.cve_id = e.cve_id
+    WHERE NOT EXISTS (SELECT 1 FROM cve_sector_matches m WHERE m.cve_id = c.cve_id)
+    ORDER BY c.priority_tier, c.epss_score DESC, c.cvss_score DESC
+    LIMIT ?
+"""
+
+# KEV catalog entries by remediation due date, read off the due date index
+KEV_ENTRIES_QUERY = """
+    SELECT k.cve_id, k.vendor_project, k.product, k.vulnerability_name,
+           k.date_added, k.due_date, k.known_ransomware,
+           c.priority_tier, c.epss_score
+    FROM kev_entries k
+    LEFT JOIN cves c ON c.cve_id = k.cve_id
+    WHERE k.due_date >= ?
+    ORDER BY k.due_date, k.cve_id
+    LIMIT ?
+"""
+
+def copy_epss_to_cves(cursor):
+    """
+    Copy each CVE's score from epss_scores onto cves.epss_score, which the
+    priority index orders by. One set-based statement; only rows whose
+    stored score differs are written.
+    
+    Returns:
+        Number of CVEs whose score changed
+    """
+    if HAS_UPDATE_FROM:
+        cursor.execute('''
+            UPDATE cves SET epss_score = e.epss_score
+            FROM epss_scores e
+            WHERE e.cve_id = cves.cve_id
+              AND cves.epss_score IS NOT e.epss_score
+        ''')
+    else:
+        cursor.execute('''
+            UPDATE cves
+            SET epss_score = (SELECT e.epss_score FROM epss_scores e WHERE e.cve_id = cves.cve_id)
+            WHERE cve_id IN (SELECT cve_id FROM epss_scores)
+              AND epss_score IS NOT (SELECT e.epss_score FROM epss_scores e WHERE e.cve_id = cves.cve_id)
+        ''')
+    return cursor.rowcount
+
+
 class DatabaseHandler:
     """Handles all database operations for VIPER"""
     
     def __init__(self, db_path=None):
         if db_path is None:
-            self.db_path = Path("data/viper.db")
+            self.db_path = DEFAULT_DB_PATH
         else:
             self.db_path = Path(db_path)
         
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connections = get_connection_manager(self.db_path)
         self.init_database()
     
     def init_database(self):
-        """Initialize database tables if they don't exist"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cves (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                cve_id TEXT UNIQUE,
-                description TEXT,
-                published_date TEXT,
-                cvss_score REAL,
-                severity TEXT,
-                epss_score REAL DEFAULT 0,
-                in_kev INTEGER DEFAULT 0,
-                risk_score REAL,
-                last_updated TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS epss_scores (
-                cve_id TEXT PRIMARY KEY,
-                epss_score REAL,
-                percentile REAL,
-                date TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS updates (
-                source TEXT PRIMARY KEY,
-                last_run TEXT,
-                records_count INTEGER
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """
+        Create or upgrade the schema by applying any pending migrations,
+        and add the full-text index if it was skipped by an older SQLite
+        """
+        with self.connections.writer() as conn:
+            apply_migrations(conn)
+            ensure_fulltext_index(conn)
+            # Rows added or reset by a migration get their priority filled in
+            refresh_priorities(conn.cursor(), "priority_tier IS NULL")
+    
+    def refresh_priorities(self, where=None, params=()):
+        """
+        Recompute stored priority tiers and risk scores after CVSS, EPSS or
+        KEV data changes. See src/utils/priority.py.
+        """
+        with self.connections.writer() as conn:
+            return refresh_priorities(conn.cursor(), where, params)
+    
+    def update_cve_epss(self):
+        """
+        Bring cves.epss_score and the stored priorities in line with
+        epss_scores. Returns the number of CVEs whose score changed.
+        """
+        with self.connections.writer() as conn:
+            cursor = conn.cursor()
+            changed = copy_epss_to_cves(cursor)
+            refresh_priorities(cursor)
+        return changed
     
     def update_cve_data(self, cve_list, batch_size=5000):
-        """Insert or update CVEs from NVD in batches for speed"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """
+        Upsert CVEs from NVD in batches for speed.
         
+        Existing rows keep their id, epss_score and in_kev - only the
+        NVD-owned columns are rewritten, and only when NVD's lastModified
+        differs from what is stored. Returns the number of rows inserted
+        or changed.
+        
+        Everything is written in one transaction, committed by the
+        outermost writer() block - the caller's, if it holds one. Callers
+        wanting each batch durable on its own call this once per batch.
+        """
         now = datetime.now().isoformat()
         count = 0
         
-        # Process in batches
-        for i in range(0, len(cve_list), batch_size):
-            batch = cve_list[i:i+batch_size]
+        with self.connections.writer() as conn:
+            cursor = conn.cursor()
+            changed = 0
             
-            # Use executemany for batch INSERT
-            data = []
-            for cve in batch:
-                data.append((
-                    cve['cve_id'],
-                    cve['description'],
-                    cve.get('published_date', now),
-                    cve['cvss_score'],
-                    cve.get('severity', 'UNKNOWN'),
-                    now
-                ))
+            # Process in batches
+            for i in range(0, len(cve_list), batch_size):
+                batch = cve_list[i:i+batch_size]
+                
+                # Use executemany for batch upsert
+                data = []
+                for cve in batch:
+                    data.append((
+                        cve['cve_id'],
+                        cve['description'],
+                        cve.get('published_date', now),
+                        cve['cvss_score'],
+                        cve.get('severity', 'UNKNOWN'),
+                        cve.get('last_modified') or None,
+                        now
+                    ))
+                
+                # Rows without a lastModified stamp are always rewritten
+                cursor.executemany('''
+                    INSERT INTO cves
+                    (cve_id, description, published_date, cvss_score, severity, last_modified, last_updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(cve_id) DO UPDATE SET
+                        description = excluded.description,
+                        published_date = excluded.published_date,
+                        cvss_score = excluded.cvss_score,
+                        severity = excluded.severity,
+                        last_modified = excluded.last_modified,
+                        last_updated = excluded.last_updated,
+                        priority_tier = NULL
+                    WHERE excluded.last_modified IS NULL
+                       OR cves.last_modified IS NOT excluded.last_modified
+                ''', data)
+                # rowcount excludes the rows the full-text triggers write
+                changed += cursor.rowcount
+                count += len(batch)
             
-            cursor.executemany('''
-                INSERT OR REPLACE INTO cves 
-                (cve_id, description, published_date, cvss_score, severity, last_updated)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', data)
+            cursor.execute('''
+                INSERT OR REPLACE INTO updates (source, last_run, records_count)
+                VALUES ('nvd', ?, ?)
+            ''', (now, count))
             
-            conn.commit()
-            count += len(batch)
+            # New and changed rows have no tier or sector tags yet
+            if changed:
+                refresh_priorities(cursor, "priority_tier IS NULL")
+                SectorTagger(self).tag_updated(cursor, (cve['cve_id'] for cve in cve_list), now)
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO updates (source, last_run, records_count)
-            VALUES ('nvd', ?, ?)
-        ''', (now, count))
-        
-        conn.commit()
-        conn.close()
-        return count
+        return changed
     
     def update_epss_scores(self, df, append_mode=False, update_cves=True):
         """
         Update EPSS scores in database.
-        If append_mode=True, appends to existing table (for batch updates).
+        If append_mode=True, adds to or overwrites rows in the existing table (for batch updates).
         If append_mode=False, replaces entire table (for full updates).
         If update_cves=False, skips updating the cves table (for batch speed).
+        
+        A full replace is loaded into epss_scores_staging and then swapped
+        in with a rename, so readers see either the complete old scores or
+        the complete new ones - never an empty or half-filled table. The
+        swapped-in scores are also recorded in the EPSS history for their
+        date (see src/utils/epss_history.py).
         """
-        conn = sqlite3.connect(self.db_path)
+        columns = ['cve_id', 'epss_score', 'percentile', 'date']
         
-        if append_mode:
-            # Append to existing table (for batch updates)
-            df.to_sql('epss_scores', conn, if_exists='append', index=False)
-            print(f"EPSS batch appended with {len(df)} records")
-        else:
-            # Replace entire table (for full updates)
-            df.to_sql('epss_scores', conn, if_exists='replace', index=False)
-            print(f"EPSS table replaced with {len(df)} records")
+        if not append_mode:
+            self.load_epss_staging(df[columns])
         
-        # Only update cves table if requested (skip during batches for speed)
-        if update_cves:
+        with self.connections.writer() as conn:
+            # The swap is DDL, which does not open a transaction implicitly;
+            # without one each statement would commit on its own. The history
+            # and the copy onto cves join the same transaction.
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
             cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE cves 
-                SET epss_score = (
-                    SELECT epss_score FROM epss_scores 
-                    WHERE epss_scores.cve_id = cves.cve_id
-                )
-                WHERE cve_id IN (SELECT cve_id FROM epss_scores)
-            ''')
+            if append_mode:
+                # Add to existing table (for batch updates)
+                rows = df[columns].itertuples(index=False, name=None)
+                cursor.executemany(EPSS_INSERT.format(table='epss_scores'), rows)
+                print(f"EPSS batch appended with {len(df)} records")
+            else:
+                swapped = self._swap_epss_staging(cursor, df['cve_id'].nunique())
+                print(f"EPSS table replaced with {swapped} records")
+                if swapped:
+                    record_epss_history(cursor, df['date'].max())
             
-            now = datetime.now().isoformat()
-            cursor.execute('''
-                INSERT OR REPLACE INTO updates (source, last_run, records_count)
-                VALUES ('epss', ?, ?)
-            ''', (now, len(df)))
-            print(f"EPSS database fully updated with {len(df)} records")
+            # Only update cves table if requested (skip during batches for speed)
+            if update_cves:
+                copy_epss_to_cves(cursor)
+                refresh_priorities(cursor)
+                
+                now = datetime.now().isoformat()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO updates (source, last_run, records_count)
+                    VALUES ('epss', ?, ?)
+                ''', (now, len(df)))
+                print(f"EPSS database fully updated with {len(df)} records")
+    
+    def load_epss_staging(self, df):
+        """
+        Bulk-load EPSS rows (cve_id, epss_score, percentile, date) into a
+        fresh epss_scores_staging table. The live table is not touched.
+        """
+        with self.connections.writer() as conn:
+            # A staging table left by an interrupted load is discarded
+            conn.execute("DROP TABLE IF EXISTS epss_scores_staging")
+            conn.execute(EPSS_STAGING_SCHEMA)
+            # Rows go in in key order, which appends to the clustered B-tree
+            # instead of splitting pages
+            rows = df.sort_values('cve_id').itertuples(index=False, name=None)
+            conn.executemany(EPSS_INSERT.format(table='epss_scores_staging'), rows)
+    
+    def _swap_epss_staging(self, cursor, expected_count):
+        """
+        Replace epss_scores with the staging table inside the caller's
+        transaction and return the number of rows swapped in. Raises,
+        leaving the live table as it was, if the staging table does not
+        hold the expected number of rows.
+        """
+        cursor.execute("SELECT COUNT(*) FROM epss_scores_staging")
+        staged = cursor.fetchone()[0]
+        if staged != expected_count:
+            raise ValueError(f"EPSS staging table has {staged:,} rows, expected {expected_count:,}")
         
-        conn.commit()
-        conn.close()
+        cursor.execute("DROP TABLE epss_scores")
+        cursor.execute("ALTER TABLE epss_scores_staging RENAME TO epss_scores")
+        # Index names are global, so the score index is built after the rename
+        cursor.execute("CREATE INDEX idx_epss_scores_epss_score ON epss_scores(epss_score)")
+        return staged
     
     def clear_epss_table(self):
         """Clear all EPSS records before daily update"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM epss_scores")
-        conn.commit()
-        conn.close()
+        with self.connections.writer() as conn:
+            conn.execute("DELETE FROM epss_scores")
         print("Cleared EPSS table for fresh update")
     
     def update_kev_status(self, kev_set):
-        """Mark CVEs that are in CISA KEV"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """
+        Mark CVEs that are in CISA KEV.
+        
+        The KEV IDs are bulk-loaded into an indexed temp table and diffed
+        against the stored in_kev flags (see _apply_kev_status).
         
-        cursor.execute("UPDATE cves SET in_kev = 0")
+        Returns:
+            Dictionary with the 'added' and 'removed' CVE IDs - loaded CVEs
+            that entered or left KEV with this update
+        """
+        with self.connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS kev_load (cve_id TEXT PRIMARY KEY) WITHOUT ROWID")
+            cursor.execute("DELETE FROM kev_load")
+            cursor.executemany("INSERT OR IGNORE INTO kev_load (cve_id) VALUES (?)",
+                               ((cve_id,) for cve_id in kev_set))
+            changes = self._apply_kev_status(cursor, "kev_load")
+            cursor.execute("DELETE FROM kev_load")
+        return changes
+    
+    def update_kev_catalog(self, entries):
+        """
+        Replace kev_entries with the catalog entries from
+        KEVFetcher.get_kev_entries() and mark the CVEs that are in KEV, in
+        one transaction.
+        
+        Returns:
+            Dictionary with the 'added' and 'removed' CVE IDs, as from
+            update_kev_status
+        """
+        columns = ['cve_id', 'vendor_project', 'product', 'vulnerability_name',
+                   'date_added', 'due_date', 'known_ransomware']
+        with self.connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM kev_entries")
+            cursor.executemany(f'''
+                INSERT OR REPLACE INTO kev_entries ({', '.join(columns)})
+                VALUES ({', '.join('?' * len(columns))})
+            ''', ([entry.get(column) for column in columns] for entry in entries))
+            return self._apply_kev_status(cursor, "kev_entries")
+    
+    def _apply_kev_status(self, cursor, kev_table):
+        """
+        Bring in_kev in line with the CVE IDs in kev_table (indexed on
+        cve_id). Only CVEs whose status changed are written and
+        re-prioritised; both sides of the diff are index lookups - KEV IDs
+        into cves, and in_kev = 1 rows into kev_table.
+        """
+        cursor.execute(f'''
+            SELECT cve_id FROM cves
+            WHERE cve_id IN (SELECT cve_id FROM {kev_table}) AND in_kev IS NOT 1
+        ''')
+        added = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'''
+            SELECT cve_id FROM cves
+            WHERE in_kev = 1 AND cve_id NOT IN (SELECT cve_id FROM {kev_table})
+        ''')
+        removed = [row[0] for row in cursor.fetchall()]
+        
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS kev_changed (cve_id TEXT PRIMARY KEY) WITHOUT ROWID")
+        cursor.execute("DELETE FROM kev_changed")
+        cursor.executemany("INSERT INTO kev_changed (cve_id) VALUES (?)",
+                           ((cve_id,) for cve_id in added + removed))
+        cursor.execute(f'''
+            UPDATE cves SET in_kev = (cve_id IN (SELECT cve_id FROM {kev_table}))
+            WHERE cve_id IN (SELECT cve_id FROM kev_changed)
+        ''')
+        # Rows from before in_kev had a default
+        cursor.execute("UPDATE cves SET in_kev = 0 WHERE in_kev IS NULL")
         
-        if kev_set:
-            placeholders = ','.join(['?'] * len(kev_set))
-            query = f"UPDATE cves SET in_kev = 1 WHERE cve_id IN ({placeholders})"
-            cursor.execute(query, list(kev_set))
+        refresh_priorities(cursor, "cve_id IN (SELECT cve_id FROM kev_changed)")
+        cursor.execute("DELETE FROM kev_changed")
         
+        cursor.execute(f"SELECT COUNT(*) FROM {kev_table}")
+        kev_count = cursor.fetchone()[0]
         now = datetime.now().isoformat()
         cursor.execute('''
             INSERT OR REPLACE INTO updates (source, last_run, records_count)
             VALUES ('kev', ?, ?)
-        ''', (now, len(kev_set)))
+        ''', (now, kev_count))
+        
+        print(f"KEV status updated: {kev_count} CVEs in KEV, "
+              f"{len(added)} newly added, {len(removed)} removed")
+        return {'added': added, 'removed': removed}
+    
+    def get_kev_entries(self, upcoming_only=False, limit=500):
+        """
+        Load KEV catalog entries by remediation due date (earliest first),
+        with the priority and EPSS score of CVEs that are loaded.
+        
+        Args:
+            upcoming_only: Only entries due today or later
+            limit: Maximum number of entries
+        """
+        since = datetime.now().date().isoformat() if upcoming_only else ''
+        return self.query_df(KEV_ENTRIES_QUERY, (since, limit))
+    
+    def query(self, sql, params=()):
+        """Run a read-only query and return the rows as a list of dictionaries"""
+        cursor = self.connections.reader().execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def query_df(self, sql, params=()):
+        """Run a read-only query and return the result as a DataFrame"""
+        return pd.read_sql_query(sql, self.connections.reader(), params=params)
+    
+    def explain(self, sql, params=()):
+        """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+        cursor = self.connections.reader().execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[3] for row in cursor.fetchall()]
+    
+    def check_query_plans(self):
+        """
+        Verify the hot dashboard queries are answered from their indexes.
+        Prints each query plan and returns False if any query falls back to a
+        full scan, or to a temporary sort where it should read in index order.
+        """
+        # (name, sql, params, expected index, whether sorting the result is expected)
+        checks = [
+            ("Dashboard loaders", PRIORITIZED_CVES_QUERY, (10000,), "idx_cves_priority", False),
+            ("Sector pages", SECTOR_CVES_QUERY, {'sector': 'healthcare', 'limit': 10000},
+             "idx_sector_matches_sector", True),
+            ("Uncategorized export", UNCATEGORIZED_CVES_QUERY, (1000,), "idx_cves_priority", False),
+            ("KEV CVEs", "SELECT cve_id FROM cves WHERE in_kev = 1", (), "idx_cves_in_kev", False),
+            ("KEV due dates", KEV_ENTRIES_QUERY, ("", 500), "idx_kev_entries_due_date", False),
+            ("High CVSS", "SELECT cve_id FROM cves WHERE cvss_score > 7.0", (), "idx_cves_cvss_score", False),
+            ("Top EPSS", "SELECT cve_id FROM epss_scores ORDER BY epss_score DESC LIMIT ?", (100,),
+             "idx_epss_scores_epss_score", False),
+        ]
+        
+        all_ok = True
+        for name, sql, params, index, may_sort in checks:
+            plan = self.explain(sql, params)
+            uses_index = any(index in line for line in plan)
+            sorts = any("TEMP B-TREE FOR ORDER BY" in line for line in plan)
+            ok = uses_index and (may_sort or not sorts)
+            all_ok = all_ok and ok
+            
+            print(f"{'OK' if ok else 'FAIL':<5}{name} (expects {index})")
+            for line in plan:
+                print(f"       {line}")
+        
+        return all_ok
+    
+    def get_prioritized_cves(self, limit=10000, sector=None):
+        """
+        Load CVEs with their EPSS scores, KEV first, then by priority tier,
+        EPSS and CVSS descending.
         
-        conn.commit()
-        conn.close()
-        print(f"KEV status updated: {len(kev_set)} CVEs marked as exploited")
+        With a sector, only CVEs tagged with that sector are returned, along
+        with their matched keywords.
+        """
+        if sector is not None:
+            return self.query(SECTOR_CVES_QUERY, {'sector': sector, 'limit': limit})
+        return self.query(PRIORITIZED_CVES_QUERY, (limit,))
+    
+    def get_uncategorized_cves(self, limit=1000):
+        """Load the highest priority CVEs that match no sector keyword as a DataFrame"""
+        return self.query_df(UNCATEGORIZED_CVES_QUERY, (limit,))
+    
+    def get_matched_keywords(self, sector):
+        """Return the keywords of a sector that match at least one CVE"""
+        cursor = self.connections.reader().execute(
+            "SELECT DISTINCT keyword FROM cve_sector_matches WHERE sector = ?",
+            (sector,)
+        )
+        return [row[0] for row in cursor.fetchall()]
+    
+    def search_cves(self, term, mode='phrase', sector=None, limit=500):
+        """
+        Search CVE descriptions through the full-text index.
+        
+        Args:
+            term: Keyword, phrase or word prefix to look for
+            mode: 'phrase', 'keyword' or 'prefix' (see src/utils/fulltext.py)
+            sector: Only return CVEs tagged with this sector
+            limit: Maximum number of CVEs to return
+        
+        Returns:
+            Matching CVEs in priority order, as a list of dictionaries
+        """
+        term = term.strip()
+        if not term:
+            return []
+        
+        matches = text_matcher(term, mode)
+        conn = self.connections.reader()
+        condition, params = candidate_condition(conn, term)
+        if sector is not None:
+            condition = f"{condition} AND {SECTOR_CONDITION}"
+            params['sector'] = sector
+        
+        cursor = conn.execute(SEARCH_CVES_QUERY.format(condition=condition), params)
+        columns = [column[0] for column in cursor.description]
+        results = []
+        for row in cursor:
+            cve = dict(zip(columns, row))
+            if matches(cve['description']):
+                results.append(cve)
+                if len(results) >= limit:
+                    break
+        # Stopping early leaves the statement open; release its read snapshot
+        cursor.close()
+        return results
+    
+    def get_cve_page(self, after=None, page_size=DEFAULT_PAGE_SIZE, tiers=None, sector=None,
+                     kev_only=False, cvss_min=None, cvss_max=None, search=None, search_mode='phrase'):
+        """
+        Fetch one page of CVEs in priority order, with every filter applied
+        in SQL, so a page costs the same however deep it is.
+        
+        Args:
+            after: Cursor returned with the previous page (None for the first)
+            page_size: Rows per page
+            tiers: Only these priority tiers
+            sector: Only CVEs tagged with this sector
+            kev_only: Only CVEs in CISA KEV
+            cvss_min, cvss_max: CVSS score range (inclusive)
+            search: Only CVEs whose description matches this term
+            search_mode: 'phrase', 'keyword' or 'prefix' (see src/utils/fulltext.py)
+        
+        Returns:
+            (rows, next_cursor) - rows as a list of dictionaries, and the
+            cursor of the following page (None on the last page)
+        """
+        conn = self.connections.reader()
+        filters = []
+        params = {'page_size': page_size}
+        
+        if tiers:
+            filters.append(f"c.priority_tier IN ({', '.join(str(int(tier)) for tier in tiers)})")
+        if sector is not None:
+            filters.append(SECTOR_CONDITION)
+            params['sector'] = sector
+        if kev_only:
+            filters.append("c.in_kev = 1")
+        if cvss_min is not None:
+            filters.append("c.cvss_score >= :cvss_min")
+            params['cvss_min'] = cvss_min
+        if cvss_max is not None:
+            filters.append("c.cvss_score <= :cvss_max")
+            params['cvss_max'] = cvss_max
+        if search and search.strip():
+            condition, search_params = candidate_condition(conn, search.strip())
+            # Candidates are confirmed inside the query, so LIMIT counts only real matches
+            conn.create_function("description_matches", 1, text_matcher(search.strip(), search_mode),
+                                 deterministic=True)
+            filters += [condition, "description_matches(c.description)"]
+            params.update(search_params)
+        
+        branches, cursor_params = keyset_branches(after)
+        params.update(cursor_params)
+        keywords = SECTOR_KEYWORDS_SQL if sector is not None else "NULL"
+        sql = "\nUNION ALL\n".join(
+            CVE_PAGE_BRANCH.format(branch=number, keywords=keywords, filters=" AND ".join(filters) or "1",
+                                   condition=condition, order=order_by(keys, "c."))
+            for number, (condition, keys) in enumerate(branches)
+        )
+        sql += f"ORDER BY branch, {order_by(PAGE_SORT_KEYS)}\nLIMIT :page_size"
+        
+        rows = []
+        cursor = conn.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        for row in cursor.fetchall():
+            cve = dict(zip(columns, row))
+            del cve['branch']
+            rows.append(cve)
+        
+        next_cursor = page_cursor(rows[-1]) if len(rows) == page_size else None
+        return rows, next_cursor
+    
+    def get_epss_movers(self, days=7, limit=50):
+        """
+        CVEs whose EPSS score moved most over the last days days of history,
+        with their description and priority where the CVE is loaded.
+        """
+        return get_epss_movers(self.connections.reader(), days, limit)
     
     def get_all_cves(self, limit=1000):
         """Get CVEs from database with EPSS scores and priorities"""
-        conn = sqlite3.connect(self.db_path)
-        
-        query = f"""
+        query = """
             SELECT 
                 c.cve_id,
                 c.description,
@@ -186,39 +647,23 @@ class DatabaseHandler:
                 COALESCE(e.epss_score, 0) as epss_score,
                 e.percentile,
                 c.in_kev,
+                c.priority_tier,
+                c.risk_score,
                 c.published_date,
                 c.last_updated
             FROM cves c
             LEFT JOIN epss_scores e ON c.cve_id = e.cve_id
             ORDER BY e.epss_score DESC, c.cvss_score DESC
-            LIMIT {limit}
+            LIMIT ?
         """
         
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        df = self.query_df(query, params=(limit,))
         
         if df.empty:
             return self.get_sample_cves()
         
-        cves = []
-        for _, row in df.iterrows():
-            cve = row.to_dict()
-            
-            if cve['in_kev']:
-                priority = "🔴 PRIORITY 1+ (IMMEDIATE)"
-            elif cve['epss_score'] > 0.2 and cve['cvss_score'] > 7.0:
-                priority = "🟠 PRIORITY 1 (This week)"
-            elif cve['cvss_score'] > 7.0:
-                priority = "🟡 PRIORITY 2 (Schedule)"
-            elif cve['epss_score'] > 0.2:
-                priority = "🟢 PRIORITY 3 (Monitor)"
-            else:
-                priority = "⚪ PRIORITY 4 (Deprioritize)"
-            
-            cve['priority'] = priority
-            cves.append(cve)
-        
-        return cves
+        df['priority'] = [priority_label(tier, with_icon=True) for tier in df['priority_tier']]
+        return df.drop(columns=['priority_tier']).to_dict('records')
     
     def get_sample_cves(self):
         """Return sample CVEs only if database is empty"""
@@ -241,14 +686,36 @@ class DatabaseHandler:
             }
         ]
     
+    def record_update(self, source, records_count, last_run=None):
+        """Record the last run time and record count for a data source"""
+        if last_run is None:
+            last_run = datetime.now().isoformat()
+        with self.connections.writer() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO updates (source, last_run, records_count)
+                VALUES (?, ?, ?)
+            ''', (source, last_run, records_count))
+    
+    def get_feed_meta(self, feed):
+        """Get the (sha256, last_modified) recorded at the last import of a feed"""
+        cursor = self.connections.reader().execute(
+            "SELECT sha256, last_modified FROM feed_meta WHERE feed = ?",
+            (feed,)
+        )
+        return cursor.fetchone()
+    
+    def record_feed_meta(self, feed, sha256, last_modified):
+        """Record the .meta fields of a feed after a successful import"""
+        with self.connections.writer() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO feed_meta (feed, sha256, last_modified, imported_at)
+                VALUES (?, ?, ?, ?)
+            ''', (feed, sha256, last_modified, datetime.now().isoformat()))
+    
     def get_last_update(self, source):
         """Get last update time for a source"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
+        cursor = self.connections.reader().execute(
             "SELECT last_run, records_count FROM updates WHERE source = ?",
             (source,)
         )
-        result = cursor.fetchone()
-        conn.close()
-        return result
\ No newline at end of file
+        return cursor.fetchone()
\ No newline at end of file
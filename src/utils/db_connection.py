@@ -0,0 +1,137 @@
+"""
+SQLite connection manager for VIPER
+The single place where connections to the VIPER database are opened.
+
+Every connection is configured the same way:
+- WAL journal, so the updater can write while the dashboard keeps reading
+- synchronous=NORMAL (safe with WAL, far fewer fsyncs)
+- Memory-mapped I/O and a larger page cache for the dashboard's read queries
+
+Readers get one connection per thread (read-only). All writes go through a
+single shared writer connection guarded by a lock, so there is never more
+than one writer per process.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Location of the VIPER database (relative to the project root)
+DEFAULT_DB_PATH = Path("data/viper.db")
+
+# Connection tuning
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+CACHE_SIZE_KB = 64 * 1024
+BUSY_TIMEOUT_SECONDS = 30
+
+
+class ConnectionManager:
+    """
+    Hands out configured connections for one database file.
+    
+    Use ConnectionManager.for_path() (or get_connection_manager()) rather
+    than constructing this directly, so every caller in the process shares
+    the same writer connection and lock.
+    """
+    
+    _managers = {}
+    _managers_lock = threading.Lock()
+    
+    # Managers inherited from a parent process are kept alive (but unused)
+    # so their connections are never closed from the child after a fork
+    _inherited = []
+    
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._writer = None
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+    
+    @classmethod
+    def for_path(cls, db_path=None):
+        """Return the shared manager for db_path (defaults to DEFAULT_DB_PATH)"""
+        key = str(Path(db_path or DEFAULT_DB_PATH).resolve())
+        with cls._managers_lock:
+            manager = cls._managers.get(key)
+            if manager is not None and manager._pid != os.getpid():
+                cls._inherited.append(manager)
+                manager = None
+            if manager is None:
+                manager = cls(key)
+                cls._managers[key] = manager
+            return manager
+    
+    def _connect(self, read_only):
+        """Open and configure a new connection"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            check_same_thread=read_only
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+    
+    def reader(self):
+        """
+        Return this thread's read-only connection, opening it on first use.
+        
+        Outside an explicit transaction each query sees the latest committed
+        data, so the connection can be kept for the life of the thread.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect(read_only=True)
+            self._local.conn = conn
+        return conn
+    
+    @contextmanager
+    def writer(self):
+        """
+        Context manager yielding the process-wide writer connection.
+        
+        Commits when the block exits normally and rolls back if it raises.
+        Nested use from the same thread shares the same transaction.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect(read_only=False)
+            conn = self._writer
+            outermost = self._write_depth == 0
+            self._write_depth += 1
+            try:
+                yield conn
+                if outermost:
+                    conn.commit()
+            except BaseException:
+                if outermost:
+                    conn.rollback()
+                raise
+            finally:
+                self._write_depth -= 1
+    
+    def close(self):
+        """Close the writer and this thread's reader connection"""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def get_connection_manager(db_path=None):
+    """Shortcut for ConnectionManager.for_path()"""
+    return ConnectionManager.for_path(db_path)
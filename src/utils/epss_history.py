@@ -0,0 +1,223 @@
+"""
+EPSS Score History for VIPER
+Keeps a daily time series of EPSS scores alongside today's epss_scores.
+
+Only movements are stored: after each full EPSS load, a CVE gets a row
+in epss_history when its score differs by more than EPSS_HISTORY_EPSILON
+from the last score recorded for it (or it has never been recorded). A
+CVE's score on any day is its latest row on or before that day.
+
+Rows are kept compact:
+- CVE IDs are encoded as integers (CVE-2024-12345 -> 2024 * 10^8 + 12345)
+- days are integers counted from 1970-01-01
+- scores are integers in units of 0.00001, the precision EPSS publishes,
+  so quantizing loses nothing
+
+epss_history_last holds each CVE's latest recorded score and day. It is
+what new loads are compared against, and its day index answers "which
+CVEs moved in the last N days" without scanning the history.
+"""
+
+from datetime import date, datetime, timedelta
+
+# Smallest score change worth recording (0.001 = 0.1 percentage points)
+EPSS_HISTORY_EPSILON = 0.001
+
+# Stored scores are integers in units of 1 / SCORE_SCALE
+SCORE_SCALE = 100000
+
+# CVE sequence numbers are multiplied out of the way of the year
+CVE_SEQUENCE_SPAN = 10 ** 8
+
+# SQL expression encoding a cve_id column as an integer
+CVE_NUM_SQL = (
+    f"(CAST(substr(cve_id, 5, 4) AS INTEGER) * {CVE_SEQUENCE_SPAN}"
+    " + CAST(substr(cve_id, 10) AS INTEGER))"
+)
+
+# SQL expression decoding an integer from CVE_NUM_SQL back to its CVE ID
+CVE_ID_SQL = f"printf('CVE-%d-%04d', {{num}} / {CVE_SEQUENCE_SPAN}, {{num}} % {CVE_SEQUENCE_SPAN})"
+
+_EPOCH = date(1970, 1, 1)
+
+
+def cve_num(cve_id):
+    """Encode a CVE ID as an integer"""
+    _, year, sequence = cve_id.split('-', 2)
+    return int(year) * CVE_SEQUENCE_SPAN + int(sequence)
+
+
+def cve_id_from_num(number):
+    """Decode an integer from cve_num back to its CVE ID"""
+    year, sequence = divmod(number, CVE_SEQUENCE_SPAN)
+    return f"CVE-{year}-{sequence:04d}"
+
+
+def day_number(day):
+    """Day number of a date or an ISO date string"""
+    if isinstance(day, str):
+        day = datetime.fromisoformat(day[:10]).date()
+    return (day - _EPOCH).days
+
+
+def date_from_day(number):
+    """ISO date string of a day number"""
+    return (_EPOCH + timedelta(days=number)).isoformat()
+
+
+def record_epss_history(cursor, score_date, epsilon=EPSS_HISTORY_EPSILON, source="epss_scores"):
+    """
+    Record the scores in source as the snapshot for score_date.
+    
+    Days are normally recorded in order, each compared against
+    epss_history_last. A day older than the latest recorded one (a
+    backfill) is compared against the history as it stood on that day,
+    and the movements it adds are carried back out on the next recorded
+    day, so every later day still reads back the scores it had.
+    
+    Args:
+        cursor: Cursor on the writer connection (caller owns the transaction)
+        score_date: Date the scores are for (date or ISO string)
+        epsilon: Smallest change from the last recorded score that is stored
+        source: Table with the day's cve_id and epss_score columns
+    
+    Returns:
+        Number of history rows written, or None if score_date has already
+        been recorded
+    """
+    day = day_number(score_date)
+    cursor.execute("SELECT 1 FROM epss_history_days WHERE day = ?", (day,))
+    if cursor.fetchone():
+        print(f"EPSS history already recorded for {date_from_day(day)}; skipping")
+        return None
+    
+    cursor.execute("SELECT MIN(day) FROM epss_history_days WHERE day > ?", (day,))
+    next_day = cursor.fetchone()[0]
+    params = {'day': day, 'epsilon': round(epsilon * SCORE_SCALE)}
+    snapshot = f'''
+        SELECT {CVE_NUM_SQL} AS cve_num,
+               CAST(ROUND(epss_score * {SCORE_SCALE}) AS INTEGER) AS score
+        FROM {source}
+        WHERE epss_score IS NOT NULL AND cve_id LIKE 'CVE-____-%'
+    '''
+    
+    if next_day is None:
+        cursor.execute(f'''
+            INSERT INTO epss_history (cve_num, day, score)
+            SELECT n.cve_num, :day, n.score
+            FROM ({snapshot}) n
+            LEFT JOIN epss_history_last l ON l.cve_num = n.cve_num
+            WHERE l.cve_num IS NULL OR ABS(n.score - l.score) > :epsilon
+        ''', params)
+        changed = cursor.rowcount
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO epss_history_last (cve_num, score, day)
+            SELECT cve_num, score, day FROM epss_history WHERE day = ?
+        ''', (day,))
+    else:
+        # Each CVE's score as recorded before this day
+        cursor.execute(f'''
+            CREATE TEMP TABLE epss_history_before AS
+            SELECT n.cve_num, n.score,
+                   (SELECT h.score FROM epss_history h
+                    WHERE h.cve_num = n.cve_num AND h.day < :day
+                    ORDER BY h.day DESC LIMIT 1) AS before
+            FROM ({snapshot}) n
+        ''', params)
+        cursor.execute('''
+            INSERT INTO epss_history (cve_num, day, score)
+            SELECT cve_num, :day, score FROM epss_history_before
+            WHERE before IS NULL OR ABS(score - before) > :epsilon
+        ''', params)
+        changed = cursor.rowcount
+        
+        # Restore the earlier score from the next recorded day on, where
+        # that day had no row of its own to supersede this one
+        cursor.execute('''
+            INSERT OR IGNORE INTO epss_history (cve_num, day, score)
+            SELECT cve_num, :next_day, before FROM epss_history_before
+            WHERE before IS NOT NULL AND ABS(score - before) > :epsilon
+        ''', {**params, 'next_day': next_day})
+        
+        # The latest score stays the latest; only a CVE first scored by
+        # this day, or one given a restoring row on the next day, moves on
+        cursor.execute('''
+            INSERT OR REPLACE INTO epss_history_last (cve_num, score, day)
+            SELECT h.cve_num, h.score, h.day
+            FROM epss_history_before b
+            JOIN epss_history h ON h.cve_num = b.cve_num
+             AND h.day = (SELECT MAX(day) FROM epss_history WHERE cve_num = b.cve_num)
+            LEFT JOIN epss_history_last l ON l.cve_num = b.cve_num
+            WHERE l.cve_num IS NULL OR l.day < h.day
+        ''')
+        cursor.execute("DROP TABLE temp.epss_history_before")
+    
+    cursor.execute(f"SELECT COUNT(*) FROM {source}")
+    cve_count = cursor.fetchone()[0]
+    cursor.execute('''
+        INSERT INTO epss_history_days (day, score_date, cve_count, changed_count, recorded_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (day, date_from_day(day), cve_count, changed, datetime.now().isoformat()))
+    
+    print(f"EPSS history for {date_from_day(day)}: {changed:,} of {cve_count:,} scores moved")
+    return changed
+
+
+def get_epss_movers(conn, days=7, limit=50):
+    """
+    Find the CVEs whose EPSS score changed most over the last days days
+    of recorded history, with their description and priority where the
+    CVE is loaded.
+    
+    Only CVEs with a history row inside the window can have moved; they are
+    read from the day index on epss_history_last, and each one's score at
+    the start of the window is a single primary key lookup. The top movers
+    are then joined to cves in the same query.
+    
+    Returns:
+        List of dictionaries (cve_id, epss_before, epss_now, change,
+        description, cvss_score, in_kev, priority_tier), largest absolute
+        change first. epss_before is None for CVEs first scored inside the
+        window (after the first recorded day); the cves columns are None
+        (in_kev 0) for CVEs that are not loaded.
+    """
+    first, latest = conn.execute("SELECT MIN(day), MAX(day) FROM epss_history_days").fetchone()
+    if latest is None:
+        return []
+    # A window reaching back past the first recorded day is measured from
+    # it, so the first load does not count every CVE as newly scored
+    cutoff = max(latest - days, first)
+    
+    cursor = conn.execute(f'''
+        SELECT m.cve_num, m.score_now, m.score_before,
+               c.description, c.cvss_score, COALESCE(c.in_kev, 0), c.priority_tier
+        FROM (
+            SELECT l.cve_num, l.score AS score_now,
+                   (SELECT h.score FROM epss_history h
+                    WHERE h.cve_num = l.cve_num AND h.day <= :cutoff
+                    ORDER BY h.day DESC LIMIT 1) AS score_before
+            FROM epss_history_last l
+            WHERE l.day > :cutoff
+            ORDER BY ABS(l.score - COALESCE(score_before, 0)) DESC, l.cve_num
+            LIMIT :limit
+        ) m
+        LEFT JOIN cves c ON c.cve_id = {CVE_ID_SQL.format(num="m.cve_num")}
+        ORDER BY ABS(m.score_now - COALESCE(m.score_before, 0)) DESC, m.cve_num
+    ''', {'cutoff': cutoff, 'limit': limit})
+    
+    movers = []
+    for number, score_now, score_before, description, cvss_score, in_kev, priority_tier in cursor.fetchall():
+        epss_now = score_now / SCORE_SCALE
+        epss_before = score_before / SCORE_SCALE if score_before is not None else None
+        movers.append({
+            'cve_id': cve_id_from_num(number),
+            'epss_before': epss_before,
+            'epss_now': epss_now,
+            'change': round(epss_now - (epss_before or 0.0), 5),
+            'description': description,
+            'cvss_score': cvss_score,
+            'in_kev': in_kev,
+            'priority_tier': priority_tier,
+        })
+    return movers
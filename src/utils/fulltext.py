@@ -0,0 +1,188 @@
+"""
+Full-text search over CVE descriptions.
+
+cves_fts is an FTS5 index of cves.description using the trigram
+tokenizer, so any substring of three or more characters - not just whole
+words - is answered from the index. Triggers on cves keep it in step
+with every insert, update and delete (see migration 8).
+
+The index narrows the search to candidate CVEs; each candidate is then
+confirmed in Python with the same case-insensitive test the keyword
+matcher uses, so results are identical whether or not the index exists.
+Terms shorter than three characters, or databases whose SQLite was built
+without FTS5, fall back to a LIKE scan. A database created without the
+index gets it the first time it is opened by a build that supports it.
+
+Search modes:
+- phrase  - the term appears anywhere ('ge' matches 'general')
+- keyword - the term appears as a whole word ('ge' matches 'GE Healthcare')
+- prefix  - a word starts with the term ('infus' matches 'infusion')
+"""
+
+import re
+import sqlite3
+
+FTS_TABLE = "cves_fts"
+
+SEARCH_MODES = ('phrase', 'keyword', 'prefix')
+
+# The trigram tokenizer cannot look up anything shorter than one trigram
+TRIGRAM_LENGTH = 3
+
+# The trigram tokenizer arrived in SQLite 3.34
+HAS_TRIGRAM_TOKENIZER = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+def has_fulltext_index(conn) -> bool:
+    """True if the cves_fts index exists in this database"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (FTS_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def fulltext_supported(conn) -> bool:
+    """True if this SQLite build has FTS5 and the trigram tokenizer"""
+    if not HAS_TRIGRAM_TOKENIZER:
+        return False
+    return conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0] == 1
+
+
+def create_fulltext_index(cursor) -> bool:
+    """
+    Create the cves_fts index with the triggers that keep it in step with
+    cves, and index every existing description. Runs in the caller's
+    transaction.
+    
+    Returns:
+        True if the index was created, False if this SQLite build cannot
+        (description search then uses LIKE scans)
+    """
+    try:
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                description,
+                content='cves',
+                content_rowid='id',
+                tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Full-text index not created ({e}); description search will use LIKE scans")
+        return False
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS cves_fts_insert AFTER INSERT ON cves BEGIN
+            INSERT INTO cves_fts (rowid, description) VALUES (new.id, new.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS cves_fts_delete AFTER DELETE ON cves BEGIN
+            INSERT INTO cves_fts (cves_fts, rowid, description) VALUES ('delete', old.id, old.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS cves_fts_update AFTER UPDATE OF description ON cves BEGIN
+            INSERT INTO cves_fts (cves_fts, rowid, description) VALUES ('delete', old.id, old.description);
+            INSERT INTO cves_fts (rowid, description) VALUES (new.id, new.description);
+        END
+    ''')
+    cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def ensure_fulltext_index(conn) -> bool:
+    """
+    Create the index if the database lacks it and this SQLite build
+    supports it - migration 8 skips it on builds that do not, and the
+    database may since be opened with one that does.
+    
+    Args:
+        conn: The writer connection
+    
+    Returns:
+        True if the index was created now
+    """
+    if has_fulltext_index(conn) or not fulltext_supported(conn):
+        return False
+    
+    # DDL does not open a transaction implicitly; take the write lock, then
+    # check again in case another process created the index meanwhile
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    if has_fulltext_index(conn) or not create_fulltext_index(conn.cursor()):
+        return False
+    print("Created the full-text index on CVE descriptions")
+    return True
+
+
+def _fts_phrase(term: str) -> str:
+    """Quote term as a single FTS5 phrase so its punctuation is not parsed as syntax"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like_pattern(term: str) -> str:
+    """LIKE pattern matching term anywhere, with wildcards in term escaped"""
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def candidate_condition(conn, term: str, alias: str = "c"):
+    """
+    SQL condition selecting the CVEs that may contain term.
+    
+    Args:
+        conn: Open connection (used to check for the index)
+        term: Search term
+        alias: Alias of the cves table in the surrounding query
+    
+    Returns:
+        (sql, params) - a WHERE condition using named parameters. Every CVE
+        containing term is selected; a few that do not may be too, so
+        results must still be confirmed with text_matcher().
+    """
+    term = term.lower()
+    if len(term) >= TRIGRAM_LENGTH and has_fulltext_index(conn):
+        return (f"{alias}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :fts_query)",
+                {'fts_query': _fts_phrase(term)})
+    if term.isascii():
+        # LIKE is case-insensitive for ASCII and still runs inside SQLite
+        return (f"{alias}.description LIKE :like_pattern ESCAPE '\\'",
+                {'like_pattern': _like_pattern(term)})
+    return "1", {}
+
+
+def text_matcher(term: str, mode: str = 'phrase'):
+    """
+    Return a function testing whether a description matches term.
+    
+    Matching is case-insensitive, the same test KeywordMatcher applies
+    (mode 'keyword' corresponds to its word_boundary option).
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}' (expected one of {', '.join(SEARCH_MODES)})")
+    
+    term = term.lower()
+    if mode == 'phrase':
+        return lambda text: bool(text) and term in text.lower()
+    
+    pattern = r"(?<!\w)" + re.escape(term)
+    if mode == 'keyword':
+        pattern += r"(?!\w)"
+    compiled = re.compile(pattern)
+    return lambda text: bool(text) and compiled.search(text.lower()) is not None
+
+
+def find_cves(conn, term: str, mode: str = 'phrase'):
+    """
+    Return the ids of every CVE whose description matches term.
+    
+    Args:
+        conn: Open connection (reader or writer)
+        term: Keyword, phrase or word prefix to look for
+        mode: One of SEARCH_MODES
+    """
+    matches = text_matcher(term, mode)
+    condition, params = candidate_condition(conn, term)
+    cursor = conn.execute(f"SELECT c.cve_id, c.description FROM cves c WHERE {condition}", params)
+    return [cve_id for cve_id, description in cursor.fetchall() if matches(description)]
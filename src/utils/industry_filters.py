@@ -3,19 +3,35 @@ Industry-specific keyword filters for healthcare and energy sectors.
 Loads keywords from external JSON file for reliability and easy updates.
 
 This module provides the IndustryFilter class which handles:
-- Loading keywords from JSON file
-- Scoring CVEs based on keyword matches
+- Loading keywords from JSON file, again only when the file changes
+- Scoring CVEs based on keyword matches (single pass, see keyword_matcher.py)
+- Finding the stored CVEs a keyword matches (full-text index, see fulltext.py)
 - Filtering CVEs by industry sector
 - Saving updated keywords back to JSON
 """
 
+import hashlib
 import json
+import time
 from pathlib import Path
 from typing import List, Dict
 
+from .fulltext import find_cves
+from .keyword_matcher import KeywordMatcher, get_matcher
+
 # Path to the keywords JSON file - stored in the same directory
 KEYWORDS_FILE = Path(__file__).parent / "keywords.json"
 
+# Seconds per-text matching trusts the loaded keywords before checking the file
+MATCH_CHECK_SECONDS = 1.0
+
+
+def keywords_hash(keywords):
+    """Stable hash of a keyword structure, independent of file formatting"""
+    canonical = json.dumps(keywords, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
 class IndustryFilter:
     """
     Filters and scores CVEs based on industry-specific keywords.
@@ -23,11 +39,84 @@ class IndustryFilter:
     The filter loads keywords from a JSON file, allowing users to
     add or remove keywords without modifying code. Keywords are organized
     by sector (healthcare/energy) and category for fine-grained control.
+    
+    The filter is also the keyword registry: every access to keywords
+    stats the file and re-reads it only when its modification time or
+    size changed, and only replaces the keywords (and drops the compiled
+    matchers) when their content hash changed. The hash is exposed as
+    version, for caches that depend on the keywords to key on.
     """
     
     def __init__(self):
         """Initialize the filter by loading keywords from JSON file."""
-        self.keywords = self._load_keywords()
+        self._keywords = None
+        self._stamp = None
+        self._checked = 0.0
+        self._matchers = {}
+        self.version = None
+        self.check_count = 0
+        self.reload_count = 0
+        self.refresh()
+    
+    @property
+    def keywords(self) -> Dict:
+        """The current keywords, reloaded first if keywords.json changed"""
+        self.refresh()
+        return self._keywords
+    
+    def current(self):
+        """Return (keywords, version) of the current keywords as one snapshot"""
+        self.refresh()
+        return self._keywords, self.version
+    
+    def _file_stamp(self):
+        """(mtime, size) of the keywords file, or None if there is none"""
+        try:
+            stat = KEYWORDS_FILE.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def refresh(self, max_age: float = 0.0) -> bool:
+        """
+        Reload the keywords if keywords.json changed since it was last read.
+        
+        Args:
+            max_age: Skip the check if the file was checked this many seconds ago
+        
+        Returns:
+            True if the keywords changed
+        """
+        now = time.monotonic()
+        if self._keywords is not None and now - self._checked < max_age:
+            return False
+        self._checked = now
+        self.check_count += 1
+        stamp = self._file_stamp()
+        if self._keywords is not None and stamp == self._stamp:
+            return False
+        
+        # Stamp before reading, so a write during the read is seen next time
+        self._stamp = stamp
+        keywords = self._load_keywords()
+        version = keywords_hash(keywords)
+        if version == self.version:
+            # Touched or reformatted, but the same keywords
+            return False
+        
+        self._keywords = keywords
+        self.version = version
+        self._matchers = {}
+        self.reload_count += 1
+        return True
+    
+    def get_stats(self) -> Dict:
+        """Keyword version, file checks and reloads so far, for instrumentation"""
+        return {
+            'version': self.version,
+            'checks': self.check_count,
+            'reloads': self.reload_count,
+        }
     
     def _load_keywords(self) -> Dict:
         """
@@ -35,7 +124,8 @@ class IndustryFilter:
         
         Returns:
             Dictionary containing all sector keywords
-            Falls back to default keywords if file is missing or corrupted
+            Falls back to default keywords if file is missing, and keeps the
+            keywords already loaded (or the defaults) if it is corrupted
         """
         try:
             if KEYWORDS_FILE.exists():
@@ -46,10 +136,10 @@ class IndustryFilter:
                 return self._get_default_keywords()
         except json.JSONDecodeError as e:
             print(f"Error loading keywords JSON: {e}")
-            return self._get_default_keywords()
+            return self._keywords or self._get_default_keywords()
         except Exception as e:
             print(f"Unexpected error loading keywords: {e}")
-            return self._get_default_keywords()
+            return self._keywords or self._get_default_keywords()
     
     def _get_default_keywords(self) -> Dict:
         """
@@ -79,51 +169,73 @@ class IndustryFilter:
         
         Args:
             new_keywords: Dictionary containing the complete keyword structure
-            
+        
         Returns:
             True if save successful, False otherwise
         """
         try:
             with open(KEYWORDS_FILE, 'w') as f:
                 json.dump(new_keywords, f, indent=2)
-            self.keywords = new_keywords
+            self.refresh()
             return True
         except Exception as e:
             print(f"Error saving keywords: {e}")
             return False
     
-    def get_industry_score(self, text: str, industry: str) -> Dict:
+    def get_matcher(self, word_boundary: bool = False) -> KeywordMatcher:
         """
-        Calculate relevance score for a specific industry based on keyword matches.
+        Get the compiled keyword matcher for the current keywords.
+        
+        Args:
+            word_boundary: If True, keywords only match as whole words
+        
+        Returns:
+            KeywordMatcher, compiled once per keyword version
+        """
+        # Called once per text, so the file is checked at most once a second
+        self.refresh(MATCH_CHECK_SECONDS)
+        if word_boundary not in self._matchers:
+            self._matchers[word_boundary] = get_matcher(self.keywords, word_boundary)
+        return self._matchers[word_boundary]
+    
+    def match_sectors(self, text: str, word_boundary: bool = False) -> Dict:
+        """
+        Find keyword hits for every sector in one pass over the text.
         
         Args:
             text: The text to analyze (usually a CVE description)
-            industry: Either 'healthcare' or 'energy'
-            
+            word_boundary: If True, keywords only match as whole words
+        
         Returns:
-            Dictionary containing:
-                - industry: The industry analyzed
-                - relevance_score: Normalized score (0-10)
-                - matches: List of matched keywords with categories
-                - match_count: Number of keywords matched
+            Dictionary mapping each sector to its list of matches
+            ({'category': ..., 'keyword': ...})
         """
-        text_lower = text.lower()
-        matches = []
-        score = 0
+        return self.get_matcher(word_boundary).match(text or '')
+    
+    def find_keyword_cves(self, conn, keyword: str, word_boundary: bool = False) -> List[str]:
+        """
+        Find the CVEs in the database a keyword matches, using the
+        full-text index instead of scanning every description.
         
-        if industry in self.keywords:
-            for category, keywords in self.keywords[industry].items():
-                for keyword in keywords:
-                    if keyword.lower() in text_lower:
-                        matches.append({
-                            'category': category,
-                            'keyword': keyword
-                        })
-                        # Core categories (medical_devices, ot_ics) weighted higher
-                        if category in ['medical_devices', 'ot_ics']:
-                            score += 0.5
-                        else:
-                            score += 0.3
+        Args:
+            conn: Open database connection
+            keyword: Keyword to look up
+            word_boundary: If True, the keyword only matches as a whole word
+        
+        Returns:
+            List of CVE IDs, matched exactly as match_sectors() would
+        """
+        return find_cves(conn, keyword, 'keyword' if word_boundary else 'phrase')
+    
+    def _score_matches(self, industry: str, matches: List[Dict]) -> Dict:
+        """Turn a sector's keyword matches into a relevance score result."""
+        score = 0
+        for match in matches:
+            # Core categories (medical_devices, ot_ics) weighted higher
+            if match['category'] in ['medical_devices', 'ot_ics']:
+                score += 0.5
+            else:
+                score += 0.3
         
         # Normalize score to 0-10 range
         normalized_score = min(10, score * 2)
@@ -135,20 +247,42 @@ class IndustryFilter:
             'match_count': len(matches)
         }
     
-    def get_all_industry_scores(self, text: str) -> Dict:
+    def get_industry_score(self, text: str, industry: str,
+                           word_boundary: bool = False) -> Dict:
+        """
+        Calculate relevance score for a specific industry based on keyword matches.
+        
+        Args:
+            text: The text to analyze (usually a CVE description)
+            industry: Either 'healthcare' or 'energy'
+            word_boundary: If True, keywords only match as whole words
+        
+        Returns:
+            Dictionary containing:
+                - industry: The industry analyzed
+                - relevance_score: Normalized score (0-10)
+                - matches: List of matched keywords with categories
+                - match_count: Number of keywords matched
+        """
+        matches = self.match_sectors(text, word_boundary).get(industry, [])
+        return self._score_matches(industry, matches)
+    
+    def get_all_industry_scores(self, text: str, word_boundary: bool = False) -> Dict:
         """
         Get relevance scores for all industries (healthcare and energy).
         
         Args:
             text: The text to analyze
-            
+            word_boundary: If True, keywords only match as whole words
+        
         Returns:
             Dictionary with scores for each industry
         """
-        results = {}
-        for industry in self.keywords.keys():
-            results[industry] = self.get_industry_score(text, industry)
-        return results
+        sector_matches = self.match_sectors(text, word_boundary)
+        return {
+            industry: self._score_matches(industry, sector_matches.get(industry, []))
+            for industry in self.keywords.keys()
+        }
     
     def filter_by_industry(self, cves: List[Dict], industry: str,
                           threshold: float = 3.0) -> List[Dict]:
@@ -159,7 +293,7 @@ class IndustryFilter:
             cves: List of CVE dictionaries with 'description' fields
             industry: Either 'healthcare' or 'energy'
             threshold: Minimum relevance score to include (default 3.0)
-            
+        
         Returns:
             Filtered list of CVEs with industry_relevance added
         """
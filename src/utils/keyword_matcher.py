@@ -0,0 +1,173 @@
+"""
+Multi-keyword matcher for sector classification.
+
+Compiles every keyword of every sector and category into one regular
+expression, so a description is scanned once instead of once per
+keyword.
+
+The expression is the keywords arranged as a trie (shared prefixes are
+factored out, longer keywords tried first), so at each position of the
+text the regex engine follows a single path and reports the longest
+keyword starting there. This is the same idea as an Aho-Corasick
+automaton, but the scan runs inside the C regex engine - a pure-Python
+automaton steps through the text one character at a time in the
+interpreter and ends up slower than ~100 C substring searches.
+
+A regex scan does not report overlapping hits, so for each keyword the
+matcher precomputes which other keywords can occur inside it or start
+inside it and run past its end. Those are checked only when the keyword
+is hit. Together that is exactly the set of keywords for which
+`keyword.lower() in text.lower()` holds.
+"""
+
+import json
+import re
+from typing import Dict, List
+
+# A keyword with word boundaries must not touch one of these on either side
+_WORD_CHAR = re.compile(r"\w")
+
+
+def _trie_pattern(words) -> str:
+    """Build a regex alternation of words, factored by common prefix, longest first"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def build(node):
+        is_end = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        group = f"(?:{'|'.join(branches)})"
+        # A greedy optional tries the longer continuation before ending here
+        return group + '?' if is_end else group
+    
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Finds all sector/category keyword hits in a single pass over a text.
+    
+    Args:
+        keywords: Nested dictionary {sector: {category: [keyword, ...]}}
+                  as stored in keywords.json
+        word_boundary: If True, a keyword only matches when it is not part
+                       of a longer word (e.g. 'ge' will not match 'general')
+    """
+    
+    def __init__(self, keywords: Dict, word_boundary: bool = False):
+        self.word_boundary = word_boundary
+        self.sectors = list(keywords.keys())
+        
+        # Every place a keyword is used, in keywords.json order:
+        # lowered keyword -> [(order, sector, category, keyword), ...]
+        self._entries = {}
+        order = 0
+        for sector, categories in keywords.items():
+            for category, words in categories.items():
+                for keyword in words:
+                    lowered = keyword.lower()
+                    if not lowered:
+                        continue
+                    self._entries.setdefault(lowered, []).append((order, sector, category, keyword))
+                    order += 1
+        
+        # For each keyword, the (offset, keyword) pairs to check when it is hit:
+        # keywords found inside it (itself included), and keywords that start
+        # inside it and run past its end
+        self._inside = {}
+        self._overhang = {}
+        for word in self._entries:
+            inside = []
+            overhang = []
+            for other in self._entries:
+                for offset in range(len(word)):
+                    tail = word[offset:]
+                    if tail.startswith(other):
+                        inside.append((offset, other))
+                    elif offset and other.startswith(tail):
+                        overhang.append((offset, other))
+            self._inside[word] = inside
+            self._overhang[word] = overhang
+        
+        self._pattern = None
+        if self._entries:
+            alternation = _trie_pattern(self._entries)
+            if word_boundary:
+                self._pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)")
+            else:
+                self._pattern = re.compile(alternation)
+    
+    def _is_word_at(self, text: str, start: int, end: int) -> bool:
+        """True if text[start:end] is not joined to a word character on either side"""
+        if start > 0 and _WORD_CHAR.match(text, start - 1):
+            return False
+        return end >= len(text) or not _WORD_CHAR.match(text, end)
+    
+    def matched_keywords(self, text: str) -> set:
+        """Return the set of lowered keywords found in text"""
+        if not text or self._pattern is None:
+            return set()
+        
+        text_lower = text.lower()
+        found = set()
+        for match in self._pattern.finditer(text_lower):
+            start = match.start()
+            word = match.group()
+            for offset, other in self._inside[word]:
+                if other in found:
+                    continue
+                if self.word_boundary and not self._is_word_at(text_lower, start + offset, start + offset + len(other)):
+                    continue
+                found.add(other)
+            for offset, other in self._overhang[word]:
+                if other in found or not text_lower.startswith(other, start + offset):
+                    continue
+                if self.word_boundary and not self._is_word_at(text_lower, start + offset, start + offset + len(other)):
+                    continue
+                found.add(other)
+        return found
+    
+    def match(self, text: str) -> Dict[str, List[Dict]]:
+        """
+        Find all keyword hits in text, grouped by sector.
+        
+        Returns:
+            {sector: [{'category': ..., 'keyword': ...}, ...]} with hits in
+            keywords.json order - the same 'matches' structure as
+            IndustryFilter.get_industry_score. Sectors with no hits map to
+            an empty list.
+        """
+        results = {sector: [] for sector in self.sectors}
+        hits = []
+        for word in self.matched_keywords(text):
+            hits.extend(self._entries[word])
+        
+        for _, sector, category, keyword in sorted(hits):
+            results[sector].append({'category': category, 'keyword': keyword})
+        return results
+
+
+# Compiled matchers keyed by keyword content, so reloading the keyword file
+# only recompiles when the keywords actually changed
+_matcher_cache = {}
+
+
+def get_matcher(keywords: Dict, word_boundary: bool = False) -> KeywordMatcher:
+    """Return a compiled matcher for keywords, reusing one built for the same content"""
+    key = (json.dumps(keywords), word_boundary)
+    matcher = _matcher_cache.get(key)
+    if matcher is None:
+        # Old keyword versions are not needed again
+        if len(_matcher_cache) >= 4:
+            _matcher_cache.clear()
+        matcher = KeywordMatcher(keywords, word_boundary)
+        _matcher_cache[key] = matcher
+    return matcher
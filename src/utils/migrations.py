@@ -0,0 +1,367 @@
+"""
+Schema Migrations for VIPER
+Versioned, in-place upgrades of the SQLite schema.
+
+Each migration runs once, in order, inside its own transaction, and is
+recorded in the schema_version table. Databases created by older
+versions of VIPER are brought up to date the next time they are opened.
+
+Migrations are snapshots: once released they are never edited. Changes
+to the schema go in a new migration appended to MIGRATIONS.
+"""
+
+from datetime import datetime
+
+from .fulltext import create_fulltext_index
+
+
+def _column_names(cursor, table):
+    """Return the column names of a table"""
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+
+
+def _baseline_schema(cursor):
+    """Tables as they existed before migrations were tracked"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cves (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cve_id TEXT UNIQUE,
+            description TEXT,
+            published_date TEXT,
+            cvss_score REAL,
+            severity TEXT,
+            epss_score REAL DEFAULT 0,
+            in_kev INTEGER DEFAULT 0,
+            risk_score REAL,
+            last_updated TEXT,
+            last_modified TEXT
+        )
+    ''')
+    
+    # Databases created before last_modified was tracked need the column added
+    if 'last_modified' not in _column_names(cursor, 'cves'):
+        cursor.execute("ALTER TABLE cves ADD COLUMN last_modified TEXT")
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS epss_scores (
+            cve_id TEXT PRIMARY KEY,
+            epss_score REAL,
+            percentile REAL,
+            date TEXT
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS updates (
+            source TEXT PRIMARY KEY,
+            last_run TEXT,
+            records_count INTEGER
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS feed_meta (
+            feed TEXT PRIMARY KEY,
+            sha256 TEXT,
+            last_modified TEXT,
+            imported_at TEXT
+        )
+    ''')
+
+
+def _epss_primary_key(cursor):
+    """
+    Rebuild epss_scores with its primary key.
+    
+    Older versions replaced the table through pandas, which recreated it
+    without a primary key, so every join against it was a full scan.
+    """
+    has_primary_key = any(row[5] for row in cursor.execute("PRAGMA table_info(epss_scores)"))
+    if has_primary_key:
+        return
+    
+    cursor.execute('''
+        CREATE TABLE epss_scores_new (
+            cve_id TEXT PRIMARY KEY,
+            epss_score REAL,
+            percentile REAL,
+            date TEXT
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO epss_scores_new (cve_id, epss_score, percentile, date)
+        SELECT cve_id, epss_score, percentile, date FROM epss_scores
+        WHERE cve_id IS NOT NULL
+    ''')
+    cursor.execute("DROP TABLE epss_scores")
+    cursor.execute("ALTER TABLE epss_scores_new RENAME TO epss_scores")
+
+
+def _score_indexes(cursor):
+    """Indexes for KEV, CVSS and EPSS lookups"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cves_in_kev ON cves(in_kev)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cves_cvss_score ON cves(cvss_score)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_epss_scores_epss_score ON epss_scores(epss_score)")
+
+
+def _priority_tier(cursor):
+    """
+    Stored priority tier, so the dashboard loaders can read CVEs in
+    priority order straight off an index instead of sorting every row.
+    """
+    if 'priority_tier' not in _column_names(cursor, 'cves'):
+        cursor.execute("ALTER TABLE cves ADD COLUMN priority_tier INTEGER")
+    
+    cursor.execute('''
+        UPDATE cves SET priority_tier = CASE
+            WHEN in_kev = 1 THEN 0
+            WHEN epss_score > 0.2 AND cvss_score > 7.0 THEN 1
+            WHEN cvss_score > 7.0 THEN 2
+            WHEN epss_score > 0.2 THEN 3
+            ELSE 4
+        END
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cves_priority
+        ON cves(priority_tier, epss_score DESC, cvss_score DESC)
+    ''')
+
+
+def _priority_engine(cursor):
+    """
+    Hand tiers over to the priority engine, which adds an UNKNOWN tier and
+    fills in risk_score. Clearing the tiers marks every row for recompute
+    the next time the database is opened.
+    """
+    cursor.execute("UPDATE cves SET priority_tier = NULL")
+
+
+def _sector_tags(cursor):
+    """
+    Stored sector keyword matches. Filled by src/utils/sector_tags.py; with
+    no sector_tag_state row the tags are rebuilt on the next update.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cve_sector_matches (
+            cve_id TEXT NOT NULL,
+            sector TEXT NOT NULL,
+            category TEXT NOT NULL,
+            keyword TEXT NOT NULL,
+            keywords_hash TEXT,
+            PRIMARY KEY (cve_id, sector, category, keyword)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sector_matches_sector
+        ON cve_sector_matches(sector, cve_id)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sector_tag_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            keywords_hash TEXT,
+            keywords_json TEXT,
+            tagged_at TEXT
+        )
+    ''')
+
+
+def _sector_keyword_index(cursor):
+    """Index for adding and removing a single keyword's matches"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sector_matches_keyword
+        ON cve_sector_matches(keyword, sector, category)
+    ''')
+
+
+def _description_fulltext(cursor):
+    """
+    Trigram FTS5 index of CVE descriptions, kept in sync by triggers.
+    
+    The index stores no copy of the text (content='cves'). SQLite builds
+    without FTS5 or the trigram tokenizer (before 3.34) skip it, and
+    src/utils/fulltext.py falls back to LIKE scans until the database is
+    opened with a build that has them (see ensure_fulltext_index).
+    """
+    create_fulltext_index(cursor)
+
+
+def _epss_without_rowid(cursor):
+    """
+    Rebuild epss_scores as a WITHOUT ROWID table.
+    
+    EPSS is now stored for the whole catalogue (~300k rows). Clustering the
+    rows on cve_id stores each CVE ID once instead of in both the table and
+    its primary key index, and makes every join on cve_id a single B-tree
+    lookup.
+    """
+    cursor.execute('''
+        CREATE TABLE epss_scores_new (
+            cve_id TEXT PRIMARY KEY,
+            epss_score REAL,
+            percentile REAL,
+            date TEXT
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO epss_scores_new (cve_id, epss_score, percentile, date)
+        SELECT cve_id, epss_score, percentile, date FROM epss_scores
+        WHERE cve_id IS NOT NULL
+        ORDER BY cve_id
+    ''')
+    cursor.execute("DROP TABLE epss_scores")
+    cursor.execute("ALTER TABLE epss_scores_new RENAME TO epss_scores")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_epss_scores_epss_score ON epss_scores(epss_score)")
+
+
+def _epss_history(cursor):
+    """Daily EPSS score history, stored as movements (see src/utils/epss_history.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS epss_history (
+            cve_num INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            PRIMARY KEY (cve_num, day)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS epss_history_last (
+            cve_num INTEGER PRIMARY KEY,
+            score INTEGER NOT NULL,
+            day INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_epss_history_last_day ON epss_history_last(day)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS epss_history_days (
+            day INTEGER PRIMARY KEY,
+            score_date TEXT,
+            cve_count INTEGER,
+            changed_count INTEGER,
+            recorded_at TEXT
+        )
+    ''')
+
+
+
+def _kev_entries(cursor):
+    """
+    CISA KEV catalog entries, so KEV details and due dates can be queried
+    without reading the catalog JSON. Filled on the next KEV update.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS kev_entries (
+            cve_id TEXT PRIMARY KEY,
+            vendor_project TEXT,
+            product TEXT,
+            vulnerability_name TEXT,
+            date_added TEXT,
+            due_date TEXT,
+            known_ransomware TEXT
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_kev_entries_due_date ON kev_entries(due_date)")
+
+
+def _update_jobs(cursor):
+    """Background update jobs started from the dashboard (see src/update_jobs.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS update_jobs (
+            id INTEGER PRIMARY KEY,
+            args TEXT NOT NULL,
+            status TEXT NOT NULL,
+            pid INTEGER,
+            log_path TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            exit_code INTEGER
+        )
+    ''')
+
+
+def _missing_cvss_as_null(cursor):
+    """
+    CVEs NVD has not scored were stored with a CVSS of 0.0, which put them
+    in the Deprioritize tier. Store NULL instead, so they are ranked
+    PRIORITY UNKNOWN (their tiers are recomputed once migrations finish).
+    A genuine 0.0 carries a severity of NONE, never UNKNOWN.
+    """
+    cursor.execute('''
+        UPDATE cves SET cvss_score = NULL, priority_tier = NULL
+        WHERE cvss_score = 0 AND severity = 'UNKNOWN'
+    ''')
+
+
+# (version, description, function) - append only
+MIGRATIONS = [
+    (1, "Baseline schema", _baseline_schema),
+    (2, "Primary key on epss_scores", _epss_primary_key),
+    (3, "Indexes on KEV, CVSS and EPSS scores", _score_indexes),
+    (4, "Stored priority tier with ordering index", _priority_tier),
+    (5, "Priority tiers and risk scores from the priority engine", _priority_engine),
+    (6, "Sector keyword match tables", _sector_tags),
+    (7, "Keyword index on sector matches", _sector_keyword_index),
+    (8, "Full-text index on CVE descriptions", _description_fulltext),
+    (9, "EPSS scores clustered on CVE ID", _epss_without_rowid),
+    (10, "EPSS score history", _epss_history),
+    (11, "KEV catalog entries", _kev_entries),
+    (12, "Background update jobs", _update_jobs),
+    (13, "Missing CVSS scores stored as NULL", _missing_cvss_as_null),
+]
+
+
+def get_schema_version(conn):
+    """Return the highest applied migration version (0 for a new database)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+    ''')
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn):
+    """
+    Apply every pending migration to an open connection.
+    
+    Each migration and its schema_version row are committed together, so
+    an interrupted upgrade resumes from the first unapplied migration.
+    
+    Returns:
+        List of the versions applied (empty if already up to date)
+    """
+    current = get_schema_version(conn)
+    conn.commit()
+    applied = []
+    
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        
+        # DDL does not open a transaction implicitly, so start one explicitly.
+        # IMMEDIATE takes the write lock up front; another process may have
+        # applied this migration while we waited for it.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+            if cursor.fetchone():
+                conn.commit()
+                continue
+            migrate(cursor)
+            cursor.execute('''
+                INSERT INTO schema_version (version, description, applied_at)
+                VALUES (?, ?, ?)
+            ''', (version, description, datetime.now().isoformat()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        print(f"Applied schema migration {version}: {description}")
+        applied.append(version)
+    
+    return applied
+
@@ -0,0 +1,85 @@
+"""
+Keyset pagination over the CVE priority order.
+
+CVE tables are paged in the order of idx_cves_priority - priority tier,
+EPSS descending, CVSS descending - with the row id (the index's implicit
+last column) breaking ties. A page is fetched with the sort key of the
+last row shown instead of an OFFSET, so page 1,000 costs the same as
+page 1: nothing before the cursor is read.
+
+"The rows after the cursor" is split into branches that are each a
+single range of the index:
+
+    tier = t AND epss = e AND cvss = c AND id > i
+    tier = t AND epss = e AND cvss < c
+    tier = t AND epss = e AND cvss IS NULL
+    tier = t AND epss < e
+    tier = t AND epss IS NULL
+    tier > t
+
+Each branch reads at most one page in index order; the branches are
+concatenated in that order and the first page_size rows returned.
+Descending columns sort NULLs last, as ORDER BY ... DESC does.
+"""
+
+# Sort keys of the CVE tables, as (column, descending)
+PAGE_SORT_KEYS = [
+    ('priority_tier', False),
+    ('epss_score', True),
+    ('cvss_score', True),
+    ('id', False),
+]
+
+# Rows per page of a CVE table
+DEFAULT_PAGE_SIZE = 100
+
+
+def order_by(keys, alias=""):
+    """ORDER BY list for the given sort keys"""
+    return ", ".join(f"{alias}{column}{' DESC' if descending else ''}" for column, descending in keys)
+
+
+def keyset_branches(after, alias="c."):
+    """
+    Conditions selecting the rows after a cursor, in page order.
+    
+    Args:
+        after: Sort key values of the last row already shown (one per
+               PAGE_SORT_KEYS entry), or None for the first page
+        alias: Prefix of the cves columns in the surrounding query
+    
+    Returns:
+        (branches, params) - branches is a list of (condition, keys) in
+        the order their rows come, where keys are the sort keys left to
+        order that branch by; params holds the cursor values
+    """
+    if after is None:
+        return [("1", PAGE_SORT_KEYS)], {}
+    
+    params = {f"after_{i}": value for i, value in enumerate(after)}
+    branches = []
+    # Deepest level first: rows that tie with the cursor on every earlier key
+    for level in range(len(PAGE_SORT_KEYS) - 1, -1, -1):
+        ties = [f"{alias}{column} IS :after_{i}" for i, (column, _) in enumerate(PAGE_SORT_KEYS[:level])]
+        column, descending = PAGE_SORT_KEYS[level]
+        remaining = PAGE_SORT_KEYS[level + 1:]
+        if descending:
+            if after[level] is None:
+                # Nothing sorts after NULL
+                continue
+            beyond = [f"{alias}{column} < :after_{level}", f"{alias}{column} IS NULL"]
+        elif after[level] is None:
+            beyond = [f"{alias}{column} IS NOT NULL"]
+        else:
+            beyond = [f"{alias}{column} > :after_{level}"]
+        
+        for condition in beyond:
+            # Rows of a branch share every key up to this level except the
+            # one it ranges over, so that key leads its ordering
+            branches.append((" AND ".join(ties + [condition]), [(column, descending)] + remaining))
+    return branches, params
+
+
+def page_cursor(row):
+    """Cursor (sort key values) of a result row, to fetch the page after it"""
+    return tuple(row[column] for column, _ in PAGE_SORT_KEYS)
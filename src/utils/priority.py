@@ -0,0 +1,104 @@
+"""
+Priority Engine for VIPER
+The single definition of how CVEs are prioritised.
+
+Every CVE gets a priority tier and a risk score, stored in the cves table
+whenever its CVSS, EPSS or KEV status changes. The dashboard reads the
+stored values instead of recomputing them on every page render.
+
+Tiers:
+- 0 PRIORITY 1+ (IMMEDIATE)   - Confirmed exploited (in KEV)
+- 1 PRIORITY 1 (This week)    - EPSS > 0.2 and CVSS > 7.0
+- 2 PRIORITY 2 (Schedule)     - CVSS > 7.0
+- 3 PRIORITY 3 (Monitor)      - EPSS > 0.2
+- 4 PRIORITY 4 (Deprioritize) - Low severity, low probability
+- 5 PRIORITY UNKNOWN          - No CVSS score and no EPSS score
+
+Risk score is CVSS weighted by the probability of exploitation (1.0 for
+KEV, otherwise the EPSS score), giving a 0-10 scale.
+"""
+
+EPSS_THRESHOLD = 0.2
+CVSS_THRESHOLD = 7.0
+
+TIER_KEV = 0
+TIER_THIS_WEEK = 1
+TIER_SCHEDULE = 2
+TIER_MONITOR = 3
+TIER_DEPRIORITIZE = 4
+TIER_UNKNOWN = 5
+
+PRIORITY_LABELS = {
+    TIER_KEV: "PRIORITY 1+ (IMMEDIATE)",
+    TIER_THIS_WEEK: "PRIORITY 1 (This week)",
+    TIER_SCHEDULE: "PRIORITY 2 (Schedule)",
+    TIER_MONITOR: "PRIORITY 3 (Monitor)",
+    TIER_DEPRIORITIZE: "PRIORITY 4 (Deprioritize)",
+    TIER_UNKNOWN: "PRIORITY UNKNOWN (Missing data)",
+}
+
+PRIORITY_ICONS = {
+    TIER_KEV: "🔴",
+    TIER_THIS_WEEK: "🟠",
+    TIER_SCHEDULE: "🟡",
+    TIER_MONITOR: "🟢",
+    TIER_DEPRIORITIZE: "⚪",
+    TIER_UNKNOWN: "⚪",
+}
+
+# EPSS comes from epss_scores so a CVE with no EPSS row counts as unscored
+_EPSS_SQL = "(SELECT e.epss_score FROM epss_scores e WHERE e.cve_id = cves.cve_id)"
+
+
+def priority_label(tier, with_icon=False):
+    """Return the display label for a priority tier"""
+    if tier is None or tier != tier:
+        tier = TIER_UNKNOWN
+    label = PRIORITY_LABELS[int(tier)]
+    if with_icon:
+        return f"{PRIORITY_ICONS[int(tier)]} {label}"
+    return label
+
+
+def tier_sql(cvss="cvss_score", epss=_EPSS_SQL, kev="in_kev"):
+    """SQL expression computing the priority tier from the given columns"""
+    return f"""
+        CASE
+            WHEN {kev} = 1 THEN {TIER_KEV}
+            WHEN {epss} > {EPSS_THRESHOLD} AND {cvss} > {CVSS_THRESHOLD} THEN {TIER_THIS_WEEK}
+            WHEN {cvss} > {CVSS_THRESHOLD} THEN {TIER_SCHEDULE}
+            WHEN {epss} > {EPSS_THRESHOLD} THEN {TIER_MONITOR}
+            WHEN {epss} IS NULL AND {cvss} IS NULL THEN {TIER_UNKNOWN}
+            ELSE {TIER_DEPRIORITIZE}
+        END
+    """
+
+
+def risk_score_sql(cvss="cvss_score", epss=_EPSS_SQL, kev="in_kev"):
+    """SQL expression computing the risk score from the given columns"""
+    return f"""
+        ROUND(
+            COALESCE({cvss}, 0) * CASE WHEN {kev} = 1 THEN 1.0 ELSE COALESCE({epss}, 0) END,
+            4
+        )
+    """
+
+
+def refresh_priorities(cursor, where=None, params=()):
+    """
+    Write priority_tier and risk_score for the CVEs matching where.
+    
+    Only rows whose stored values actually change are rewritten. With no
+    where clause every CVE is checked.
+    
+    Returns:
+        Number of rows updated
+    """
+    tier = tier_sql()
+    risk = risk_score_sql()
+    condition = f"({where}) AND " if where else ""
+    cursor.execute(f'''
+        UPDATE cves SET priority_tier = {tier}, risk_score = {risk}
+        WHERE {condition}(priority_tier IS NOT {tier} OR risk_score IS NOT {risk})
+    ''', params)
+    return cursor.rowcount
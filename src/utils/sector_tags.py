@@ -0,0 +1,215 @@
+"""
+Sector Tags for VIPER
+Stores the sector keyword matches of every CVE in cve_sector_matches.
+
+CVEs are tagged as they are ingested. Each row is stamped with a hash of
+the keywords it was matched against, and sector_tag_state records the
+keywords the whole table was last built from. When keywords.json changes
+(a save or restore on the Keyword Management page, or a manual edit) the
+hashes no longer agree. retag_changes() then applies just the keywords
+added or removed since the stored copy; retag_all() rebuilds everything
+when there is no stored copy to diff against.
+
+The dashboard pages then read sector membership with indexed SQL instead
+of matching keywords against every description on every render.
+"""
+
+import json
+from datetime import datetime
+
+from .industry_filters import industry_filter as shared_filter
+from .keyword_matcher import get_matcher
+
+# CVE descriptions read per chunk while retagging
+RETAG_CHUNK_SIZE = 5000
+
+
+def _keyword_entries(keywords):
+    """Set of (sector, category, keyword) entries in a keyword structure"""
+    return {
+        (sector, category, keyword)
+        for sector, categories in keywords.items()
+        for category, words in categories.items()
+        for keyword in words
+        if keyword
+    }
+
+
+class SectorTagger:
+    """Keeps cve_sector_matches in step with the current keywords"""
+    
+    def __init__(self, db, industry_filter=None):
+        """
+        Args:
+            db: DatabaseHandler whose connections are used
+            industry_filter: Filter holding the keywords to tag with
+                             (defaults to the shared keyword registry)
+        """
+        self.db = db
+        self.industry_filter = industry_filter or shared_filter
+        # Tag with one version even if the file changes during a retag
+        self.keywords, self.keywords_hash = self.industry_filter.current()
+    
+    def get_state(self):
+        """Return (keywords_hash, keywords_json, tagged_at) of the last full tag, or None"""
+        cursor = self.db.connections.reader().execute(
+            "SELECT keywords_hash, keywords_json, tagged_at FROM sector_tag_state WHERE id = 1"
+        )
+        return cursor.fetchone()
+    
+    def is_stale(self):
+        """True if the stored tags were built from different keywords"""
+        state = self.get_state()
+        return state is None or state[0] != self.keywords_hash
+    
+    def tag_rows(self, cursor, rows, replace=True):
+        """
+        Write the sector matches of the given CVEs.
+        
+        Args:
+            cursor: Cursor on the writer connection (caller owns the transaction)
+            rows: Iterable of (cve_id, description)
+            replace: Delete any existing matches of these CVEs first
+        
+        Returns:
+            Number of match rows written
+        """
+        matcher = get_matcher(self.keywords)
+        cve_ids = []
+        matches = []
+        for cve_id, description in rows:
+            cve_ids.append((cve_id,))
+            for sector, hits in matcher.match(description or '').items():
+                for hit in hits:
+                    matches.append((cve_id, sector, hit['category'], hit['keyword'], self.keywords_hash))
+        
+        if replace:
+            cursor.executemany("DELETE FROM cve_sector_matches WHERE cve_id = ?", cve_ids)
+        cursor.executemany('''
+            INSERT OR IGNORE INTO cve_sector_matches (cve_id, sector, category, keyword, keywords_hash)
+            VALUES (?, ?, ?, ?, ?)
+        ''', matches)
+        return len(matches)
+    
+    def tag_updated(self, cursor, cve_ids, last_updated):
+        """
+        Tag the CVEs an ingest run wrote: those of cve_ids stamped with
+        last_updated (rows it left unchanged keep their tags). The IDs go
+        through an indexed temp table, so each is a lookup on the cve_id
+        index rather than a scan of cves.
+        """
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS tag_load (cve_id TEXT PRIMARY KEY) WITHOUT ROWID")
+        cursor.execute("DELETE FROM tag_load")
+        cursor.executemany("INSERT OR IGNORE INTO tag_load (cve_id) VALUES (?)",
+                           ((cve_id,) for cve_id in cve_ids))
+        rows = cursor.execute('''
+            SELECT cve_id, description FROM cves
+            WHERE cve_id IN (SELECT cve_id FROM tag_load) AND last_updated = ?
+        ''', (last_updated,)).fetchall()
+        cursor.execute("DELETE FROM tag_load")
+        return self.tag_rows(cursor, rows)
+    
+    def retag_all(self):
+        """
+        Rebuild cve_sector_matches for every CVE with the current keywords.
+        
+        Runs as a single write transaction, so the dashboard keeps reading
+        the previous tags until the new ones are complete.
+        
+        Returns:
+            Number of CVEs tagged
+        """
+        tagged = 0
+        with self.db.connections.writer() as conn:
+            write_cursor = conn.cursor()
+            write_cursor.execute("DELETE FROM cve_sector_matches")
+            
+            read_cursor = conn.execute("SELECT cve_id, description FROM cves")
+            while True:
+                rows = read_cursor.fetchmany(RETAG_CHUNK_SIZE)
+                if not rows:
+                    break
+                self.tag_rows(write_cursor, rows, replace=False)
+                tagged += len(rows)
+            
+            self._record_state(write_cursor)
+        
+        print(f"Sector tags rebuilt for {tagged:,} CVEs")
+        return tagged
+    
+    def retag_changes(self, previous_keywords):
+        """
+        Update cve_sector_matches for the keywords added or removed since
+        previous_keywords, without rescanning the whole corpus.
+        
+        Removed keywords are deleted through the keyword index. Each added
+        keyword is looked up in the full-text index of descriptions and the
+        candidates confirmed with the same case-insensitive substring test
+        the matcher uses.
+        
+        Returns:
+            Dictionary with the added and removed (sector, category, keyword)
+            entries and the number of match rows inserted and deleted
+        """
+        previous = _keyword_entries(previous_keywords)
+        current = _keyword_entries(self.keywords)
+        added = sorted(current - previous)
+        removed = sorted(previous - current)
+        
+        # Group added entries by keyword so each term is searched once
+        added_by_word = {}
+        for sector, category, keyword in added:
+            added_by_word.setdefault(keyword.lower(), []).append((sector, category, keyword))
+        
+        inserted = 0
+        deleted = 0
+        with self.db.connections.writer() as conn:
+            cursor = conn.cursor()
+            
+            for sector, category, keyword in removed:
+                cursor.execute('''
+                    DELETE FROM cve_sector_matches
+                    WHERE keyword = ? AND sector = ? AND category = ?
+                ''', (keyword, sector, category))
+                deleted += cursor.rowcount
+            
+            for word, entries in added_by_word.items():
+                rows = []
+                for cve_id in self.industry_filter.find_keyword_cves(conn, word):
+                    for sector, category, keyword in entries:
+                        rows.append((cve_id, sector, category, keyword, self.keywords_hash))
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO cve_sector_matches (cve_id, sector, category, keyword, keywords_hash)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', rows)
+                inserted += len(rows)
+            
+            self._record_state(cursor)
+        
+        print(f"Sector tags updated: {len(added)} keywords added ({inserted:,} matches), "
+              f"{len(removed)} removed ({deleted:,} matches)")
+        return {'added': added, 'removed': removed, 'inserted': inserted, 'deleted': deleted}
+    
+    def retag_if_stale(self):
+        """
+        Bring the tags in line with the current keywords if they changed.
+        Applies just the keyword diff when the previous keywords are known,
+        otherwise rebuilds everything. Returns True if anything ran.
+        """
+        state = self.get_state()
+        if state is not None and state[0] == self.keywords_hash:
+            return False
+        
+        previous_keywords = json.loads(state[1]) if state is not None and state[1] else None
+        if previous_keywords is None:
+            self.retag_all()
+        else:
+            self.retag_changes(previous_keywords)
+        return True
+    
+    def _record_state(self, cursor):
+        """Record the keywords the table now reflects"""
+        cursor.execute('''
+            INSERT OR REPLACE INTO sector_tag_state (id, keywords_hash, keywords_json, tagged_at)
+            VALUES (1, ?, ?, ?)
+        ''', (self.keywords_hash, json.dumps(self.keywords), datetime.now().isoformat()))
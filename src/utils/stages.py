@@ -0,0 +1,218 @@
+"""
+Stage Runner for VIPER
+A small dependency-graph executor for the steps of an update.
+
+Each stage is a function with the names of the stages it depends on. A
+stage starts in its own thread as soon as every stage it depends on has
+succeeded, so independent downloads overlap while the database steps
+that need them still run in dependency order. A stage fails if it raises
+or returns None or False; the stages after a failed one are skipped, and
+a failed critical stage stops any further stage from starting (stages
+already running are allowed to finish).
+
+Output printed from a stage's thread is prefixed with the stage name, so
+interleaved output from concurrent stages stays readable. The run
+records each stage's start and end time, from which the critical path -
+the chain of stages that determined the total time - is derived.
+"""
+
+import sys
+import threading
+import time
+import traceback
+
+
+class Stage:
+    """One step of a run: a function and the stages it waits for"""
+    
+    def __init__(self, name, func, deps=(), critical=False):
+        """
+        Args:
+            name: Unique stage name
+            func: Called with a dictionary of the results of the stages
+                  finished so far (by name); returns the stage's result
+            deps: Names of the stages that must succeed first
+            critical: If this stage fails, start no further stages
+        """
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.critical = critical
+
+
+class _StageOutput:
+    """stdout wrapper that prefixes each line written from a stage thread"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+    
+    def write(self, text):
+        name = getattr(self.local, 'stage', None)
+        if name is None:
+            return self.stream.write(text)
+        
+        # Only whole lines are written, so lines from two stages never mix
+        pending = getattr(self.local, 'pending', '') + text
+        *lines, self.local.pending = pending.split('\n')
+        if lines:
+            with self.lock:
+                self.stream.write(''.join(f"[{name}] {line}\n" for line in lines))
+        return len(text)
+    
+    def flush(self):
+        self.stream.flush()
+    
+    def finish_stage(self):
+        """Write any unterminated line left by this thread's stage"""
+        pending = getattr(self.local, 'pending', '')
+        if pending:
+            self.write('\n')
+        self.local.stage = None
+    
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def run_stages(stages):
+    """
+    Run stages concurrently as their dependencies allow.
+    
+    Args:
+        stages: List of Stage, in any order
+    
+    Returns:
+        Dictionary by stage name of {'status': 'ok' | 'failed' | 'skipped',
+        'result', 'start', 'end', 'seconds'}, with times in seconds from
+        the start of the run (None for stages that did not run)
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(missing)}")
+    
+    runs = {stage.name: {'status': None, 'result': None, 'start': None, 'end': None, 'seconds': None}
+            for stage in stages}
+    results = {}
+    finished = threading.Condition()
+    started = time.perf_counter()
+    output = _StageOutput(sys.stdout)
+    
+    def run(stage):
+        output.local.stage = stage.name
+        run_info = runs[stage.name]
+        status, result = 'failed', None
+        try:
+            result = stage.func(results)
+            if result is not None and result is not False:
+                status = 'ok'
+        except Exception:
+            traceback.print_exc(file=sys.stdout)
+        finally:
+            output.finish_stage()
+            with finished:
+                run_info['end'] = time.perf_counter() - started
+                run_info['seconds'] = run_info['end'] - run_info['start']
+                run_info['result'] = result
+                run_info['status'] = status
+                if status == 'ok':
+                    results[stage.name] = result
+                finished.notify_all()
+    
+    sys.stdout = output
+    try:
+        threads = []
+        aborted = False
+        with finished:
+            while True:
+                for stage in stages:
+                    run_info = runs[stage.name]
+                    if run_info['status'] is not None:
+                        continue
+                    dep_status = [runs[dep]['status'] for dep in stage.deps]
+                    if aborted or any(status in ('failed', 'skipped') for status in dep_status):
+                        run_info['status'] = 'skipped'
+                    elif all(status == 'ok' for status in dep_status):
+                        run_info['status'] = 'running'
+                        run_info['start'] = time.perf_counter() - started
+                        thread = threading.Thread(target=run, args=(stage,), name=f"stage-{stage.name}")
+                        threads.append(thread)
+                        thread.start()
+                
+                if all(run_info['status'] not in (None, 'running') for run_info in runs.values()):
+                    break
+                if not any(run_info['status'] == 'running' for run_info in runs.values()):
+                    waiting = [name for name, run_info in runs.items() if run_info['status'] is None]
+                    raise ValueError(f"Stages depend on each other in a cycle: {', '.join(waiting)}")
+                finished.wait()
+                aborted = aborted or any(
+                    runs[stage.name]['status'] == 'failed' for stage in stages if stage.critical
+                )
+        
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.stdout = output.stream
+    
+    return runs
+
+
+def critical_path(stages, runs):
+    """
+    The chain of stages that determined how long a run took: starting
+    from the stage that finished last, each step back is the dependency
+    that finished last (the one the stage was waiting for).
+    
+    Returns:
+        List of stage names, first to last (empty if nothing ran)
+    """
+    by_name = {stage.name: stage for stage in stages}
+    ran = [name for name, run_info in runs.items() if run_info['end'] is not None]
+    if not ran:
+        return []
+    
+    path = [max(ran, key=lambda name: runs[name]['end'])]
+    while True:
+        deps = [dep for dep in by_name[path[0]].deps if runs[dep]['end'] is not None]
+        if not deps:
+            return path
+        path.insert(0, max(deps, key=lambda name: runs[name]['end']))
+
+
+def print_stage_timings(stages, runs):
+    """Print each stage's wall-clock time and the critical path of a run"""
+    print("\nStage timings (seconds from start of update):")
+    for stage in stages:
+        run_info = runs[stage.name]
+        if run_info['end'] is None:
+            print(f"  {stage.name:<14} {'':>21}  {run_info['status']}")
+        else:
+            print(f"  {stage.name:<14} {run_info['start']:7.1f} -> {run_info['end']:7.1f} "
+                  f"{run_info['seconds']:7.1f}s  {run_info['status']}")
+    
+    path = critical_path(stages, runs)
+    if path:
+        total = runs[path[-1]]['end']
+        busy = sum(run_info['seconds'] or 0 for run_info in runs.values())
+        print(f"Critical path: {' -> '.join(path)} ({total:.1f}s)")
+        print(f"Stages took {busy:.1f}s in total, {total:.1f}s of wall-clock time")
+
+
+# Simple test when run directly
+if __name__ == "__main__":
+    def sleeper(seconds, ok=True):
+        def func(results):
+            print(f"working for {seconds}s")
+            time.sleep(seconds)
+            return ok
+        return func
+    
+    demo = [
+        Stage('download_a', sleeper(0.3)),
+        Stage('download_b', sleeper(0.5)),
+        Stage('load', sleeper(0.2), deps=['download_a']),
+        Stage('join', sleeper(0.1), deps=['load', 'download_b']),
+    ]
+    print_stage_timings(demo, run_stages(demo))
@@ -0,0 +1,23 @@
+"""
+Shared fixtures for the VIPER tests.
+
+Run from the project root with: python -m pytest
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# The code is imported as the src package, as the scripts in it do
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.utils.database_handler import DatabaseHandler
+
+
+@pytest.fixture
+def db(tmp_path):
+    """DatabaseHandler on a fresh, fully migrated database"""
+    handler = DatabaseHandler(tmp_path / "viper.db")
+    yield handler
+    handler.connections.close()
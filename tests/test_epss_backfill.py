@@ -0,0 +1,104 @@
+"""
+Backfilled EPSS days are recorded around the days already loaded: every
+day reads back its own scores and the latest scores stay the latest.
+"""
+
+import gzip
+
+import pandas as pd
+import pytest
+
+from src.data_collection.epss_backfill import archive_name, run_epss_backfill
+from src.utils.epss_history import SCORE_SCALE, cve_id_from_num, day_number, date_from_day
+
+
+def write_archive(directory, day, scores):
+    lines = [f"#model_version:v2025.03.14,score_date:{day}T12:55:00Z", "cve,epss,percentile"]
+    lines += [f"{cve_id},{score},0.5" for cve_id, score in scores.items()]
+    with gzip.open(directory / archive_name(day), 'wt') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def daily_load(db, day, scores):
+    db.update_epss_scores(pd.DataFrame({
+        'cve_id': list(scores),
+        'epss_score': list(scores.values()),
+        'percentile': 0.5,
+        'date': day,
+    }))
+
+
+def scores_on(db, day):
+    """Each CVE's score as the history reads it back for day"""
+    rows = db.connections.reader().execute('''
+        SELECT cve_num, score FROM epss_history h
+        WHERE day = (SELECT MAX(day) FROM epss_history WHERE cve_num = h.cve_num AND day <= ?)
+    ''', (day_number(day),))
+    return {cve_id_from_num(number): score / SCORE_SCALE for number, score in rows}
+
+
+@pytest.fixture
+def backfilled(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source_dir = tmp_path / "archives"
+    source_dir.mkdir()
+    
+    # CVE-2025-0001 is unchanged on the 10th, so that day has no row for it
+    daily_load(db, '2025-01-01', {'CVE-2025-0001': 0.1, 'CVE-2025-0002': 0.2})
+    daily_load(db, '2025-01-10', {'CVE-2025-0001': 0.1, 'CVE-2025-0002': 0.6, 'CVE-2025-0003': 0.3})
+    
+    write_archive(source_dir, '2025-01-03', {'CVE-2025-0001': 0.1, 'CVE-2025-0002': 0.25})
+    write_archive(source_dir, '2025-01-05', {'CVE-2025-0001': 0.5, 'CVE-2025-0002': 0.25})
+    (source_dir / archive_name('2025-01-08')).write_bytes(gzip.compress(b"cve,epss\nCVE-2025-0001,0.9\n"))
+    
+    days = ['2025-01-10', '2025-01-05', '2025-01-08', '2025-01-01', '2025-01-07', '2025-01-03']
+    summary = run_epss_backfill(days, db_path=db.db_path, source_dir=source_dir,
+                                download_workers=2, parse_workers=2)
+    return db, days, source_dir, summary
+
+
+def test_backfill_statuses_and_resume(backfilled):
+    db, days, source_dir, summary = backfilled
+    assert {r['day']: r['status'] for r in summary} == {
+        '2025-01-01': 'skipped',
+        '2025-01-03': 'recorded',
+        '2025-01-05': 'recorded',
+        '2025-01-07': 'missing',
+        '2025-01-08': 'failed',
+        '2025-01-10': 'skipped',
+    }
+    
+    rerun = run_epss_backfill(days, db_path=db.db_path, source_dir=source_dir,
+                              download_workers=2, parse_workers=2)
+    statuses = {r['day']: r['status'] for r in rerun}
+    assert statuses['2025-01-03'] == statuses['2025-01-05'] == 'skipped'
+    assert statuses['2025-01-07'] == 'missing'
+    assert statuses['2025-01-08'] == 'failed'
+    assert sum(r['changed'] for r in rerun) == 0
+
+
+def test_every_day_reads_back_its_scores(backfilled):
+    db = backfilled[0]
+    assert scores_on(db, '2025-01-01') == {'CVE-2025-0001': 0.1, 'CVE-2025-0002': 0.2}
+    assert scores_on(db, '2025-01-03') == {'CVE-2025-0001': 0.1, 'CVE-2025-0002': 0.25}
+    assert scores_on(db, '2025-01-05') == {'CVE-2025-0001': 0.5, 'CVE-2025-0002': 0.25}
+    assert scores_on(db, '2025-01-10') == {'CVE-2025-0001': 0.1, 'CVE-2025-0002': 0.6,
+                                           'CVE-2025-0003': 0.3}
+
+
+def test_backfill_keeps_the_latest_scores(backfilled):
+    db = backfilled[0]
+    last = db.connections.reader().execute("SELECT cve_num, day, score FROM epss_history_last")
+    assert {cve_id_from_num(number): (date_from_day(day), score / SCORE_SCALE)
+            for number, day, score in last} == {
+        'CVE-2025-0001': ('2025-01-10', 0.1),
+        'CVE-2025-0002': ('2025-01-10', 0.6),
+        'CVE-2025-0003': ('2025-01-10', 0.3),
+    }
+    
+    movers = db.get_epss_movers(days=7)
+    assert [(m['cve_id'], m['epss_before'], m['epss_now']) for m in movers] == [
+        ('CVE-2025-0002', 0.25, 0.6),
+        ('CVE-2025-0003', None, 0.3),
+        ('CVE-2025-0001', 0.1, 0.1),
+    ]
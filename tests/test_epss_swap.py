@@ -0,0 +1,52 @@
+"""
+Full EPSS loads are swapped in from a staging table; readers must see
+the complete old scores or the complete new ones throughout.
+"""
+
+import sqlite3
+import threading
+
+import pandas as pd
+
+
+def epss_frame(count, day):
+    return pd.DataFrame({
+        'cve_id': [f"CVE-2024-{i:06d}" for i in range(count)],
+        'epss_score': [(i % 1000) / 1000 for i in range(count)],
+        'percentile': [(i % 1000) / 1000 for i in range(count)],
+        'date': day,
+    })
+
+
+def test_readers_never_see_a_missing_or_partial_table(db):
+    loads = [epss_frame(50000, '2024-03-01'), epss_frame(60000, '2024-03-02'),
+             epss_frame(70000, '2024-03-03'), epss_frame(80000, '2024-03-04')]
+    db.update_epss_scores(loads[0])
+    complete = {len(load) for load in loads}
+    
+    seen = set()
+    errors = []
+    stop = threading.Event()
+    
+    def poll():
+        conn = db.connections.reader()
+        while not stop.is_set():
+            try:
+                seen.add(conn.execute("SELECT COUNT(*) FROM epss_scores").fetchone()[0])
+            except sqlite3.Error as e:
+                errors.append(str(e))
+    
+    reader = threading.Thread(target=poll)
+    reader.start()
+    try:
+        for load in loads[1:]:
+            db.update_epss_scores(load)
+    finally:
+        stop.set()
+        reader.join()
+    
+    assert errors == []
+    assert seen <= complete
+    assert db.query("SELECT COUNT(*) AS n FROM epss_scores")[0]['n'] == 80000
+    # The history and the cves copy were written with the last swap
+    assert db.query("SELECT MAX(day) AS day FROM epss_history_days")[0]['day'] is not None
@@ -0,0 +1,33 @@
+"""The full-text index of CVE descriptions (src/utils/fulltext.py)"""
+
+from src.utils import fulltext
+from src.utils.database_handler import DatabaseHandler
+
+
+def test_index_created_once_sqlite_supports_it(tmp_path, monkeypatch):
+    db_path = tmp_path / "viper.db"
+    
+    # A build without FTS5 trigram: migration 8 is recorded without the index
+    monkeypatch.setattr(fulltext, 'HAS_TRIGRAM_TOKENIZER', False)
+    monkeypatch.setattr('src.utils.migrations.create_fulltext_index', lambda cursor: False)
+    db = DatabaseHandler(db_path)
+    db.update_cve_data([
+        {'cve_id': 'CVE-2024-0001', 'description': 'Overflow in an infusion pump', 'cvss_score': 7.5},
+        {'cve_id': 'CVE-2024-0002', 'description': 'Flaw in a web browser', 'cvss_score': 5.0},
+    ])
+    assert db.query("SELECT 1 FROM schema_version WHERE version = 8")
+    assert not fulltext.has_fulltext_index(db.connections.reader())
+    
+    # Opened again with a build that has it: the index is created and filled
+    monkeypatch.undo()
+    db = DatabaseHandler(db_path)
+    conn = db.connections.reader()
+    assert fulltext.has_fulltext_index(conn)
+    condition, _ = fulltext.candidate_condition(conn, 'infusion')
+    assert fulltext.FTS_TABLE in condition
+    assert [cve['cve_id'] for cve in db.search_cves('infusion')] == ['CVE-2024-0001']
+    
+    # Later writes are kept in step by the triggers
+    db.update_cve_data([{'cve_id': 'CVE-2024-0003', 'description': 'Infusion controller bug', 'cvss_score': 6.0}])
+    assert {cve['cve_id'] for cve in db.search_cves('infusion')} == {'CVE-2024-0001', 'CVE-2024-0003'}
+    db.connections.close()
@@ -0,0 +1,139 @@
+"""
+Feed change detection (fetch_feed_meta / feed_unchanged) against a local
+HTTP stand-in for the NVD feed server.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.nvd_fetcher import NVDFetcher
+
+YEAR = 2024
+FEED = f"nvdcve-2.0-{YEAR}"
+
+
+def make_feed(count=3):
+    """Uncompressed JSON of a yearly feed with count CVEs"""
+    return json.dumps({
+        'resultsPerPage': count,
+        'totalResults': count,
+        'vulnerabilities': [
+            {'cve': {
+                'id': f"CVE-{YEAR}-{i:04d}",
+                'descriptions': [{'lang': 'en', 'value': f"Test vulnerability {i}"}],
+                'metrics': {'cvssMetricV31': [{'cvssData': {'baseScore': 7.5, 'baseSeverity': 'HIGH'}}]},
+                'published': '2024-01-01T00:00:00.000',
+                'lastModified': '2024-02-01T00:00:00.000',
+            }}
+            for i in range(1, count + 1)
+        ],
+    }).encode()
+
+
+def make_meta(sha256, last_modified='2024-02-01T00:00:00-05:00'):
+    """Body of a .meta file"""
+    return f"lastModifiedDate:{last_modified}\r\nsize:1000\r\nsha256:{sha256.upper()}\r\n".encode()
+
+
+class FeedServer:
+    """Serves files from a dictionary of path -> bytes and records each request"""
+    
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.path)
+                body = server.files.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/feeds"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+    
+    def publish(self, feed_json, meta_sha256=None):
+        """Serve a feed and its .meta (by default with the feed's true sha256)"""
+        self.files[f"/feeds/{FEED}.json.gz"] = gzip.compress(feed_json)
+        self.files[f"/feeds/{FEED}.meta"] = make_meta(meta_sha256 or hashlib.sha256(feed_json).hexdigest())
+    
+    def count(self, suffix):
+        return sum(1 for path in self.requests if path.endswith(suffix))
+    
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    feed_server = FeedServer()
+    yield feed_server
+    feed_server.close()
+
+
+@pytest.fixture
+def fetcher(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    nvd = NVDFetcher()
+    nvd.feed_base_url = server.base_url
+    return nvd
+
+
+def cve_count(db):
+    return db.query("SELECT COUNT(*) AS n FROM cves")[0]['n']
+
+
+def test_unchanged_feed_skips_download_parse_and_write(server, fetcher, db, monkeypatch):
+    feed = make_feed()
+    sha256 = hashlib.sha256(feed).hexdigest()
+    server.publish(feed)
+    db.record_feed_meta(FEED, sha256, '2024-02-01T00:00:00-05:00')
+    
+    def no_parse(*args, **kwargs):
+        raise AssertionError("an unchanged feed must not be parsed")
+    monkeypatch.setattr(fetcher, 'parse_feed_file', no_parse)
+    
+    assert fetcher.fetch_cves_by_csv(YEAR, db) is True
+    assert server.count('.meta') == 1
+    assert server.count('.json.gz') == 0
+    assert cve_count(db) == 0
+    assert db.get_last_update('nvd') is None
+
+
+def test_changed_feed_is_imported_and_recorded(server, fetcher, db):
+    db.record_feed_meta(FEED, 'ab' * 32, '2024-01-01T00:00:00-05:00')
+    feed = make_feed(count=5)
+    server.publish(feed)
+    
+    assert fetcher.fetch_cves_by_csv(YEAR, db) is True
+    assert server.count('.json.gz') == 1
+    assert cve_count(db) == 5
+    assert db.get_feed_meta(FEED) == (hashlib.sha256(feed).hexdigest().upper(), '2024-02-01T00:00:00-05:00')
+    # The downloaded feed is not kept once imported
+    assert not fetcher.feed_path(YEAR).exists()
+
+
+def test_sha256_mismatch_retries_once_then_fails(server, fetcher, db):
+    server.publish(make_feed(), meta_sha256='cd' * 32)
+    
+    assert fetcher.fetch_cves_by_csv(YEAR, db) is False
+    assert server.count('.json.gz') == 2
+    assert cve_count(db) == 0
+    assert db.get_feed_meta(FEED) is None
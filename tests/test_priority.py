@@ -0,0 +1,28 @@
+"""Priority tiers of CVEs as parsed from NVD"""
+
+from src.nvd_fetcher import NVDFetcher
+from src.utils.priority import TIER_DEPRIORITIZE, TIER_UNKNOWN
+
+
+def nvd_item(cve_id, metrics):
+    return {'cve': {
+        'id': cve_id,
+        'descriptions': [{'lang': 'en', 'value': 'Test vulnerability'}],
+        'metrics': metrics,
+        'lastModified': '2024-02-01T00:00:00.000',
+    }}
+
+
+def test_unscored_cve_is_priority_unknown(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fetcher = NVDFetcher()
+    unscored = fetcher.parse_cve(nvd_item('CVE-2024-0001', {}))
+    scored = fetcher.parse_cve(nvd_item('CVE-2024-0002', {
+        'cvssMetricV31': [{'cvssData': {'baseScore': 0.0, 'baseSeverity': 'NONE'}}]
+    }))
+    assert unscored['cvss_score'] is None
+    
+    db.update_cve_data([unscored, scored])
+    tiers = {row['cve_id']: (row['cvss_score'], row['priority_tier'])
+             for row in db.query("SELECT cve_id, cvss_score, priority_tier FROM cves")}
+    assert tiers == {'CVE-2024-0001': (None, TIER_UNKNOWN), 'CVE-2024-0002': (0.0, TIER_DEPRIORITIZE)}
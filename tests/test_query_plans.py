@@ -0,0 +1,23 @@
+"""
+The hot dashboard queries must be answered from their indexes (see
+DatabaseHandler.check_query_plans), so a migration that drops or changes
+an index fails here rather than as a slow dashboard.
+"""
+
+
+def test_query_plans_use_indexes(db):
+    assert db.check_query_plans() is True
+
+
+def test_query_plans_use_indexes_with_data(db):
+    # Plans are also checked once the planner has real tables and statistics
+    db.update_cve_data([
+        {'cve_id': f"CVE-2024-{i:04d}", 'description': f"Infusion pump flaw {i}",
+         'cvss_score': (i % 100) / 10, 'last_modified': '2024-02-01T00:00:00.000'}
+        for i in range(1, 2001)
+    ])
+    db.update_kev_status({f"CVE-2024-{i:04d}" for i in range(1, 2001, 50)})
+    with db.connections.writer() as conn:
+        conn.execute("ANALYZE")
+    
+    assert db.check_query_plans() is True